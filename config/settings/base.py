@@ -103,3 +103,57 @@ STATIC_URL = '/static/'
 
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
+
+
+# Search result cache (opac.search.cache.SearchResultCache)
+OPAC_SEARCH_RESULT_CACHE = {
+    'max_entries': 1000,
+    'max_size': 200000,
+    'max_entry_size': 5000,
+    'timeout': 300,
+}
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # ページ全体のキャッシュ専用。purge をすべてのワーカーに届けるため、
+    # プロセス間で共有するキャッシュを使う (テーブルは Procfile の release で
+    # manage.py createcachetable が作成する。memcached などがあれば、
+    # そちらに替えてもよい)
+    'page': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'opac_page_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+
+# ログインしていない利用者へのページ全体のキャッシュ (opac.caches.PageCache)
+# timeout を 0 にすると使わない。alias が LocMemCache の場合も使わない
+OPAC_PAGE_CACHE = {
+    'alias': 'page',
+    'timeout': 600,
+    'max_keys': 500,
+}
+
+
+# 書名などの前方一致索引 (opac.search.suggest.PrefixIndex)
+# rebuild_in_background が True なら、他のプロセスで蔵書目録が更新された後の
+# 作り直しを別スレッドで行い、終わるまでは古い索引で答える
+OPAC_SUGGEST_INDEX = {
+    'rebuild_in_background': True,
+}
+
+
+# mmap で共有する検索索引ファイル (manage.py build_search_index_file で作成)
+# 検索語ごとの書籍の数と出現回数 (絞り込みの順序と適合度の計算に使う集計) を
+# ファイルから読む。該当する書籍の絞り込みは、ファイルがあってもデータベースで
+# 行う。None なら使わず、集計もデータベースで行う。
+# 蔵書目録が更新されるとファイルは古くなり、書き出し直すまではデータベースで
+# 集計するので、cron などから build_search_index_file --if-stale を
+# 定期的に実行してください (最新なら書き出しません)
+OPAC_SEARCH_INDEX_FILE = None
@@ -14,6 +14,10 @@ SECRET_KEY = '^7k2d=23hla!6y+&f+ku&zc+r!5wps@#hl#bi(@b2_ti15q6h5'
 ALLOWED_HOSTS = []
 
 
+# テンプレートやデータの変更がすぐに見えるよう、ページ全体はキャッシュしない
+OPAC_PAGE_CACHE = {**OPAC_PAGE_CACHE, 'timeout': 0}
+
+
 # for django-debug-toolbar
 INTERNAL_IPS = ('127.0.0.1',)
 
@@ -1,5 +1,6 @@
 class HoldingAdminMessage:
-    LENT = '選択された 取置 を削除し、貸出 を登録しました。'
+    LENT = '{} 件の 取置 を削除し、貸出 を登録しました。'
+    LEND_LENDING_ALREADY_EXISTS = '{} 件は、既に貸出が存在しているので貸出できませんでした。'
+    LEND_NOT_FOUND = '{} 件は、既に取置がありませんでした。'
     CANCELED = '選択された 取置 を取り消しました。'
-    LENDING_ALREADY_EXISTS = '既に貸出が存在しています。'
     FIRST_RESERVATION_HOLDING_ALREADY_EXISTS = '最初の予約に対応する取置が既に存在しています。'
@@ -1,6 +1,9 @@
 class LendingAdminMessage:
-    RENEWING_ALREADY_EXISTS = '既に延長されているので延長できませんでした。'
-    RESERVATION_EXISTS = '予約が入っているので延長できませんでした。'
-    FIRST_RESERVATION_HOLDING_ALREADY_EXISTS = '最初の予約に対応する取置が既に存在しています。'
-    RENEWED = '選択された 貸出 を延長しました。'
-    BACKED = '選択された 貸出 を返却しました。'
+    RENEWING_ALREADY_EXISTS = '{} 件は、既に延長されているので延長できませんでした。'
+    RESERVATION_EXISTS = '{} 件は、予約が入っているので延長できませんでした。'
+    RENEWED = '{} 件の 貸出 を延長しました。'
+    BACKED = '{} 件の 貸出 を返却しました。'
+    BACK_HOLDING_ALREADY_EXISTS = \
+        '{} 件は、最初の予約に対応する取置が既に存在しているので返却できませんでした。'
+    NOT_FOUND = '{} 件は、既に返却されていました。'
+    HOLDING_MAIL_FAILED = '{} 件は、取置を作成しましたが連絡のメールを送信できませんでした。'
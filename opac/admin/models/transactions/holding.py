@@ -1,3 +1,4 @@
+from collections import Counter
 from logging import getLogger
 
 from django.contrib import admin, messages
@@ -5,12 +6,12 @@ from django.utils import timezone
 
 from opac.admin.messages import AdminMessage, HoldingAdminMessage
 from opac.models.transactions import Holding
+from opac.queries import HoldingBulkLendQuery
 from opac.services import (
     FirstReservationHoldingAlreadyExistsError,
-    LendingAlreadyExistsError,
     ServiceError
 )
-from opac.services.holding import HoldingCancelService, HoldingLendService
+from opac.services.holding import HoldingBulkLendService, HoldingCancelService
 
 logger = getLogger(__name__)
 
@@ -60,21 +61,32 @@ class HoldingAdmin(admin.ModelAdmin):
 
     def lend(self, request, holdings):
         try:
-            for holding in holdings:
-                HoldingLendService(holding).exec()
-        except LendingAlreadyExistsError as e:
-            logger.warning('取置の貸出に失敗しました', e)
-            self.message_user(
-                request,
-                HoldingAdminMessage.LENDING_ALREADY_EXISTS,
-                level=messages.WARNING
-            )
+            results = HoldingBulkLendService(holdings).exec()
         except ServiceError as e:
             logger.exception('取置の貸出に失敗しました', e)
             self.message_user(
                 request, AdminMessage.ERROR_OCCURRED, level=messages.ERROR)
-        else:
-            self.message_user(request, HoldingAdminMessage.LENT)
+            return
+
+        counts = Counter(result.status for result in results)
+        if counts[HoldingBulkLendQuery.LENT]:
+            self.message_user(
+                request,
+                HoldingAdminMessage.LENT.format(
+                    counts[HoldingBulkLendQuery.LENT]))
+        for status, message in (
+                (HoldingBulkLendQuery.LENDING_ALREADY_EXISTS,
+                 HoldingAdminMessage.LEND_LENDING_ALREADY_EXISTS),
+                (HoldingBulkLendQuery.NOT_FOUND,
+                 HoldingAdminMessage.LEND_NOT_FOUND)):
+            if counts[status]:
+                logger.warning('取置の貸出で %s が %d 件ありました',
+                               status, counts[status])
+                self.message_user(
+                    request,
+                    message.format(counts[status]),
+                    level=messages.WARNING
+                )
     lend.short_description = '選択された 取置 を貸出にする'
 
     def cancel(self, request, holdings):
@@ -1,3 +1,4 @@
+from collections import Counter
 from logging import getLogger
 
 
@@ -6,11 +7,11 @@ from django.utils import timezone
 
 from opac.admin.messages import AdminMessage, LendingAdminMessage
 from opac.models.transactions import Lending
-from opac.services import LendingBackService, LendingRenewService, ServiceError
-from opac.services.errors import (
-    FirstReservationHoldingAlreadyExistsError,
-    RenewingAlreadyExistsError,
-    ReservationExistsError
+from opac.queries import LendingBulkBackQuery, RenewingBulkCreateQuery
+from opac.services import (
+    LendingBulkBackService,
+    LendingBulkRenewService,
+    ServiceError
 )
 
 logger = getLogger(__name__)
@@ -84,46 +85,64 @@ class LendingAdmin(admin.ModelAdmin):
 
     def renew(self, request, lendings):
         try:
-            for lending in lendings:
-                LendingRenewService(lending).exec()
-        except RenewingAlreadyExistsError as e:
-            logger.warning('貸出の延長に失敗しました', e)
-            self.message_user(
-                request,
-                LendingAdminMessage.RENEWING_ALREADY_EXISTS,
-                level=messages.WARNING
-            )
-        except ReservationExistsError as e:
-            logger.warning('貸出の延長に失敗しました', e)
-            self.message_user(
-                request,
-                LendingAdminMessage.RESERVATION_EXISTS,
-                level=messages.WARNING
-            )
+            counts = LendingBulkRenewService(lendings).exec()
         except ServiceError as e:
             logger.exception('貸出の延長に失敗しました', e)
             self.message_user(
                 request, AdminMessage.ERROR_OCCURRED, level=messages.ERROR)
-        else:
-            self.message_user(request, LendingAdminMessage.RENEWED)
+            return
+
+        if counts[RenewingBulkCreateQuery.RENEWED]:
+            self.message_user(
+                request,
+                LendingAdminMessage.RENEWED.format(
+                    counts[RenewingBulkCreateQuery.RENEWED]))
+        for status, message in (
+                (RenewingBulkCreateQuery.RESERVATION_EXISTS,
+                 LendingAdminMessage.RESERVATION_EXISTS),
+                (RenewingBulkCreateQuery.RENEWING_ALREADY_EXISTS,
+                 LendingAdminMessage.RENEWING_ALREADY_EXISTS),
+                (RenewingBulkCreateQuery.NOT_FOUND,
+                 LendingAdminMessage.NOT_FOUND)):
+            if counts[status]:
+                logger.warning('貸出の延長で %s が %d 件ありました',
+                               status, counts[status])
+                self.message_user(
+                    request,
+                    message.format(counts[status]),
+                    level=messages.WARNING
+                )
     renew.short_description = '選択された 貸出 を延長する'
 
     def back(self, request, lendings):
         try:
-            for lending in lendings:
-                LendingBackService(lending).exec()
-        except FirstReservationHoldingAlreadyExistsError as e:
-            logger.exception('貸出の返却に失敗しました', e)
-            self.message_user(
-                request,
-                LendingAdminMessage.FIRST_RESERVATION_HOLDING_ALREADY_EXISTS,
-                level=messages.WARNING)
+            results = LendingBulkBackService(lendings).exec()
         except ServiceError as e:
             logger.exception('貸出の返却に失敗しました', e)
             self.message_user(
                 request, AdminMessage.ERROR_OCCURRED, level=messages.ERROR)
-        else:
-            self.message_user(request, LendingAdminMessage.BACKED)
+            return
+
+        counts = Counter(result.status for result in results)
+        backed = sum(result.is_backed for result in results)
+        if backed:
+            self.message_user(
+                request, LendingAdminMessage.BACKED.format(backed))
+        for status, message in (
+                (LendingBulkBackQuery.HOLDING_ALREADY_EXISTS,
+                 LendingAdminMessage.BACK_HOLDING_ALREADY_EXISTS),
+                (LendingBulkBackQuery.NOT_FOUND,
+                 LendingAdminMessage.NOT_FOUND),
+                (LendingBulkBackService.MAIL_FAILED,
+                 LendingAdminMessage.HOLDING_MAIL_FAILED)):
+            if counts[status]:
+                logger.warning('貸出の返却で %s が %d 件ありました',
+                               status, counts[status])
+                self.message_user(
+                    request,
+                    message.format(counts[status]),
+                    level=messages.WARNING
+                )
     back.short_description = '選択された 貸出 を返却する'
 
 
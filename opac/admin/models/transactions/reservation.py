@@ -1,6 +1,20 @@
 from django.contrib import admin
 
 from opac.models.transactions.reservation import Reservation
+from opac.queries import ReservationQueuePosition
+
+
+class QueuePositionFilter(admin.SimpleListFilter):
+    title = '予約順位'
+    parameter_name = 'queue_position'
+
+    def lookups(self, request, model_admin):
+        return (('first', '先頭のみ'), )
+
+    def queryset(self, request, reservations):
+        if self.value() == 'first':
+            return reservations.filter(queue_position=1)
+        return reservations
 
 
 class ReservationAdmin(admin.ModelAdmin):
@@ -10,14 +24,22 @@ class ReservationAdmin(admin.ModelAdmin):
         'get_book_name',
         'user',
         'get_reserved_at',
-        'order'
+        'get_queue_position'
     )
+    list_filter = (QueuePositionFilter, )
     search_fields = ('id', 'stock__id', 'stock__book__name', 'user__username')
     raw_id_fields = ('stock', 'user')
 
     def has_change_permission(self, request, obj=None):
         return False
 
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request)
+                   .select_related('stock__book', 'user')
+                   .annotate(queue_position=ReservationQueuePosition())
+        )
+
     def get_reservation_number(self, reservation):
         return reservation.id
     get_reservation_number.admin_order_field = 'id'
@@ -38,5 +60,10 @@ class ReservationAdmin(admin.ModelAdmin):
     get_reserved_at.admin_order_field = 'created_at'
     get_reserved_at.short_description = '予約日時'
 
+    def get_queue_position(self, reservation):
+        return reservation.queue_position
+    get_queue_position.admin_order_field = 'queue_position'
+    get_queue_position.short_description = '予約順位'
+
 
 admin.site.register(Reservation, ReservationAdmin)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class OpacConfig(AppConfig):
     name = 'opac'
+
+    def ready(self):
+        import opac.signals  # noqa: F401
@@ -0,0 +1 @@
+from .page import *  # noqa: F401 F403
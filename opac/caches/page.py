@@ -0,0 +1,199 @@
+from hashlib import md5
+from logging import getLogger
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse
+
+logger = getLogger(__name__)
+
+# キャッシュした応答に残すヘッダ
+_HEADERS = (
+    'Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Vary',
+    'Surrogate-Key',
+)
+# サロゲートキー。書籍のキーは書誌と貸出・取置・予約のどちらの変更でも purge する
+CATALOG = 'catalog'
+CIRCULATION = 'circulation'
+
+_DEFAULTS = {
+    'alias': 'default',
+    'timeout': 600,
+    'max_keys': 500,
+}
+
+
+def book_key(book_id):
+    """書籍のサロゲートキーを返す。"""
+    return f'book:{book_id}'
+
+
+class PageCache:
+    """匿名利用者向けのページ全体を、サロゲートキーを付けて保持するキャッシュ。
+
+    ページはサロゲートキー (書籍ごとのキーや蔵書目録のキー) を付けて保持し、
+    purge でキーを指定すると、そのキーを付けたページだけが無効になります。
+    purge のたびに通し番号を進めてキーごとに記録しておき、描画を始めた時点の
+    番号より後に purge されたキーを持つページを読み込み時に捨てるので、
+    purge はキーの数だけの書き込みで済み、描画中に purge されたページが
+    残ることもありません。番号はキャッシュの中で進めるので、ホストの時計が
+    ずれていても比べられます。
+
+    purge をすべてのワーカーに届けるため、プロセス間で共有するキャッシュ
+    (データベース・memcached など) を使います。プロセスごとのキャッシュ
+    (LocMemCache) が設定されている場合は、キャッシュしません。
+    キャッシュでエラーが発生した場合は、ログに残してキャッシュが無いものとして
+    振る舞います (ページは描画し、purge は次の purge まで届きません)。
+
+    設定は settings.OPAC_PAGE_CACHE から毎回読みます。
+
+    - alias : 使用する Django のキャッシュ。ページ全体のキャッシュ専用のもの
+      (番号を失った場合は、キャッシュ全体を消去します)
+    - timeout : ページを保持する秒数。0 ならキャッシュしない
+    - max_keys : 1ページに付けるサロゲートキーの数の上限
+    """
+    PREFIX = 'opac.page'
+
+    @property
+    def options(self):
+        return {**_DEFAULTS, **getattr(settings, 'OPAC_PAGE_CACHE', {})}
+
+    @property
+    def enabled(self):
+        return bool(self.options['timeout']) \
+            and not isinstance(self._cache, LocMemCache)
+
+    @property
+    def max_keys(self):
+        return self.options['max_keys']
+
+    @property
+    def _cache(self):
+        return caches[self.options['alias']]
+
+    def sequence(self):
+        """purge の通し番号の現在の値を返す。描画を始める前に読み、set に渡す。"""
+        try:
+            return self._cache.get(self._sequence_key(), 0)
+        except Exception:
+            # 0 を渡したページは、次の purge 以降は使われない
+            logger.exception('Cannot read the page cache sequence')
+            return 0
+
+    def get(self, path):
+        """キャッシュしたページを返す。
+
+        Parameters
+        ----------
+        path
+            クエリ文字列を含むパス
+
+        Returns
+        -------
+        HttpResponse。キャッシュされていない、または purge された場合は None
+        """
+        try:
+            return self._get(path)
+        except Exception:
+            logger.exception('Cannot read the page cache')
+            return None
+
+    def _get(self, path):
+        entry = self._cache.get(self._page_key(path))
+        if entry is None:
+            return None
+        started, keys, status, headers, content = entry
+        purged = self._cache.get_many([self._key_key(key) for key in keys])
+        # 記録が追い出されたキーは、いつ purge されたか分からないので捨てる
+        if len(purged) < len(set(keys)) \
+                or any(sequence > started for sequence in purged.values()):
+            return None
+        response = HttpResponse(content, status=status)
+        for name, value in headers:
+            response[name] = value
+        return response
+
+    def set(self, path, response, keys, started):
+        """ページを保持する。
+
+        Parameters
+        ----------
+        path
+            クエリ文字列を含むパス
+        response
+            描画済みの応答
+        keys
+            サロゲートキーのリスト
+        started
+            描画を始める前に sequence で読んだ通し番号。これより後に
+            purge されたキーがあれば、保持したページは使われない
+        """
+        try:
+            self._set(path, response, keys, started)
+        except Exception:
+            logger.exception('Cannot write the page cache')
+
+    def _set(self, path, response, keys, started):
+        headers = [
+            (name, response[name]) for name in _HEADERS
+            if response.has_header(name)
+        ]
+        # 記録の無いキーは、今の番号で purge されたものとして記録する
+        # (描画中に他の purge があれば、このページは使われない)
+        sequence = self._cache.get(self._sequence_key(), 0)
+        for key in keys:
+            self._cache.add(self._key_key(key), sequence, timeout=None)
+        entry = (started, list(keys), response.status_code, headers,
+                 response.content)
+        self._cache.set(
+            self._page_key(path), entry, self.options['timeout'])
+
+    def purge(self, keys):
+        """サロゲートキーを付けたページを無効にする。
+
+        トランザクションの中で呼ばれた場合は、コミットされる前の内容で
+        描画されたページを残さないよう、コミットの後にもう一度無効にします。
+        キャッシュを使わない設定の場合は何もしません。
+        """
+        keys = list(keys)
+        if not keys or not self.enabled:
+            return
+        self._purge(keys)
+        transaction.on_commit(lambda: self._purge(keys))
+
+    def _purge(self, keys):
+        try:
+            # データベースのキャッシュでエラーになっても、呼び出し元の
+            # トランザクションを続けられるよう、セーブポイントの中で書き込む
+            with transaction.atomic():
+                sequence = self._next_sequence()
+                self._cache.set_many(
+                    {self._key_key(key): sequence for key in keys},
+                    timeout=None)
+        except Exception:
+            logger.exception('Cannot purge the page cache')
+
+    def _next_sequence(self):
+        try:
+            return self._cache.incr(self._sequence_key())
+        except ValueError:
+            # 通し番号が無い (追い出された) と保持しているページと比べられない
+            # ので、すべて捨ててから数え直す
+            self._cache.clear()
+            self._cache.set(self._sequence_key(), 1, timeout=None)
+            return 1
+
+    def _page_key(self, path):
+        digest = md5(path.encode('utf-8')).hexdigest()
+        return f'{self.PREFIX}.page.{digest}'
+
+    def _key_key(self, key):
+        return f'{self.PREFIX}.key.{key}'
+
+    def _sequence_key(self):
+        return f'{self.PREFIX}.sequence'
+
+
+page_cache = PageCache()
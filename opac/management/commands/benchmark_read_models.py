@@ -0,0 +1,129 @@
+import gc
+import tracemalloc
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+from django.db.models.functions import Coalesce
+
+from opac.models.masters import Author, Book, Library, Publisher, Stock
+from opac.queries import BookListQuery, BookStocksQuery
+
+
+class Command(BaseCommand):
+    help = ('一覧の表示に使う読み取り用の行 (BookRow / StockRow) と、'
+            'モデルのインスタンスを読み込む場合の時間とメモリを比べます。'
+            '計測用のデータは最後にロールバックします。')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000,
+            help='1ページに表示する書籍・蔵書の数'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='計測する回数 (最も速かった回の時間を表示します)'
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        with transaction.atomic():
+            book_ids, stock_book_id = self.create_data(rows)
+            self.report(f'書籍一覧 {rows}行', repeat, {
+                'モデル': lambda: self.book_instances(book_ids),
+                'BookRow': lambda: BookListQuery(book_ids).exec(),
+            })
+            self.report(f'所蔵情報 {rows}行', repeat, {
+                'モデル': lambda: self.stock_instances(stock_book_id),
+                'StockRow': lambda: BookStocksQuery(stock_book_id).exec(),
+            })
+            transaction.set_rollback(True)
+
+    def create_data(self, rows):
+        # シグナル (索引やキャッシュの更新) を通さないよう bulk_create で作る
+        publisher = Publisher.objects.create(name='計測用出版者')
+        library = Library.objects.create(name='計測用図書館')
+        books = Book.objects.bulk_create(
+            Book(name=f'計測用書籍{i}', publisher=publisher)
+            for i in range(rows))
+        if not books[0].pk:
+            books = list(Book.objects.filter(publisher=publisher))
+        author = Author.objects.create(name='計測用著者')
+        Author.books.through.objects.bulk_create(
+            Author.books.through(author=author, book=book) for book in books)
+        Stock.objects.bulk_create(
+            Stock(book=book, library=library) for book in books)
+        Stock.objects.bulk_create(
+            Stock(book=books[0], library=library) for _ in range(rows - 1))
+        return [book.pk for book in books], books[0].pk
+
+    def book_instances(self, book_ids):
+        lendable = Q(stocks__lending__isnull=True) \
+            & Q(stocks__holding__isnull=True)
+        queryset = (
+            Book.objects
+                .filter(pk__in=book_ids)
+                .select_related('publisher')
+                .prefetch_related('authors', 'translators')
+                .annotate(
+                    stock_count=Count('stocks', distinct=True),
+                    lendable_count=Count(
+                        'stocks', filter=lendable, distinct=True),
+                    lent_count=Count('stocks__lending', distinct=True),
+                    held_count=Count('stocks__holding', distinct=True),
+                    reservation_count=Count(
+                        'stocks__reservations', distinct=True))
+        )
+        # ビューと同じく、描画の間はインスタンスを保持しておく
+        return list(queryset)
+
+    def stock_instances(self, book_id):
+        queryset = Stock.objects.filter(book_id=book_id) \
+                                .select_related('library')
+        queryset = queryset.annotate(
+            status=Case(
+                When(lending__isnull=False, then=Value('lent')),
+                When(holding__isnull=False, then=Value('held')),
+                default=Value('lendable'),
+                output_field=CharField()),
+            due_date=Coalesce(
+                'lending__renewing__due_date', 'lending__due_date'),
+            expiration_date=F('holding__expiration_date'),
+            reservation_count=Count('reservations'))
+        return list(queryset.order_by('library__id'))
+
+    def report(self, title, repeat, loaders):
+        self.stdout.write(title)
+        for name, load in loaders.items():
+            seconds = min(self.measure_time(load) for _ in range(repeat))
+            peak, blocks = self.measure_memory(load)
+            self.stdout.write(
+                f'  {name:<10} {seconds * 1000:8.1f} ms'
+                f' {peak / 1024:10.1f} KiB {blocks:8d} blocks')
+
+    def measure_time(self, load):
+        gc.collect()
+        start = perf_counter()
+        load()
+        return perf_counter() - start
+
+    def measure_memory(self, load):
+        # 読み込んだ結果を保持している間の、確保されたメモリの最大値と
+        # 残っているメモリブロックの数
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = load()
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del result
+        blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+        return peak, blocks
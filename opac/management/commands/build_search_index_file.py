@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from opac.queries import (
+    BookSearchIndexFileQuery,
+    BookSearchIndexFileWriteQuery
+)
+from opac.search.index_file import IndexFileReader
+
+
+class Command(BaseCommand):
+    help = '転置索引を、各ワーカーが mmap で共有する索引ファイルに書き出します。'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=getattr(settings, 'OPAC_SEARCH_INDEX_FILE', None),
+            help='書き出すファイルのパス (既定は OPAC_SEARCH_INDEX_FILE)'
+        )
+        parser.add_argument(
+            '--if-stale',
+            action='store_true',
+            help='ファイルが無い、壊れている、または蔵書目録の更新で古く'
+                 'なっている場合だけ書き出します (cron などから定期的に'
+                 '実行する場合に使います)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['output']
+        if not path:
+            raise CommandError(
+                '--output か OPAC_SEARCH_INDEX_FILE を指定してください。')
+        if options['if_stale'] \
+                and BookSearchIndexFileQuery(IndexFileReader(path)).exec():
+            self.stdout.write(f'{path}は最新です。')
+            return
+        count = BookSearchIndexFileWriteQuery(path).exec()
+        self.stdout.write(f'{count}件の転置索引を{path}に書き出しました。')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from opac.models.masters import Book
+from opac.queries import BookIndexQuery
+
+
+class Command(BaseCommand):
+    help = '全書籍の検索文書と転置索引を作り直します。'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='一度に索引を作り直す書籍の数'
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='検索文書の無い書籍だけ索引を作る (デプロイのたびに実行する)'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        books = Book.objects.order_by('pk')
+        if options['missing']:
+            books = books.filter(search_document=None)
+        book_ids = list(books.values_list('pk', flat=True))
+        for i in range(0, len(book_ids), chunk_size):
+            chunk = book_ids[i:i + chunk_size]
+            BookIndexQuery(Book.objects.filter(pk__in=chunk)).exec()
+        self.stdout.write(f'{len(book_ids)}冊の索引を作り直しました。')
@@ -0,0 +1,49 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opac', '0002_auto_20181215_1531'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='作成日時')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+                ('name', models.TextField(verbose_name='書名')),
+                ('authors', models.TextField(blank=True, verbose_name='著者')),
+                ('translators', models.TextField(blank=True, verbose_name='訳者')),
+                ('publisher', models.TextField(blank=True, verbose_name='出版者')),
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='opac.Book', verbose_name='書籍')),
+            ],
+            options={
+                'verbose_name': '書籍検索文書',
+                'verbose_name_plural': '書籍検索文書',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookSearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, verbose_name='検索語')),
+                ('field', models.CharField(choices=[('name', '書名'), ('authors', '著者'), ('translators', '訳者'), ('publisher', '出版者')], max_length=20, verbose_name='項目')),
+                ('frequency', models.PositiveIntegerField(default=1, verbose_name='出現回数')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='opac.Book', verbose_name='書籍')),
+            ],
+            options={
+                'verbose_name': '検索索引',
+                'verbose_name_plural': '検索索引',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='booksearchposting',
+            unique_together={('term', 'field', 'book')},
+        ),
+    ]
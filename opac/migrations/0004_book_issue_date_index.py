@@ -0,0 +1,17 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opac', '0003_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-issue_date', 'id'], name='opac_book_issue_d_bd0128_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opac', '0004_book_issue_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='作成日時')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='キー')),
+                ('value', models.CharField(max_length=32, verbose_name='バージョン')),
+            ],
+            options={
+                'verbose_name': 'キャッシュバージョン',
+                'verbose_name_plural': 'キャッシュバージョン',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opac', '0005_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booksearchdocument',
+            name='authors_length',
+            field=models.PositiveIntegerField(default=0, verbose_name='著者の検索語数'),
+        ),
+        migrations.AddField(
+            model_name='booksearchdocument',
+            name='name_length',
+            field=models.PositiveIntegerField(default=0, verbose_name='書名の検索語数'),
+        ),
+        migrations.AddField(
+            model_name='booksearchdocument',
+            name='publisher_length',
+            field=models.PositiveIntegerField(default=0, verbose_name='出版者の検索語数'),
+        ),
+        migrations.AddField(
+            model_name='booksearchdocument',
+            name='translators_length',
+            field=models.PositiveIntegerField(default=0, verbose_name='訳者の検索語数'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.1.7 on 2026-10-18 11:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opac', '0006_search_document_lengths'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3, verbose_name='trigram')),
+            ],
+            options={
+                'verbose_name': '検索語彙索引',
+                'verbose_name_plural': '検索語彙索引',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookSearchWord',
+            fields=[
+                ('word', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='語')),
+                ('length', models.PositiveIntegerField(verbose_name='文字数')),
+            ],
+            options={
+                'verbose_name': '検索語彙',
+                'verbose_name_plural': '検索語彙',
+            },
+        ),
+        migrations.AddField(
+            model_name='booksearchtrigram',
+            name='word',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='opac.BookSearchWord', verbose_name='語'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='booksearchtrigram',
+            unique_together={('trigram', 'word')},
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 2.1.7 on 2026-10-18 11:01
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# アプリの変換を後で変えてもマイグレーションの結果が変わらないよう、
+# この時点の opac.search.isbn.to_isbn13 を写しておく
+_SEPARATORS = re.compile(r'[\s\-]')
+_ISBN10 = re.compile(r'\d{9}[\dX]')
+_ISBN13 = re.compile(r'97[89]\d{10}')
+
+
+def _check_digit(body):
+    total = sum((3 if i % 2 else 1) * int(d) for i, d in enumerate(body))
+    return str((10 - total % 10) % 10)
+
+
+def to_isbn13(text):
+    if not text:
+        return None
+    isbn = _SEPARATORS.sub('', unicodedata.normalize('NFKC', text).upper())
+    if _ISBN13.fullmatch(isbn):
+        return isbn if _check_digit(isbn[:12]) == isbn[12] else None
+    if _ISBN10.fullmatch(isbn):
+        digits = [10 if c == 'X' else int(c) for c in isbn]
+        if sum((10 - i) * d for i, d in enumerate(digits)) % 11:
+            return None
+        body = '978' + isbn[:9]
+        return body + _check_digit(body)
+    return None
+
+
+def fill_isbn13(apps, schema_editor):
+    Book = apps.get_model('opac', 'Book')
+    for book in Book.objects.exclude(isbn=None).iterator():
+        isbn13 = to_isbn13(book.isbn)
+        if isbn13:
+            Book.objects.filter(pk=book.pk).update(isbn13=isbn13)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opac', '0007_book_search_vocabulary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='isbn13',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=13, null=True, verbose_name='ISBN-13'),
+        ),
+        migrations.RunPython(fill_isbn13, migrations.RunPython.noop),
+    ]
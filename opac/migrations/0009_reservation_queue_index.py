@@ -0,0 +1,17 @@
+# Generated by Django 2.1.7 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opac', '0008_book_isbn13'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['stock', 'created_at'], name='opac_reserv_stock_i_4cfc2a_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.1.7 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+def number_reservations(apps, schema_editor):
+    # 既存の予約には、蔵書ごとに予約日時の順で受付番号を振る
+    Reservation = apps.get_model('opac', 'Reservation')
+    sequences = {}
+    for reservation in Reservation.objects.order_by('created_at', 'id'):
+        sequence = sequences.get(reservation.stock_id, 0) + 1
+        sequences[reservation.stock_id] = sequence
+        reservation.sequence = sequence
+        reservation.save(update_fields=['sequence'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opac', '0009_reservation_queue_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='sequence',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='受付番号'),
+        ),
+        migrations.RunPython(number_reservations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reservation',
+            name='sequence',
+            field=models.PositiveIntegerField(editable=False, verbose_name='受付番号'),
+        ),
+        migrations.RemoveIndex(
+            model_name='reservation',
+            name='opac_reserv_stock_i_4cfc2a_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='reservation',
+            unique_together={('stock', 'user'), ('stock', 'sequence')},
+        ),
+    ]
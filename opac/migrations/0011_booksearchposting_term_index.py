@@ -0,0 +1,18 @@
+# Generated by Django 2.1.7 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opac', '0010_reservation_queue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booksearchposting',
+            name='term',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='検索語'),
+        ),
+    ]
@@ -1 +1 @@
-from opac.models import masters, transactions  # noqa: F401
+from opac.models import caches, masters, search, transactions  # noqa: F401
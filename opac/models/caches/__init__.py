@@ -0,0 +1 @@
+from opac.models.caches.version import CacheVersion  # noqa: F401
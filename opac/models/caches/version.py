@@ -0,0 +1,46 @@
+from django.db import models
+
+from opac.models.abstracts import TimeStampedModel
+
+
+class CacheVersion(TimeStampedModel):
+    """キャッシュを無効化するためのバージョン。
+
+    値は更新のたびに作り直すランダムな文字列なので、ロールバックなどで
+    過去の値に戻ることはありません。
+    """
+    class Meta:
+        verbose_name = 'キャッシュバージョン'
+        verbose_name_plural = 'キャッシュバージョン'
+
+    CATALOG = 'catalog'
+    # 書籍ごとのバージョンの種類 (キーは book_key で作る)。
+    # CIRCULATION はそのままのキーで、全書籍の貸出・取置・予約のバージョン
+    BOOK = 'book'
+    CIRCULATION = 'circulation'
+
+    key = models.CharField(
+        'キー',
+        max_length=100,
+        unique=True
+    )
+    value = models.CharField(
+        'バージョン',
+        max_length=32
+    )
+
+    def __str__(self):
+        return f'{self.key} : {self.value}'
+
+    @staticmethod
+    def book_key(kind, book_id):
+        """書籍ごとのバージョンのキーを返す。
+
+        Parameters
+        ----------
+        kind
+            BOOK (書誌) または CIRCULATION (蔵書の貸出・取置・予約)
+        book_id
+            書籍のID
+        """
+        return f'{kind}:{book_id}'
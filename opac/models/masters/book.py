@@ -3,12 +3,17 @@ from django.db import models
 
 from opac.models.abstracts import TimeStampedModel
 from opac.models.masters.publisher import Publisher
+from opac.search.isbn import to_isbn13
 
 
 class Book(TimeStampedModel):
     class Meta:
         verbose_name = '書籍'
         verbose_name_plural = '書籍'
+        indexes = [
+            # 検索結果のキーセットページング用
+            models.Index(fields=['-issue_date', 'id']),
+        ]
 
     name = models.CharField(
         '書名',
@@ -47,6 +52,20 @@ class Book(TimeStampedModel):
             RegexValidator(regex=r'^(97(8|9))?\d{9}(\d|X)$')
         ]
     )
+    # バーコードなどから引くための、isbn を ISBN-13 に揃えた値
+    # (版違いなどで同じ ISBN の書籍が複数登録されていることもある)
+    isbn13 = models.CharField(
+        'ISBN-13',
+        max_length=13,
+        blank=True,
+        null=True,
+        db_index=True,
+        editable=False
+    )
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        self.isbn13 = to_isbn13(self.isbn)
+        super().save(*args, **kwargs)
@@ -0,0 +1,4 @@
+from opac.models.search.document import BookSearchDocument  # noqa: F401
+from opac.models.search.posting import BookSearchPosting  # noqa: F401
+from opac.models.search.word import BookSearchTrigram  # noqa: F401
+from opac.models.search.word import BookSearchWord  # noqa: F401
@@ -0,0 +1,52 @@
+from django.db import models
+
+from opac.models.abstracts import TimeStampedModel
+from opac.models.masters.book import Book
+
+
+class BookSearchDocument(TimeStampedModel):
+    class Meta:
+        verbose_name = '書籍検索文書'
+        verbose_name_plural = '書籍検索文書'
+
+    book = models.OneToOneField(
+        Book,
+        verbose_name='書籍',
+        related_name='search_document',
+        on_delete=models.CASCADE
+    )
+    name = models.TextField(
+        '書名'
+    )
+    authors = models.TextField(
+        '著者',
+        blank=True
+    )
+    translators = models.TextField(
+        '訳者',
+        blank=True
+    )
+    publisher = models.TextField(
+        '出版者',
+        blank=True
+    )
+    # 適合度の計算に使う、項目ごとの検索語の数
+    name_length = models.PositiveIntegerField(
+        '書名の検索語数',
+        default=0
+    )
+    authors_length = models.PositiveIntegerField(
+        '著者の検索語数',
+        default=0
+    )
+    translators_length = models.PositiveIntegerField(
+        '訳者の検索語数',
+        default=0
+    )
+    publisher_length = models.PositiveIntegerField(
+        '出版者の検索語数',
+        default=0
+    )
+
+    def __str__(self):
+        return str(self.book)
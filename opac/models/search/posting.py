@@ -0,0 +1,50 @@
+from django.db import models
+
+from opac.models.masters.book import Book
+
+
+class BookSearchPosting(models.Model):
+    """検索語から書籍を引くための転置索引。
+
+    件数が多くなるため、タイムスタンプは持たせていません。
+    """
+    class Meta:
+        verbose_name = '検索索引'
+        verbose_name_plural = '検索索引'
+        unique_together = ('term', 'field', 'book')
+
+    NAME = 'name'
+    AUTHORS = 'authors'
+    TRANSLATORS = 'translators'
+    PUBLISHER = 'publisher'
+    FIELD_CHOICES = (
+        (NAME, '書名'),
+        (AUTHORS, '著者'),
+        (TRANSLATORS, '訳者'),
+        (PUBLISHER, '出版者'),
+    )
+
+    # 英数字の検索語は前方一致で引くので、単独のインデックスも張る
+    term = models.CharField(
+        '検索語',
+        max_length=100,
+        db_index=True
+    )
+    field = models.CharField(
+        '項目',
+        max_length=20,
+        choices=FIELD_CHOICES
+    )
+    book = models.ForeignKey(
+        Book,
+        verbose_name='書籍',
+        related_name='search_postings',
+        on_delete=models.CASCADE
+    )
+    frequency = models.PositiveIntegerField(
+        '出現回数',
+        default=1
+    )
+
+    def __str__(self):
+        return f'{self.term} : {self.book_id}'
@@ -0,0 +1,42 @@
+from django.db import models
+
+
+class BookSearchWord(models.Model):
+    """誤りを許容する検索で候補にする、書名・著者・訳者・出版者に現れる語。"""
+    class Meta:
+        verbose_name = '検索語彙'
+        verbose_name_plural = '検索語彙'
+
+    word = models.CharField(
+        '語',
+        max_length=100,
+        primary_key=True
+    )
+    length = models.PositiveIntegerField(
+        '文字数'
+    )
+
+    def __str__(self):
+        return self.word
+
+
+class BookSearchTrigram(models.Model):
+    """語彙を trigram から引くための索引。"""
+    class Meta:
+        verbose_name = '検索語彙索引'
+        verbose_name_plural = '検索語彙索引'
+        unique_together = ('trigram', 'word')
+
+    trigram = models.CharField(
+        'trigram',
+        max_length=3
+    )
+    word = models.ForeignKey(
+        BookSearchWord,
+        verbose_name='語',
+        related_name='trigrams',
+        on_delete=models.CASCADE
+    )
+
+    def __str__(self):
+        return f'{self.trigram} : {self.word_id}'
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Max
 
 from opac.models.abstracts import TimeStampedModel
 from opac.models.masters.stock import Stock
@@ -9,7 +10,11 @@ class Reservation(TimeStampedModel):
     class Meta:
         verbose_name = '予約'
         verbose_name_plural = '予約'
-        unique_together = ('stock', 'user')
+        unique_together = (
+            ('stock', 'user'),
+            # 蔵書ごとの予約の待ち行列。先頭は受付番号の最も小さい予約
+            ('stock', 'sequence'),
+        )
 
     stock = models.ForeignKey(
         Stock,
@@ -23,13 +28,34 @@ class Reservation(TimeStampedModel):
         related_name='reservations',
         on_delete=models.CASCADE
     )
+    sequence = models.PositiveIntegerField(
+        '受付番号',
+        editable=False
+    )
 
     def __str__(self):
         return f'{self.stock} : {self.user}'
 
+    def save(self, *args, **kwargs):
+        if self.sequence is not None:
+            return super().save(*args, **kwargs)
+        # 蔵書の行をロックしてから待ち行列の最後の番号を読むので、
+        # 同時に予約されても番号は重複しない
+        with transaction.atomic():
+            Stock.objects \
+                .select_for_update() \
+                .filter(pk=self.stock_id) \
+                .values_list('pk', flat=True) \
+                .get()
+            last = Reservation.objects \
+                .filter(stock_id=self.stock_id) \
+                .aggregate(last=Max('sequence'))['last']
+            self.sequence = (last or 0) + 1
+            super().save(*args, **kwargs)
+
     def order(self):
         return Reservation.objects \
-            .filter(stock__id=self.stock.id) \
-            .filter(created_at__lt=self.created_at) \
+            .filter(stock__id=self.stock_id) \
+            .filter(sequence__lt=self.sequence) \
             .count() + 1
     order.short_description = '予約順位'
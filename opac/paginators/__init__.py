@@ -0,0 +1 @@
+from .cursor import *  # noqa: F401 F403
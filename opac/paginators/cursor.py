@@ -0,0 +1,159 @@
+from django.core import signing
+from django.core.paginator import InvalidPage
+from django.db.models import F, Q
+from django.utils.dateparse import parse_date
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class BookCursorPaginator:
+    """書籍を発行日の新しい順 (同日は書籍番号順) にキーセットページングする。
+
+    OFFSET を使わず、前のページの端の書籍を起点に次のページを取得するので、
+    どれだけ深いページでも取得にかかる費用は変わりません。
+    カーソルは署名付きの不透明な文字列です。
+
+    Parameters
+    ----------
+    queryset
+        書籍のクエリセット (values_list でも可)
+    per_page
+        1ページの件数
+    """
+    NEXT = 'n'
+    PREVIOUS = 'p'
+    SALT = 'opac.paginators.cursor'
+
+    def __init__(self, queryset, per_page):
+        self._queryset = queryset
+        self.per_page = per_page
+
+    @cached_property
+    def count(self):
+        return self._queryset.count()
+
+    def page(self, cursor):
+        """カーソルが指すページを返す。
+
+        Parameters
+        ----------
+        cursor
+            前のページで発行されたカーソル。空なら最初のページ
+
+        Raises
+        ------
+        InvalidCursor
+            カーソルが不正な場合
+        """
+        direction, key = self._decode(cursor) if cursor \
+            else (self.NEXT, None)
+
+        if direction == self.NEXT:
+            queryset = self._queryset.order_by(
+                F('issue_date').desc(nulls_last=True), 'id')
+            if key:
+                queryset = queryset.filter(self._after(*key))
+        else:
+            queryset = self._queryset.order_by(
+                F('issue_date').asc(nulls_first=True), '-id')
+            queryset = queryset.filter(self._before(*key))
+
+        rows = list(
+            queryset.values_list('issue_date', 'id')[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == self.NEXT:
+            has_previous, has_next = key is not None, has_more
+        else:
+            has_previous, has_next = has_more, True
+            rows.reverse()
+
+        return BookCursorPage(
+            [pk for _, pk in rows],
+            self,
+            previous_cursor=self._encode(self.PREVIOUS, rows[0])
+            if has_previous and rows else None,
+            next_cursor=self._encode(self.NEXT, rows[-1])
+            if has_next and rows else None
+        )
+
+    @classmethod
+    def cursor_after(cls, issue_date, pk):
+        """指定した書籍の次から始まるページのカーソルを返す。
+
+        OFFSET で表示したページから、キーセットページングに移るときに使います。
+        """
+        return cls._encode(cls.NEXT, (issue_date, pk))
+
+    @classmethod
+    def cursor_before(cls, issue_date, pk):
+        """指定した書籍の前で終わるページのカーソルを返す。"""
+        return cls._encode(cls.PREVIOUS, (issue_date, pk))
+
+    def _after(self, issue_date, pk):
+        if issue_date is None:
+            return Q(issue_date__isnull=True, id__gt=pk)
+        return Q(issue_date__lt=issue_date) \
+            | Q(issue_date=issue_date, id__gt=pk) \
+            | Q(issue_date__isnull=True)
+
+    def _before(self, issue_date, pk):
+        if issue_date is None:
+            return Q(issue_date__isnull=False) \
+                | Q(issue_date__isnull=True, id__lt=pk)
+        return Q(issue_date__gt=issue_date) \
+            | Q(issue_date=issue_date, id__lt=pk)
+
+    @classmethod
+    def _encode(cls, direction, row):
+        issue_date, pk = row
+        return signing.dumps(
+            [direction, issue_date and issue_date.isoformat(), pk],
+            salt=cls.SALT
+        )
+
+    def _decode(self, cursor):
+        try:
+            direction, issue_date, pk = signing.loads(cursor, salt=self.SALT)
+        except (signing.BadSignature, TypeError, ValueError) as e:
+            raise InvalidCursor(cursor, e)
+        if direction not in (self.NEXT, self.PREVIOUS) \
+                or not isinstance(pk, int):
+            raise InvalidCursor(cursor)
+        return direction, (issue_date and parse_date(issue_date), pk)
+
+
+class BookCursorPage:
+    """BookCursorPaginator の1ページ。
+
+    Parameters
+    ----------
+    object_list
+        ページに含まれる書籍のIDのリスト
+    paginator
+        ページを作成したページネーター
+    previous_cursor
+        前のページのカーソル。前のページが無ければ None
+    next_cursor
+        次のページのカーソル。次のページが無ければ None
+    """
+    def __init__(self, object_list, paginator, previous_cursor, next_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.previous_cursor = previous_cursor
+        self.next_cursor = next_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
@@ -1,6 +1,8 @@
 from opac.queries.book import *  # noqa: F401 F403
+from opac.queries.cache_version import *  # noqa: F401 F403
 from opac.queries.errors import *  # noqa: F401 F403
 from opac.queries.holding import *  # noqa: F401 F403
 from opac.queries.lending import *  # noqa: F401 F403
 from opac.queries.renewing import *  # noqa: F401 F403
+from opac.queries.reservation import *  # noqa: F401 F403
 from opac.queries.stock import *  # noqa: F401 F403
@@ -1,3 +1,13 @@
+from .availability import *  # noqa: F401 F403
+from .correct import *  # noqa: F401 F403
 from .detail import *  # noqa: F401 F403
+from .facets import *  # noqa: F401 F403
+from .index import *  # noqa: F401 F403
+from .index_file import *  # noqa: F401 F403
+from .isbn import *  # noqa: F401 F403
+from .list import *  # noqa: F401 F403
+from .names import *  # noqa: F401 F403
 from .search import *  # noqa: F401 F403
+from .statistics import *  # noqa: F401 F403
+from .suggest import *  # noqa: F401 F403
 from .stocks import *  # noqa: F401 F403
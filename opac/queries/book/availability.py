@@ -0,0 +1,44 @@
+from django.db.models import Exists, OuterRef
+
+from opac.models.masters import Stock
+
+
+class BookAvailabilityFilterQuery:
+    """書籍のクエリセットを、条件に合う蔵書の有無で絞り込むクエリ。
+
+    蔵書・貸出・取置を EXISTS のサブクエリで調べるので、蔵書を1件ずつ
+    読み込むことなくデータベースの中だけで絞り込めます。
+
+    Parameters
+    ----------
+    books
+        対象の書籍のクエリセット
+    lendable
+        True なら、貸出可能な (貸出中でも取置中でもない) 蔵書があるもの
+    library
+        図書館の番号。指定した場合は、その図書館の蔵書があるもの
+    """
+    def __init__(self, books, lendable=False, library=None):
+        self._books = books
+        self._lendable = lendable
+        self._library = library
+
+    def exec(self):
+        """クエリを実行する。
+
+        Returns
+        -------
+        絞り込んだ書籍のクエリセット。条件が無ければ元のクエリセット
+        """
+        if not self._lendable and self._library is None:
+            return self._books
+        stocks = Stock.objects.filter(book=OuterRef('pk'))
+        if self._library is not None:
+            stocks = stocks.filter(library_id=self._library)
+        if self._lendable:
+            stocks = stocks.filter(lending__isnull=True, holding__isnull=True)
+        return (
+            self._books
+                .annotate(has_stock=Exists(stocks))
+                .filter(has_stock=True)
+        )
@@ -0,0 +1,66 @@
+from django.db.models import Count
+
+from opac.models.search import BookSearchTrigram, BookSearchWord
+from opac.search import map_runs
+from opac.search.fuzzy import (
+    edit_distance,
+    max_distance,
+    min_shared_trigrams,
+    trigrams
+)
+
+
+class BookSearchWordsCorrectQuery:
+    """検索語の綴りの誤りを、語彙の中で編集距離が最も近い語に置き換えるクエリ。
+
+    候補は trigram 索引から共有する trigram の数で絞り込むので、
+    語彙全体を走査することはありません。
+
+    Parameters
+    ----------
+    words
+        検索語のリスト
+    """
+    def __init__(self, words):
+        self._words = words
+
+    def exec(self):
+        """クエリを実行する。
+
+        Returns
+        -------
+        置き換えた検索語のリスト。置き換える語が無ければ元のままのリスト
+
+        Detail
+        ------
+        語の中の英数字・日本語の文字の並びだけを置き換え、並びの間の記号は
+        そのまま残すので、直す並びが無い語 (「c++」「foo-bar」など) は、
+        正規化した元の語と同じ文字列になります。
+        """
+        return [map_runs(self._correct, word) for word in self._words]
+
+    def _correct(self, run):
+        distance = max_distance(run)
+        if not distance \
+                or BookSearchWord.objects.filter(word=run).exists():
+            return run
+
+        grams = trigrams(run)
+        candidates = (
+            BookSearchTrigram.objects
+                             .filter(trigram__in=grams)
+                             .filter(word__length__gte=len(run) - distance)
+                             .filter(word__length__lte=len(run) + distance)
+                             .values_list('word')
+                             .annotate(shared=Count('trigram'))
+                             .filter(
+                                 shared__gte=min_shared_trigrams(
+                                     run, distance))
+        )
+        scored = sorted(
+            (edit_distance(run, candidate, distance), candidate)
+            for candidate, _ in candidates
+        )
+        if scored and scored[0][0] <= distance:
+            return scored[0][1]
+        return run
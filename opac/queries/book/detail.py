@@ -1,16 +1,79 @@
+from collections import namedtuple
+
+from django.utils.functional import SimpleLazyObject
+
+from opac.models.caches import CacheVersion
 from opac.models.masters import Book
+from opac.queries.book.names import BookNamesQuery
+from opac.queries.book.stocks import BookStocksQuery
+from opac.queries.cache_version import BookCacheVersion
+
+
+class BookDetail(
+        namedtuple('BookDetail', 'book authors translators stocks')):
+    """書籍詳細ページに表示する内容 (読み取り専用)。
+
+    著者名・訳者名・蔵書は、初めて参照したときに読み込みます。
+    テンプレートのフラグメントキャッシュに当たれば、読み込まれません。
+
+    Attributes
+    ----------
+    book
+        書籍 (出版者を読み込み済み)。書誌のキャッシュバージョンと
+        その更新日時を book_version, book_updated_at に、貸出・取置・予約の
+        ものを circulation_version, circulation_updated_at に付けています
+    authors
+        著者名のタプル (登録順)
+    translators
+        訳者名のタプル (登録順)
+    stocks
+        BookStocksQuery で読み込んだ StockRow のタプル
+    """
 
 
 class BookDetailQuery:
+    """書籍詳細ページに表示する内容を、まとめて読み込むクエリ。
+
+    書籍と出版者 (キャッシュバージョンを含む)、著者名と訳者名
+    (BookNamesQuery)、状態を付けた蔵書の3回のクエリで読み込みます。蔵書や著者の数によらず
+    回数は一定です。後の2回は、参照されるまで実行しません。
+
+    Parameters
+    ----------
+    book_id
+        書籍のID
+
+    Returns
+    -------
+    BookDetail。書籍が無ければ None
+    """
     def __init__(self, book_id):
         self._book_id = book_id
 
     def exec(self):
-        queryset = (
+        book = (
             Book.objects
                 .filter(pk=self._book_id)
                 .select_related('publisher')
-                .prefetch_related('authors')
-                .prefetch_related('translators')
+                .annotate(
+                    book_version=BookCacheVersion(CacheVersion.BOOK),
+                    book_updated_at=BookCacheVersion(
+                        CacheVersion.BOOK, field='updated_at'),
+                    circulation_version=BookCacheVersion(
+                        CacheVersion.CIRCULATION),
+                    circulation_updated_at=BookCacheVersion(
+                        CacheVersion.CIRCULATION, field='updated_at'))
+                .first()
+        )
+        if book is None:
+            return None
+        names = SimpleLazyObject(
+            lambda: BookNamesQuery([self._book_id]).exec()[self._book_id])
+        return BookDetail(
+            book=book,
+            authors=SimpleLazyObject(lambda: names[BookNamesQuery.AUTHOR]),
+            translators=SimpleLazyObject(
+                lambda: names[BookNamesQuery.TRANSLATOR]),
+            stocks=SimpleLazyObject(
+                lambda: tuple(BookStocksQuery(self._book_id).exec()))
         )
-        return queryset
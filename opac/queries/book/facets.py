@@ -0,0 +1,149 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractYear
+
+from opac.models.masters import Book, Library
+from opac.queries.book.search import RankedBookIds
+from opac.search.facets import BookFacets, BookFacetVector
+
+
+class BookFacetQuery:
+    """検索結果の書籍のファセットの値を、1回のクエリで読み込むクエリ。
+
+    書籍と蔵書を結合した行を一度だけ読み、書籍ごとの出版者・発行年・
+    所蔵館・貸出可否にまとめます。件数の集計と絞り込みは BookFacets が
+    メモリ上で行うので、ファセットや絞り込み条件が増えてもクエリは増えません。
+
+    Parameters
+    ----------
+    book_ids
+        検索結果の書籍IDのリスト
+    """
+    def __init__(self, book_ids):
+        self._book_ids = book_ids
+
+    def exec(self):
+        """クエリを実行する。
+
+        Returns
+        -------
+        BookFacets
+        """
+        queryset = (
+            Book.objects
+                .filter(pk__in=self._book_ids)
+                .values_list(
+                    'id',
+                    'publisher_id',
+                    'publisher__name',
+                    'issue_date',
+                    'stocks__library_id',
+                    'stocks__library__name',
+                    'stocks__lending__id',
+                    'stocks__holding__id')
+        )
+        books = {}
+        libraries = defaultdict(set)
+        lendable = set()
+        publisher_names = {}
+        library_names = {}
+        for (pk, publisher_id, publisher_name, issue_date,
+             library_id, library_name, lending_id, holding_id) in queryset:
+            books[pk] = (publisher_id, issue_date and issue_date.year)
+            publisher_names[publisher_id] = publisher_name
+            if library_id is None:
+                continue
+            libraries[pk].add(library_id)
+            library_names[library_id] = library_name
+            if lending_id is None and holding_id is None:
+                lendable.add(pk)
+
+        vectors = {
+            pk: BookFacetVector(
+                publisher, year, frozenset(libraries[pk]), pk in lendable)
+            for pk, (publisher, year) in books.items()
+        }
+        return BookFacets(vectors, publisher_names, library_names)
+
+
+class BookFacetCountQuery:
+    """検索結果の書籍のファセットの値ごとの件数を、データベースで集計するクエリ。
+
+    BookFacetQuery と違って書籍IDも書籍と蔵書を結合した行も読み込まず、
+    検索結果をサブクエリにした1回の GROUP BY で集計します。
+    キャッシュに収まらない大きな検索結果や、キーセットページングで
+    表示する検索結果に使います。
+
+    Parameters
+    ----------
+    book_ids
+        検索結果の書籍IDのクエリセット、または RankedBookIds
+    """
+    def __init__(self, book_ids):
+        if isinstance(book_ids, RankedBookIds):
+            book_ids = book_ids.queryset
+        self._book_ids = book_ids.order_by()
+
+    def exec(self):
+        """クエリを実行する。
+
+        Detail
+        ------
+        書籍を出版者と発行年の組で GROUP BY し、組ごとの書籍の数、
+        貸出可能な書籍の数、図書館ごとの所蔵する書籍の数を条件付きの
+        集計で数えます。書籍はどれか一つの組に入るので、組ごとの数を
+        足し合わせれば各ファセットの件数になり、検索結果のサブクエリは
+        一度しか評価されません (図書館の一覧を読むクエリは別に1回)。
+
+        Returns
+        -------
+        BookFacets.counts と同じ形式の辞書
+        """
+        library_names = dict(
+            Library.objects.order_by('pk').values_list('pk', 'name'))
+        on_shelf = Q(stocks__isnull=False,
+                     stocks__lending=None,
+                     stocks__holding=None)
+        rows = Book.objects \
+            .filter(pk__in=self._book_ids) \
+            .annotate(year=ExtractYear('issue_date')) \
+            .values_list('publisher_id', 'publisher__name', 'year') \
+            .annotate(
+                count=Count('id', distinct=True),
+                lendable=Count('id', distinct=True, filter=on_shelf),
+                **{
+                    f'library{pk}': Count(
+                        'id', distinct=True,
+                        filter=Q(stocks__library_id=pk))
+                    for pk in library_names
+                }
+            ) \
+            .order_by()
+
+        publishers = Counter()
+        publisher_names = {}
+        years = Counter()
+        libraries = Counter()
+        lendable = 0
+        for publisher, publisher_name, year, count, lendable_count, \
+                *library_counts in rows:
+            publishers[publisher] += count
+            publisher_names[publisher] = publisher_name
+            if year is not None:
+                years[year] += count
+            lendable += lendable_count
+            libraries.update(dict(zip(library_names, library_counts)))
+        return {
+            'publisher': sorted(
+                ((pk, publisher_names[pk], count)
+                 for pk, count in publishers.items()),
+                key=lambda facet: (-facet[2], facet[1])
+            ),
+            'year': sorted(years.items(), reverse=True),
+            'library': [
+                (pk, name, libraries[pk])
+                for pk, name in library_names.items() if libraries[pk]
+            ],
+            'lendable': lendable,
+        }
@@ -0,0 +1,110 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+
+from opac.models.masters import Book
+from opac.models.search import (
+    BookSearchDocument,
+    BookSearchPosting,
+    BookSearchTrigram,
+    BookSearchWord
+)
+from opac.search import normalize, runs, tokenize
+from opac.search.fuzzy import MIN_LENGTH, trigrams
+
+
+class BookIndexQuery:
+    """書籍の検索文書と転置索引を作り直すクエリ。アトミックです。
+
+    Parameters
+    ----------
+    books
+        対象の書籍のクエリセット
+    """
+    WORDS_CHUNK_SIZE = 500
+
+    def __init__(self, books):
+        self._books = books
+
+    @transaction.atomic
+    def exec(self):
+        """クエリを実行する。
+
+        Detail
+        ------
+        1. 対象の書籍の検索文書と転置索引を削除する
+        2. 書名・著者・訳者・出版者から検索文書と転置索引を作成する
+        3. 書名・著者・訳者・出版者に現れる語のうち、語彙に無いものを追加する
+        """
+        book_ids = self._books.values('pk')
+        BookSearchDocument.objects.filter(book_id__in=book_ids).delete()
+        BookSearchPosting.objects.filter(book_id__in=book_ids).delete()
+
+        queryset = (
+            Book.objects
+                .filter(pk__in=book_ids)
+                .select_related('publisher')
+                .prefetch_related('authors')
+                .prefetch_related('translators')
+        )
+        documents = []
+        postings = []
+        words = set()
+        for book in queryset:
+            fields = self._fields(book)
+            words.update(
+                word for text in fields.values() for word in runs(text)
+                if len(word) >= MIN_LENGTH
+            )
+            terms = {field: tokenize(text) for field, text in fields.items()}
+            documents.append(BookSearchDocument(
+                book=book,
+                **{field: normalize(text) for field, text in fields.items()},
+                **{f'{field}_length': len(terms[field]) for field in fields}
+            ))
+            postings.extend(
+                BookSearchPosting(
+                    term=term, field=field, book=book, frequency=frequency)
+                for field in fields
+                for term, frequency in Counter(terms[field]).items()
+            )
+        BookSearchDocument.objects.bulk_create(documents)
+        BookSearchPosting.objects.bulk_create(postings)
+        words = sorted(words)
+        for i in range(0, len(words), self.WORDS_CHUNK_SIZE):
+            self._add_words(words[i:i + self.WORDS_CHUNK_SIZE])
+
+    def _fields(self, book):
+        return {
+            BookSearchPosting.NAME: book.name,
+            BookSearchPosting.AUTHORS:
+                '\n'.join(a.name for a in book.authors.all()),
+            BookSearchPosting.TRANSLATORS:
+                '\n'.join(t.name for t in book.translators.all()),
+            BookSearchPosting.PUBLISHER: book.publisher.name,
+        }
+
+    def _add_words(self, words):
+        existing = set(
+            BookSearchWord.objects
+                          .filter(word__in=words)
+                          .values_list('word', flat=True)
+        )
+        new_words = [w for w in words if w not in existing]
+        try:
+            with transaction.atomic():
+                self._create_words(new_words)
+        except IntegrityError:
+            # 同時に同じ語が追加された場合は、1語ずつ追加し直す
+            for word in new_words:
+                with transaction.atomic():
+                    if not BookSearchWord.objects.filter(word=word).exists():
+                        self._create_words([word])
+
+    def _create_words(self, words):
+        BookSearchWord.objects.bulk_create(
+            BookSearchWord(word=w, length=len(w)) for w in words)
+        BookSearchTrigram.objects.bulk_create(
+            BookSearchTrigram(trigram=t, word_id=w)
+            for w in words for t in trigrams(w)
+        )
@@ -0,0 +1,67 @@
+from opac.models.caches import CacheVersion
+from opac.models.search import BookSearchPosting
+from opac.queries.cache_version import CacheVersionGetQuery
+from opac.search.index_file import index_file_reader, write_index_file
+
+
+class BookSearchIndexFileWriteQuery:
+    """転置索引を、mmap で読める索引ファイルに書き出すクエリ。
+
+    Parameters
+    ----------
+    path
+        書き出すファイルのパス
+    """
+    def __init__(self, path):
+        self._path = path
+
+    def exec(self):
+        """クエリを実行する。
+
+        Detail
+        ------
+        転置索引より先に蔵書目録のバージョンを読むので、書き出し中に
+        蔵書目録が更新された場合は、ファイルは古いものとして扱われます。
+
+        Returns
+        -------
+        書き出した転置索引の件数
+        """
+        version = CacheVersionGetQuery(CacheVersion.CATALOG).exec()
+        fields = [field for field, _ in BookSearchPosting.FIELD_CHOICES]
+        postings = list(
+            BookSearchPosting.objects
+                             .values_list(
+                                 'term', 'field', 'book_id', 'frequency')
+                             .iterator()
+        )
+        write_index_file(self._path, version, fields, postings)
+        return len(postings)
+
+
+class BookSearchIndexFileQuery:
+    """蔵書目録の現在のバージョンから作られた索引ファイルを返すクエリ。
+
+    Parameters
+    ----------
+    reader
+        使用する索引ファイルの読み込み
+    """
+    def __init__(self, reader=index_file_reader):
+        self._reader = reader
+
+    def exec(self):
+        """クエリを実行する。
+
+        Returns
+        -------
+        IndexFile。設定されていない、ファイルが無い、または蔵書目録が
+        更新された後で古くなっている場合は None
+        """
+        index_file = self._reader.get()
+        if index_file is None:
+            return None
+        version = CacheVersionGetQuery(CacheVersion.CATALOG).exec()
+        if index_file.catalog_version != version:
+            return None
+        return index_file
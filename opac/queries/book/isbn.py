@@ -0,0 +1,30 @@
+from opac.models.masters import Book
+
+
+class BookIsbnQuery:
+    """ISBN-13 から書籍番号を引くクエリ。
+
+    同じ ISBN の書籍が複数登録されていることもあるので、
+    2件目まで読み込みます。
+
+    Parameters
+    ----------
+    isbn13
+        正規化済みの ISBN-13
+    """
+    def __init__(self, isbn13):
+        self._isbn13 = isbn13
+
+    def exec(self):
+        """クエリを実行する。
+
+        Returns
+        -------
+        書籍番号のリスト (多くとも2件、書籍番号の順)
+        """
+        return list(
+            Book.objects
+                .filter(isbn13=self._isbn13)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:2]
+        )
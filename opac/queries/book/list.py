@@ -0,0 +1,98 @@
+from collections import namedtuple
+
+from django.db.models import Count, F, Q
+
+from opac.models.caches import CacheVersion
+from opac.models.masters import Book
+from opac.queries.book.names import BookNamesQuery
+from opac.queries.cache_version import BookCacheVersion
+
+
+class BookRow(namedtuple('BookRow', (
+        'id name authors translators publisher_name issue_date '
+        'stock_count lendable_count lent_count held_count reservation_count '
+        'book_version circulation_version'))):
+    """一覧の1行に表示する書籍の内容 (読み取り専用)。
+
+    モデルのインスタンスと違い、表示する値だけを持つ軽量なタプルです。
+
+    Attributes
+    ----------
+    authors
+        著者名のタプル (登録順)
+    translators
+        訳者名のタプル (登録順)
+    publisher_name
+        出版者名
+    """
+    __slots__ = ()
+
+
+class BookListQuery:
+    """一覧表示する書籍を、指定した順番のまま取得するクエリ。
+
+    書籍ごとの蔵書の状況を、次の属性として集計して付けます。
+    集計は書籍の取得と同じ1回のクエリで行うので、蔵書を書籍ごとに
+    読み込むことはありません。
+
+    - stock_count : 蔵書の数
+    - lendable_count : 貸出可能な蔵書の数
+    - lent_count : 貸出中の蔵書の数
+    - held_count : 取置中の蔵書の数
+    - reservation_count : 予約の数 (全蔵書の合計)
+
+    テンプレートのフラグメントキャッシュのキーに使うため、書誌と
+    貸出・取置・予約のキャッシュバージョンも book_version,
+    circulation_version として付けます。
+
+    モデルのインスタンスは作らず、values_list で読み込んだ値を BookRow に
+    詰めて返します。著者名・訳者名は BookNamesQuery でまとめて読むので、
+    クエリは全部で2回です。
+
+    Parameters
+    ----------
+    book_ids
+        書籍のIDのリスト (1ページ分)
+
+    Returns
+    -------
+    BookRow のリスト
+    """
+    def __init__(self, book_ids):
+        self._book_ids = list(book_ids)
+
+    def exec(self):
+        if not self._book_ids:
+            return []
+        lendable = Q(stocks__lending__isnull=True) \
+            & Q(stocks__holding__isnull=True)
+        queryset = (
+            Book.objects
+                .filter(pk__in=self._book_ids)
+                .annotate(
+                    publisher_name=F('publisher__name'),
+                    stock_count=Count('stocks', distinct=True),
+                    lendable_count=Count(
+                        'stocks', filter=lendable, distinct=True),
+                    lent_count=Count('stocks__lending', distinct=True),
+                    held_count=Count('stocks__holding', distinct=True),
+                    reservation_count=Count(
+                        'stocks__reservations', distinct=True),
+                    book_version=BookCacheVersion(CacheVersion.BOOK),
+                    circulation_version=BookCacheVersion(
+                        CacheVersion.CIRCULATION))
+                .values_list(
+                    'id', 'name', 'publisher_name', 'issue_date',
+                    'stock_count', 'lendable_count', 'lent_count',
+                    'held_count', 'reservation_count', 'book_version',
+                    'circulation_version')
+        )
+        names = BookNamesQuery(self._book_ids).exec()
+        books = {}
+        for pk, name, *values in queryset:
+            books[pk] = BookRow(
+                pk, name,
+                names[pk][BookNamesQuery.AUTHOR],
+                names[pk][BookNamesQuery.TRANSLATOR],
+                *values)
+        return [books[pk] for pk in self._book_ids if pk in books]
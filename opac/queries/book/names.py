@@ -0,0 +1,54 @@
+from django.db.models import CharField, F, Value
+
+from opac.models.masters import Author, Translator
+
+
+class BookNamesQuery:
+    """書籍ごとの著者名・訳者名を、UNION で1回のクエリで取得するクエリ。
+
+    モデルのインスタンスは作らず、中間テーブルから名前の文字列だけを
+    読み込みます。
+
+    Parameters
+    ----------
+    book_ids
+        書籍のIDのリスト
+
+    Returns
+    -------
+    {書籍のID: {AUTHOR: 著者名のタプル, TRANSLATOR: 訳者名のタプル}}。
+    名前は登録順 (中間テーブルのID順) で、著者・訳者のいない書籍は
+    空のタプル
+    """
+    AUTHOR = 'author'
+    TRANSLATOR = 'translator'
+
+    def __init__(self, book_ids):
+        self._book_ids = list(book_ids)
+
+    def exec(self):
+        names = {
+            pk: {self.AUTHOR: [], self.TRANSLATOR: []}
+            for pk in self._book_ids
+        }
+        if not names:
+            return {}
+        authors = self._rows(
+            Author.books.through, self.AUTHOR, 'author__name')
+        translators = self._rows(
+            Translator.books.through, self.TRANSLATOR, 'translator__name')
+        rows = authors.union(translators, all=True).order_by('kind', 'id')
+        for kind, _, book_id, name in rows:
+            names[book_id][kind].append(name)
+        return {
+            pk: {kind: tuple(values) for kind, values in book_names.items()}
+            for pk, book_names in names.items()
+        }
+
+    def _rows(self, through, kind, name):
+        return (
+            through.objects
+                   .filter(book_id__in=self._book_ids)
+                   .annotate(kind=Value(kind, CharField()), name=F(name))
+                   .values_list('kind', 'id', 'book_id', 'name')
+        )
@@ -1,29 +1,474 @@
-from functools import reduce
+from collections import defaultdict
+from functools import partial, reduce
+from heapq import nlargest
 from operator import or_
 
-from django.db.models import Q
+from django.db.models import Count, F, Q
+from django.utils.functional import cached_property
 
+from opac.models.caches import CacheVersion
 from opac.models.masters import Book
+from opac.models.search import BookSearchDocument, BookSearchPosting
+from opac.queries.book.availability import BookAvailabilityFilterQuery
+from opac.queries.book.index_file import BookSearchIndexFileQuery
+from opac.queries.book.statistics import BookSearchStatisticsQuery
+from opac.queries.cache_version import CacheVersionGetQuery
+from opac.search import matches_prefix, query_phrases, query_terms
+from opac.search.cache import search_result_cache
+from opac.search.query import (
+    And,
+    Isbn,
+    Not,
+    Or,
+    Phrase,
+    Term,
+    YearRange,
+    parse
+)
+from opac.search.ranking import BM25F
 
 
 class BookSearchQuery:
-    def __init__(self, words):
-        self._words = words
+    """転置索引を使って、検索式に該当する書籍を検索するクエリ。
+
+    検索式は parse で構文木にしたうえで BookSearchPlan で組み立てるので、
+    語どうしを一つの大きな OR で結ぶのではなく、絞り込みの強い条件から順に
+    書籍IDを絞り込みます。
+    正規化済みの検索文書と照合するので、行ごとの正規化は行いません。
+
+    書籍そのものではなく、並び順どおりの書籍IDの遅延シーケンスを返すので、
+    件数の取得やページの切り出しは書籍を読み込まずに行えます。
+    表示する書籍は BookListQuery でページ分だけ取得してください。
+
+    Parameters
+    ----------
+    query
+        検索式、または parse で変換した構文木
+    order
+        ISSUE_DATE なら発行日の新しい順、RELEVANCE なら適合度の高い順
+    lendable
+        True なら、貸出可能な蔵書がある書籍に限る
+    library
+        図書館の番号。指定した場合は、その図書館の蔵書がある書籍に限る
+        (lendable と合わせて指定すると、その図書館に貸出可能な蔵書があるもの)
+    """
+    ISSUE_DATE = 'issue_date'
+    RELEVANCE = 'relevance'
+
+    def __init__(self, query, order=ISSUE_DATE, lendable=False, library=None):
+        if isinstance(query, str):
+            query = parse(query)
+        self._query = query
+        self._order = order
+        self._lendable = lendable
+        self._library = library
 
     def exec(self):
-        querysets = (
+        if self._query is None:
+            books = Book.objects.none()
+        else:
+            book_ids = BookSearchPlan(self._query).book_ids()
+            books = Book.objects.filter(pk__in=book_ids)
+        books = BookAvailabilityFilterQuery(
+            books, self._lendable, self._library).exec()
+        queryset = books.values_list('id', flat=True)
+        if self._order == self.RELEVANCE:
+            return RankedBookIds(queryset, self._ranking_terms())
+        return queryset.order_by(
+            F('issue_date').desc(nulls_last=True), 'id')
+
+    def _ranking_terms(self):
+        if self._query is None:
+            return set()
+        return set().union(
+            *(query_terms(node.text) for node in self._query.terms()))
+
+
+class BookSearchPlan:
+    """検索式の構文木を、書籍IDを絞り込むサブクエリに組み立てる。
+
+    Detail
+    ------
+    AND で結ばれた条件は、該当する書籍の数の見積もりが少ないものから順に、
+    それまでに絞り込んだ書籍IDの中から探すサブクエリとして入れ子にします。
+    見積もりには転置索引の検索語ごとの書籍の数を使い、検索式に含まれる
+    検索語の分をまとめて1回のクエリで取得します。
+    英数字の検索語は、索引の検索語の前方一致で引きます (matches_prefix)。
+
+    - 検索語 : 検索語を含む書籍の数
+    - ISBN : 1
+    - 発行年 : 範囲に含まれる書籍の数。他に見積もりのある条件と AND で
+      結ばれていれば、数えずにそれらの後
+    - OR : 子の見積もりの和
+    - AND : 子の見積もりの最小値
+    - 句の照合と NOT : 絞り込んだ後に行うため、最後
+    """
+    # 見積もりを持たない条件は、他の条件で絞り込んだ後に評価する
+    UNBOUNDED = float('inf')
+
+    def __init__(self, query):
+        self._query = query
+        self._document_frequencies = self._count_postings()
+
+    def book_ids(self):
+        """該当する書籍のIDのサブクエリを返す。"""
+        return self._book_ids(self._query, None)
+
+    def _book_ids(self, node, candidates):
+        if isinstance(node, Or):
+            return self._union(node.children, candidates)
+        if isinstance(node, And):
+            return self._intersect(node.children, candidates)
+        return self._intersect([node], candidates)
+
+    def _intersect(self, nodes, candidates):
+        clauses = []
+        excluded = []
+        for node in nodes:
+            if isinstance(node, Not):
+                excluded.append(node.child)
+            else:
+                clauses.extend(self._clauses(node))
+        # 条件が一つなら並べ替えないので、見積もりも求めない
+        if len(clauses) > 1:
+            # sorted は安定なので、見積もりが同じ条件は検索式の順に評価する
+            clauses = sorted(
+                self._resolve(clauses), key=lambda clause: clause[0])
+        for _, restrict in clauses:
+            candidates = restrict(candidates)
+        if candidates is None:
+            candidates = Book.objects.values('id')
+        for node in excluded:
+            candidates = (
+                Book.objects
+                    .filter(pk__in=candidates)
+                    .exclude(pk__in=self._book_ids(node, None))
+                    .values('id')
+            )
+        return candidates
+
+    def _union(self, nodes, candidates):
+        conditions = (
+            Q(pk__in=self._book_ids(node, candidates)) for node in nodes)
+        return Book.objects.filter(reduce(or_, conditions)).values('id')
+
+    def _clauses(self, node):
+        """条件を (見積もり, 書籍IDを絞り込む関数) のリストに分解する。
+
+        発行年の見積もりは件数を数えるクエリが必要なので、数える関数の
+        ままにしておき、_resolve_estimates で必要なときだけ数えます。
+        """
+        if isinstance(node, (Term, Phrase)):
+            clauses = [
+                (self._estimate_term(term, node.field),
+                 partial(self._postings, term, node.field))
+                for term in query_terms(node.text)
+            ]
+            phrases = query_phrases(node.text)
+            if isinstance(node, Phrase):
+                phrases = {node.text}
+            clauses.extend(
+                (self.UNBOUNDED, partial(self._phrase, phrase, node.field))
+                for phrase in phrases
+            )
+            return clauses
+        if isinstance(node, Isbn):
+            return [(1, partial(self._books, Q(isbn13=node.isbn13)))]
+        if isinstance(node, YearRange):
+            condition = self._year_condition(node)
+            return [(partial(self._count_books, condition),
+                     partial(self._books, condition))]
+        return [(self._estimate(node), partial(self._book_ids, node))]
+
+    def _resolve(self, clauses):
+        estimates = self._resolve_estimates(
+            [estimate for estimate, _ in clauses])
+        return [
+            (estimate, restrict)
+            for estimate, (_, restrict) in zip(estimates, clauses)
+        ]
+
+    def _resolve_estimates(self, estimates):
+        """発行年の見積もり (数える関数) を数値にする。
+
+        他に見積もりのある条件があれば、発行年の件数は数えずに、
+        それらの条件の後に評価する見積もりにします (発行年の条件は書籍の
+        項目との比較なので、候補を絞った後なら安く評価できます)。
+        """
+        counted = [
+            estimate for estimate in estimates
+            if not callable(estimate) and estimate < self.UNBOUNDED
+        ]
+        return [
+            (max(counted) if counted else estimate())
+            if callable(estimate) else estimate
+            for estimate in estimates
+        ]
+
+    def _estimate(self, node):
+        """条件に該当する書籍の数を見積もる。
+
+        OR は子の見積もりの和、AND は子の見積もりの最小値です。
+        子の見積もりから求めるので、見積もる条件そのものを _clauses で
+        分解し直すことはありません。
+        """
+        if isinstance(node, Or):
+            return sum(self._estimate(child) for child in node.children)
+        if isinstance(node, Not):
+            return self.UNBOUNDED
+        if isinstance(node, And):
+            estimates = [
+                partial(self._estimate, child)
+                if isinstance(child, YearRange) else self._estimate(child)
+                for child in node.children
+            ]
+        else:
+            estimates = [estimate for estimate, _ in self._clauses(node)]
+        return min(self._resolve_estimates(estimates),
+                   default=self.UNBOUNDED)
+
+    def _estimate_term(self, term, field):
+        frequencies = self._document_frequencies.get(term, {})
+        if field:
+            return frequencies.get(field, 0)
+        return sum(frequencies.values())
+
+    def _count_postings(self):
+        # 除外する語の見積もりも必要なので、NOT の中の語も含める
+        terms = sorted(set().union(*(
+            query_terms(node.text)
+            for node in self._query.terms(negated=True))))
+        if not terms:
+            return {}
+        index_file = BookSearchIndexFileQuery().exec()
+        if index_file:
+            return {t: self._file_frequencies(index_file, t) for t in terms}
+        # 前方一致の検索語があるので、検索語ごとの書籍の数を項目ごとに
+        # 条件付きの集計で数える
+        conditions = [_term_condition(term) for term in terms]
+        queryset = (
+            BookSearchPosting.objects
+                             .filter(reduce(or_, conditions))
+                             .values_list('field')
+                             .annotate(**{
+                                 f'count{i}': Count(
+                                     'book_id', distinct=True, filter=c)
+                                 for i, c in enumerate(conditions)
+                             })
+        )
+        document_frequencies = defaultdict(dict)
+        for field, *counts in queryset:
+            for term, count in zip(terms, counts):
+                if count:
+                    document_frequencies[term][field] = count
+        return document_frequencies
+
+    def _file_frequencies(self, index_file, term):
+        if not matches_prefix(term):
+            return index_file.document_frequencies(term)
+        # 前方一致で引く語の見積もりは、該当する検索語ごとの数の和
+        # (複数の検索語を含む書籍は重ねて数える)
+        frequencies = defaultdict(int)
+        for matched in index_file.prefix_terms(term):
+            for field, count in \
+                    index_file.document_frequencies(matched).items():
+                frequencies[field] += count
+        return frequencies
+
+    def _postings(self, term, field, candidates):
+        queryset = BookSearchPosting.objects.filter(_term_condition(term))
+        if field:
+            queryset = queryset.filter(field=field)
+        if candidates is not None:
+            queryset = queryset.filter(book_id__in=candidates)
+        return queryset.values('book_id')
+
+    def _phrase(self, phrase, field, candidates):
+        fields = [field] if field else \
+            [field for field, _ in BookSearchPosting.FIELD_CHOICES]
+        condition = reduce(or_, (
+            Q(**{f'{field}__contains': phrase}) for field in fields))
+        queryset = BookSearchDocument.objects.filter(condition)
+        if candidates is not None:
+            queryset = queryset.filter(book_id__in=candidates)
+        return queryset.values('book_id')
+
+    def _count_books(self, condition):
+        return Book.objects.filter(condition).count()
+
+    def _books(self, condition, candidates):
+        queryset = Book.objects.filter(condition)
+        if candidates is not None:
+            queryset = queryset.filter(pk__in=candidates)
+        return queryset.values('id')
+
+    def _year_condition(self, year_range):
+        condition = Q()
+        if year_range.start:
+            condition &= Q(issue_date__year__gte=year_range.start)
+        if year_range.end:
+            condition &= Q(issue_date__year__lte=year_range.end)
+        return condition
+
+
+def _term_condition(term):
+    if matches_prefix(term):
+        return Q(term__startswith=term)
+    return Q(term=term)
+
+
+class RankedBookIds:
+    """適合度の高い順 (同点なら書籍番号順) に並べた書籍IDの遅延シーケンス。
+
+    スライスされた時点で該当する書籍の適合度を計算し、必要な件数だけを
+    ヒープで選び出すので、ページより後ろの書籍は並べ替えません。
+    ただし適合度は該当するすべての書籍について計算するので、検索画面では
+    利用者が関連度順を選んだ場合だけ使います。
+    検索文書の無い (索引を作る前の) 書籍は、項目の長さを平均とみなします。
+
+    Parameters
+    ----------
+    queryset
+        該当する書籍のIDのクエリセット
+    terms
+        適合度の計算に使う検索語の集合
+    """
+    def __init__(self, queryset, terms):
+        self._queryset = queryset.order_by()
+        self._terms = terms
+
+    @property
+    def queryset(self):
+        """該当する書籍のIDのクエリセット (順不同)。"""
+        return self._queryset
+
+    def filter(self, *args, **kwargs):
+        """該当する書籍を絞り込んだ RankedBookIds を返す。"""
+        return RankedBookIds(self._queryset.filter(*args, **kwargs),
+                             self._terms)
+
+    def count(self):
+        return len(self._scores)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            stop = self.count() if index.stop is None else index.stop
+            return self._top(stop)[index]
+        return self._top(index + 1)[index]
+
+    def _top(self, k):
+        top = nlargest(k, ((s, -pk) for pk, s in self._scores.items()))
+        return [-negative_pk for _, negative_pk in top]
+
+    @cached_property
+    def _scores(self):
+        book_ids = self._queryset.values('id')
+        document_count, average_lengths = BookSearchStatisticsQuery().exec()
+        lengths = self._lengths(book_ids, average_lengths)
+        # 索引ファイルがあれば、転置索引の集計はデータベースではなく
+        # ファイルから読む
+        index_file = BookSearchIndexFileQuery().exec()
+        if index_file:
+            frequencies = self._file_frequencies(index_file, lengths.keys())
+            document_frequencies = {
+                term: index_file.book_count(term) for term in self._terms}
+        else:
+            frequencies = self._frequencies(book_ids)
+            document_frequencies = self._document_frequencies()
+        bm25f = BM25F(document_count, average_lengths)
+        return {
+            pk: bm25f.score(frequencies[pk], lengths[pk], document_frequencies)
+            for pk in lengths
+        }
+
+    def _lengths(self, book_ids, average_lengths):
+        fields = [field for field, _ in BookSearchPosting.FIELD_CHOICES]
+        # 検索文書の無い書籍も落とさないよう、書籍から外部結合で読む
+        queryset = (
             Book.objects
-                .select_related('publisher')
-                .prefetch_related('authors')
-                .prefetch_related('translators')
-                .filter(
-                    Q(name__icontains=word) |
-                    Q(authors__name__icontains=word) |
-                    Q(translators__name__icontains=word) |
-                    Q(publisher__name__icontains=word))
-                .distinct()
-            for word in self._words
+                .filter(pk__in=book_ids)
+                .values_list('id', *(
+                    f'search_document__{f}_length' for f in fields))
         )
-        return list(
-            reduce(or_, querysets).order_by('-issue_date')
+        return {
+            row[0]: average_lengths if row[1] is None
+            else dict(zip(fields, row[1:]))
+            for row in queryset
+        }
+
+    def _frequencies(self, book_ids):
+        queryset = (
+            BookSearchPosting.objects
+                             .filter(term__in=self._terms)
+                             .filter(book_id__in=book_ids)
+                             .values_list(
+                                 'book_id', 'term', 'field', 'frequency')
         )
+        frequencies = defaultdict(lambda: defaultdict(dict))
+        for book_id, term, field, frequency in queryset:
+            frequencies[book_id][term][field] = frequency
+        return frequencies
+
+    def _file_frequencies(self, index_file, book_ids):
+        frequencies = defaultdict(lambda: defaultdict(dict))
+        for term in self._terms:
+            for book_id, field, frequency in index_file.frequencies(
+                    term, book_ids):
+                frequencies[book_id][term][field] = frequency
+        return frequencies
+
+    def _document_frequencies(self):
+        queryset = (
+            BookSearchPosting.objects
+                             .filter(term__in=self._terms)
+                             .values_list('term')
+                             .annotate(Count('book_id', distinct=True))
+        )
+        return dict(queryset)
+
+
+class CachedBookSearchQuery:
+    """BookSearchQuery の結果を書籍IDのリストとしてキャッシュするクエリ。
+
+    キャッシュのキーには検索式の構文木と蔵書目録のバージョンを含めるので、
+    書籍・著者・訳者・出版者が更新された後に古い結果を返すことはありません。
+    キャッシュに収まらない件数の結果は、BookSearchQuery の遅延シーケンスを
+    そのまま返します。
+
+    Parameters
+    ----------
+    query
+        検索式、または parse で変換した構文木
+    order
+        BookSearchQuery の並び順
+    cache
+        使用するキャッシュ
+    version
+        読み込み済みの蔵書目録のバージョン。None ならデータベースから読み込む
+    """
+    def __init__(self, query, order=BookSearchQuery.ISSUE_DATE,
+                 cache=search_result_cache, version=None):
+        if isinstance(query, str):
+            query = parse(query)
+        self._query = query
+        self._order = order
+        self._cache = cache
+        self._version = version
+
+    def exec(self):
+        version = self._version
+        if version is None:
+            version = CacheVersionGetQuery(CacheVersion.CATALOG).exec()
+        key = (version, self._order, self._query)
+        book_ids = self._cache.get(key)
+        if book_ids is not None:
+            return book_ids
+
+        result = BookSearchQuery(self._query, self._order).exec()
+        book_ids = list(result[:self._cache.max_entry_size + 1])
+        if self._cache.set(key, book_ids):
+            return book_ids
+        return result
@@ -0,0 +1,34 @@
+from django.db.models import Avg, Count
+
+from opac.models.caches import CacheVersion
+from opac.models.search import BookSearchDocument, BookSearchPosting
+from opac.queries.cache_version import CacheVersionGetQuery
+
+
+class BookSearchStatisticsQuery:
+    """適合度の計算に使う、索引全体の統計を取得するクエリ。
+
+    集計は蔵書目録のバージョンごとに一度だけ行い、プロセス内に保持します。
+    """
+    _cache = {}
+
+    def exec(self):
+        """クエリを実行する。
+
+        Returns
+        -------
+        (書籍の数, {項目: 検索語の数の平均})
+        """
+        version = CacheVersionGetQuery(CacheVersion.CATALOG).exec()
+        if version not in self._cache:
+            fields = [field for field, _ in BookSearchPosting.FIELD_CHOICES]
+            aggregate = BookSearchDocument.objects.aggregate(
+                count=Count('pk'),
+                **{field: Avg(f'{field}_length') for field in fields}
+            )
+            self._cache.clear()
+            self._cache[version] = (
+                aggregate.pop('count'),
+                {field: avg or 0 for field, avg in aggregate.items()}
+            )
+        return self._cache[version]
@@ -1,18 +1,61 @@
+from collections import namedtuple
+
+from django.db.models import Case, CharField, Count, F, Value, When
+from django.db.models.functions import Coalesce
+
 from opac.models.masters import Stock
 
 
+class StockRow(namedtuple('StockRow', (
+        'id library_name status due_date expiration_date '
+        'reservation_count'))):
+    """所蔵情報の1行に表示する蔵書の内容 (読み取り専用)。"""
+    __slots__ = ()
+
+
 class BookStocksQuery:
+    """書籍の蔵書を、状態を集計して取得するクエリ。
+
+    蔵書ごとに次の値を持つ StockRow を、図書館の番号順に返します。
+    すべて1回のクエリで求めるので、テンプレートでは蔵書の貸出・取置・予約を
+    読み込まずに表示できます。モデルのインスタンスは作りません。
+
+    - library_name : 所蔵している図書館の館名
+    - status : LENDABLE (貸出可能) / LENT (貸出中) / HELD (取置中)
+    - due_date : 返却期限 (延長されていれば延長期限)。貸出中でなければ None
+    - expiration_date : 取置期限。取置中でなければ None
+    - reservation_count : 予約の数
+
+    Parameters
+    ----------
+    book_id
+        書籍のID
+    """
+    LENDABLE = 'lendable'
+    LENT = 'lent'
+    HELD = 'held'
+
     def __init__(self, book_id):
         self._book_id = book_id
 
     def exec(self):
+        return [StockRow(*row) for row in self._rows()]
+
+    def _rows(self):
         return (
             Stock.objects
                  .filter(book_id=self._book_id)
-                 .select_related('library')
-                 .select_related('lending')
-                 .select_related('lending__renewing')
-                 .select_related('holding')
-                 .prefetch_related('reservations')
+                 .annotate(
+                     library_name=F('library__name'),
+                     status=Case(
+                         When(lending__isnull=False, then=Value(self.LENT)),
+                         When(holding__isnull=False, then=Value(self.HELD)),
+                         default=Value(self.LENDABLE),
+                         output_field=CharField()),
+                     due_date=Coalesce(
+                         'lending__renewing__due_date', 'lending__due_date'),
+                     expiration_date=F('holding__expiration_date'),
+                     reservation_count=Count('reservations'))
                  .order_by('library__id')
+                 .values_list(*StockRow._fields)
         )
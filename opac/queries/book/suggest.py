@@ -0,0 +1,147 @@
+from itertools import chain
+from logging import getLogger
+from threading import Thread
+
+from django.conf import settings
+from django.db import connection
+
+from opac.models.caches import CacheVersion
+from opac.models.masters import Author, Book, Publisher, Translator
+from opac.queries.cache_version import CacheVersionGetQuery
+from opac.search.suggest import (
+    AUTHOR,
+    PUBLISHER,
+    TITLE,
+    TRANSLATOR,
+    suggest_index
+)
+
+logger = getLogger(__name__)
+
+SUGGEST_KINDS = {
+    Book: TITLE,
+    Author: AUTHOR,
+    Translator: TRANSLATOR,
+    Publisher: PUBLISHER,
+}
+
+
+class BookSuggestQuery:
+    """入力途中の文字列に前方一致する書名・著者名・訳者名・出版者名を返すクエリ。
+
+    プロセス内の前方一致索引から答えるので、データベースへの問い合わせは
+    蔵書目録のバージョンの確認だけです。バージョンが索引と違う場合
+    (他のプロセスで蔵書目録が更新された場合) は、別スレッドで索引を
+    作り直し、作り直している間は古い索引で答えます。
+
+    Parameters
+    ----------
+    prefix
+        入力途中の文字列
+    limit
+        返す件数の上限
+    index
+        使用する前方一致索引
+    """
+    def __init__(self, prefix, limit=10, index=suggest_index):
+        self._prefix = prefix
+        self._limit = limit
+        self._index = index
+
+    def exec(self):
+        """クエリを実行する。
+
+        Detail
+        ------
+        1. 蔵書目録のバージョンを読み込む
+        2. 索引が未構築なら、その場で構築する
+        3. 索引のバージョンが違えば、作り直しを始める
+           (設定 OPAC_SUGGEST_INDEX の rebuild_in_background が True なら
+           別スレッドで作り直し、終わるまでは古い索引で答える)
+        4. 索引から前方一致する名前を引く
+
+        Returns
+        -------
+        (種類, 番号, 名前) のリスト
+        """
+        version = CacheVersionGetQuery(CacheVersion.CATALOG).exec()
+        if self._index.version is None:
+            self._index.rebuild(self._entries(), version)
+        elif self._index.version != version and self._index.start_rebuild():
+            if settings.OPAC_SUGGEST_INDEX['rebuild_in_background']:
+                Thread(target=self._rebuild_in_background, daemon=True) \
+                    .start()
+            else:
+                self._rebuild(version)
+        return self._index.search(self._prefix, self._limit)
+
+    def _rebuild(self, version):
+        try:
+            self._index.rebuild(self._entries(), version)
+        finally:
+            self._index.finish_rebuild()
+
+    def _rebuild_in_background(self):
+        # 別スレッドでは接続が別になるので、バージョンから読み直す
+        try:
+            self._rebuild(
+                CacheVersionGetQuery(CacheVersion.CATALOG).exec())
+        except Exception:
+            logger.exception('Failed to rebuild the suggest index')
+        finally:
+            connection.close()
+
+    def _entries(self):
+        return chain.from_iterable(
+            ((kind, pk, name)
+             for pk, name in model.objects.values_list('pk', 'name'))
+            for model, kind in SUGGEST_KINDS.items()
+        )
+
+
+class SuggestIndexUpdateQuery:
+    """保存・削除された書籍・著者・訳者・出版者を前方一致索引に反映するクエリ。
+
+    索引のバージョンは変えません。蔵書目録のバージョンを上げたときに
+    SuggestIndexAdvanceQuery で上げてください。
+
+    Parameters
+    ----------
+    instance
+        保存・削除されたモデルのインスタンス
+    deleted
+        削除された場合は True
+    index
+        使用する前方一致索引
+    """
+    def __init__(self, instance, deleted=False, index=suggest_index):
+        self._instance = instance
+        self._deleted = deleted
+        self._index = index
+
+    def exec(self):
+        kind = SUGGEST_KINDS[type(self._instance)]
+        name = None if self._deleted else self._instance.name
+        self._index.update(kind, self._instance.pk, name)
+
+
+class SuggestIndexAdvanceQuery:
+    """このプロセスで上げた蔵書目録のバージョンを、前方一致索引に反映するクエリ。
+
+    索引が更新前のバージョンのものである場合だけ、索引のバージョンを
+    上げます。他のプロセスの更新を反映していない索引は古いままとなり、
+    次の BookSuggestQuery で作り直されます。
+
+    Parameters
+    ----------
+    change
+        CacheVersionBumpQuery の結果
+    index
+        使用する前方一致索引
+    """
+    def __init__(self, change, index=suggest_index):
+        self._change = change
+        self._index = index
+
+    def exec(self):
+        self._index.advance(self._change.previous, self._change.value)
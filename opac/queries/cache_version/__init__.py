@@ -0,0 +1,3 @@
+from .bump import *  # noqa: F401 F403
+from .get import *  # noqa: F401 F403
+from .book import *  # noqa: F401 F403
@@ -0,0 +1,74 @@
+from uuid import uuid4
+
+from django.db import transaction
+from django.db.models import CharField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from opac.models.caches import CacheVersion
+
+
+class BookCacheVersionBumpQuery:
+    """書籍ごとのキャッシュバージョンを、まとめて新しい値に更新するクエリ。
+    アトミックです。
+
+    Parameters
+    ----------
+    kind
+        CacheVersion.BOOK または CacheVersion.CIRCULATION
+    book_ids
+        対象の書籍のIDの iterable
+    keys
+        書籍ごとのバージョンと同じ UPDATE で更新する、他のキーの iterable
+    """
+    def __init__(self, kind, book_ids, keys=()):
+        self._kind = kind
+        self._book_ids = set(book_ids)
+        self._keys = set(keys)
+
+    @transaction.atomic
+    def exec(self):
+        """クエリを実行する。
+
+        Returns
+        -------
+        新しいバージョン。対象の書籍が無ければ None
+        """
+        if not self._book_ids:
+            return None
+        keys = self._keys | {
+            CacheVersion.book_key(self._kind, pk) for pk in self._book_ids
+        }
+        value = uuid4().hex
+        versions = CacheVersion.objects.filter(key__in=keys)
+        updated = versions.update(value=value, updated_at=timezone.now())
+        if updated < len(keys):
+            # 一度も更新されていない書籍の分だけ作る
+            existing = set(versions.values_list('key', flat=True))
+            for key in keys - existing:
+                CacheVersion.objects.update_or_create(
+                    key=key, defaults={'value': value})
+        return value
+
+
+class BookCacheVersion(Subquery):
+    """書籍のクエリセットに、書籍ごとのキャッシュバージョンを付ける式。
+
+    一度も更新されていなければ None になります。
+
+    Parameters
+    ----------
+    kind
+        CacheVersion.BOOK または CacheVersion.CIRCULATION
+    book_ref
+        書籍のIDを指す外側のクエリの項目名
+    field
+        取得する CacheVersion の項目名。'updated_at' なら更新日時
+    """
+    def __init__(self, kind, book_ref='pk', field='value'):
+        key = Concat(
+            Value(CacheVersion.book_key(kind, '')),
+            Cast(OuterRef(book_ref), CharField()))
+        super().__init__(
+            CacheVersion.objects.filter(key=key).values(field)[:1],
+            output_field=CacheVersion._meta.get_field(field))
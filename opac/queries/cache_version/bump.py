@@ -0,0 +1,58 @@
+from collections import namedtuple
+from uuid import uuid4
+
+from django.db import transaction
+from django.utils import timezone
+
+from opac.models.caches import CacheVersion
+
+
+class CacheVersionChange(namedtuple('CacheVersionChange', 'previous value')):
+    """キャッシュバージョンの更新 (読み取り専用)。
+
+    Attributes
+    ----------
+    previous
+        更新前のバージョン。一度も更新されていなければ空文字列
+    value
+        新しいバージョン
+    """
+    __slots__ = ()
+
+
+class CacheVersionBumpQuery:
+    """キャッシュバージョンを新しい値に更新するクエリ。アトミックです。
+
+    Parameters
+    ----------
+    key
+        キャッシュバージョンのキー
+    """
+    def __init__(self, key):
+        self._key = key
+
+    @transaction.atomic
+    def exec(self):
+        """クエリを実行する。
+
+        Returns
+        -------
+        CacheVersionChange
+        """
+        value = uuid4().hex
+        # 更新前のバージョンを、他の更新と入れ違わないように行をロックして読む
+        previous = (
+            CacheVersion.objects
+                        .select_for_update()
+                        .filter(key=self._key)
+                        .values_list('value', flat=True)
+                        .first()
+        )
+        if previous is None:
+            CacheVersion.objects.update_or_create(
+                key=self._key, defaults={'value': value})
+            return CacheVersionChange('', value)
+        CacheVersion.objects \
+            .filter(key=self._key) \
+            .update(value=value, updated_at=timezone.now())
+        return CacheVersionChange(previous, value)
@@ -0,0 +1,48 @@
+from opac.models.caches import CacheVersion
+
+
+class CacheVersionGetQuery:
+    """キャッシュバージョンを取得するクエリ。
+
+    Parameters
+    ----------
+    key
+        キャッシュバージョンのキー
+    """
+    def __init__(self, key):
+        self._key = key
+
+    def exec(self):
+        """クエリを実行する。
+
+        Returns
+        -------
+        バージョン。一度も更新されていなければ空文字列
+        """
+        return (
+            CacheVersion.objects
+                        .filter(key=self._key)
+                        .values_list('value', flat=True)
+                        .first()
+        ) or ''
+
+
+class CacheVersionsGetQuery:
+    """複数のキャッシュバージョンを、1回のクエリで取得するクエリ。
+
+    Parameters
+    ----------
+    keys
+        キャッシュバージョンのキーのリスト
+    """
+    def __init__(self, keys):
+        self._keys = list(keys)
+
+    def exec(self):
+        """クエリを実行する。
+
+        Returns
+        -------
+        {キー: CacheVersion}。一度も更新されていないキーは含まない
+        """
+        return CacheVersion.objects.in_bulk(self._keys, field_name='key')
@@ -1,2 +1,3 @@
 from .lend import *  # noqa: F401 F403
 from .cancel import *  # noqa: F401 F403
+from .bulk_lend import *  # noqa: F401 F403
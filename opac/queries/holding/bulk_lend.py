@@ -0,0 +1,117 @@
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import Error, IntegrityError, transaction
+from django.utils import timezone
+
+from opac.models.transactions import Holding, Lending
+from opac.queries.errors import AlreadyExistsError, QueryError
+
+
+class HoldingLendResult(
+        namedtuple('HoldingLendResult', 'holding_id book_id status lending')):
+    """まとめて貸出にした取置1件ごとの結果 (読み取り専用)。
+
+    Attributes
+    ----------
+    holding_id
+        取置のID
+    book_id
+        蔵書の書籍のID。取置が見つからなかった場合は None
+    status
+        HoldingBulkLendQuery の LENT / LENDING_ALREADY_EXISTS / NOT_FOUND
+    lending
+        作成した貸出。作成しなかった場合は None
+    """
+    __slots__ = ()
+
+
+class HoldingBulkLendQuery:
+    """複数の取置の貸出処理を、まとめて行うクエリ。アトミックです。
+
+    取置の数によらず、一定の回数のクエリで処理します。貸出にできない取置が
+    あっても中断せず、取置ごとの結果を返します。
+
+    Parameters
+    ----------
+    holdings
+        対象の取置の iterable
+    """
+    LENT = 'lent'
+    LENDING_ALREADY_EXISTS = 'lending_already_exists'
+    NOT_FOUND = 'not_found'
+
+    def __init__(self, holdings):
+        self._holding_ids = [holding.id for holding in holdings]
+
+    @transaction.atomic
+    def exec(self):
+        """クエリを実行する。
+
+        Detail
+        ------
+        1. 取置と蔵書の書籍のIDを読み込む
+        2. 既に貸出がある蔵書を読み込む (これらの蔵書の取置は貸出にしない)
+        3. 取置に対応する貸出を bulk_create で作成する
+        4. 貸出にした取置をまとめて削除する
+
+        Returns
+        -------
+        HoldingLendResult のリスト (holdings の順)
+
+        Raises
+        ------
+        AlreadyExistsError
+            処理中に、他の処理が貸出を作成した場合
+        QueryError
+            その他のエラーが発生した場合
+        """
+        try:
+            return self._exec()
+        except IntegrityError as e:
+            raise AlreadyExistsError(self._holding_ids, e)
+        except Error as e:
+            raise QueryError(self._holding_ids, e)
+
+    def _exec(self):
+        holdings = {
+            pk: (stock_id, user_id, book_id)
+            for pk, stock_id, user_id, book_id in (
+                Holding.objects
+                       .filter(pk__in=self._holding_ids)
+                       .values_list(
+                           'pk', 'stock_id', 'user_id', 'stock__book_id')
+            )
+        }
+        lent_stock_ids = set(
+            Lending.objects
+                   .filter(stock_id__in=[
+                       stock_id for stock_id, _, _ in holdings.values()])
+                   .values_list('stock_id', flat=True)
+        )
+
+        due_date = timezone.localdate() + timedelta(days=14)
+        lendings = {
+            pk: Lending(stock_id=stock_id, user_id=user_id, due_date=due_date)
+            for pk, (stock_id, user_id, _) in holdings.items()
+            if stock_id not in lent_stock_ids
+        }
+        Lending.objects.bulk_create(lendings.values())
+        Holding.objects.filter(pk__in=lendings).delete()
+
+        def status(pk):
+            if pk in lendings:
+                return self.LENT
+            if pk in holdings:
+                return self.LENDING_ALREADY_EXISTS
+            return self.NOT_FOUND
+
+        return [
+            HoldingLendResult(
+                holding_id=pk,
+                book_id=holdings[pk][2] if pk in holdings else None,
+                status=status(pk),
+                lending=lendings.get(pk)
+            )
+            for pk in self._holding_ids
+        ]
@@ -1 +1,2 @@
 from .back import *  # noqa: F401 F403
+from .bulk_back import *  # noqa: F401 F403
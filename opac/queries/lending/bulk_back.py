@@ -0,0 +1,156 @@
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import Error, IntegrityError, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from opac.models.transactions import Holding, Lending, Reservation
+from opac.queries.errors import AlreadyExistsError, QueryError
+
+
+class LendingBackResult(
+        namedtuple('LendingBackResult', 'lending_id book_id status holding')):
+    """まとめて返却した貸出1件ごとの結果 (読み取り専用)。
+
+    Attributes
+    ----------
+    lending_id
+        貸出のID
+    book_id
+        蔵書の書籍のID。貸出が見つからなかった場合は None
+    status
+        LendingBulkBackQuery の BACKED / HELD / HOLDING_ALREADY_EXISTS /
+        NOT_FOUND、または LendingBulkBackService の MAIL_FAILED
+    holding
+        作成した取置。作成しなかった場合は None
+    """
+    __slots__ = ()
+
+    @property
+    def is_backed(self):
+        return self.status not in (
+            LendingBulkBackQuery.HOLDING_ALREADY_EXISTS,
+            LendingBulkBackQuery.NOT_FOUND
+        )
+
+
+class LendingBulkBackQuery:
+    """複数の貸出の返却処理を、まとめて行うクエリ。アトミックです。
+
+    貸出の数によらず、一定の回数のクエリで処理します。返却できない貸出が
+    あっても中断せず、貸出ごとの結果を返します。
+
+    Parameters
+    ----------
+    lendings
+        対象の貸出の iterable
+    """
+    BACKED = 'backed'
+    HELD = 'held'
+    HOLDING_ALREADY_EXISTS = 'holding_already_exists'
+    NOT_FOUND = 'not_found'
+
+    def __init__(self, lendings):
+        self._lending_ids = [lending.id for lending in lendings]
+
+    @transaction.atomic
+    def exec(self):
+        """クエリを実行する。
+
+        Detail
+        ------
+        1. 貸出と蔵書の書籍のIDを読み込む
+        2. 蔵書ごとの最初の予約 (受付番号の最も小さい予約) を読み込む
+        3. 最初の予約がある蔵書のうち、既に取置がある蔵書を読み込む
+           (これらの蔵書の貸出は返却しない)
+        4. 貸出をまとめて削除する
+        5. 最初の予約に対応する取置を bulk_create で作成する
+        6. 取置にした予約をまとめて削除する
+
+        Returns
+        -------
+        LendingBackResult のリスト (lendings の順)
+
+        Raises
+        ------
+        AlreadyExistsError
+            処理中に、他の処理が取置を作成した場合
+        QueryError
+            その他のエラーが発生した場合
+        """
+        try:
+            return self._exec()
+        except IntegrityError as e:
+            raise AlreadyExistsError(self._lending_ids, e)
+        except Error as e:
+            raise QueryError(self._lending_ids, e)
+
+    def _exec(self):
+        lendings = {
+            pk: (stock_id, book_id)
+            for pk, stock_id, book_id in (
+                Lending.objects
+                       .filter(pk__in=self._lending_ids)
+                       .values_list('pk', 'stock_id', 'stock__book_id')
+            )
+        }
+        stock_ids = {stock_id for stock_id, _ in lendings.values()}
+        reservations = self._first_reservations(stock_ids)
+        held_stock_ids = set(
+            Holding.objects
+                   .filter(stock_id__in=reservations)
+                   .values_list('stock_id', flat=True)
+        )
+
+        expiration_date = timezone.localdate() + timedelta(days=14)
+        statuses = {}
+        holdings = {}
+        for pk, (stock_id, _) in lendings.items():
+            reservation = reservations.get(stock_id)
+            if reservation is None:
+                statuses[pk] = self.BACKED
+            elif stock_id in held_stock_ids:
+                statuses[pk] = self.HOLDING_ALREADY_EXISTS
+            else:
+                statuses[pk] = self.HELD
+                holdings[pk] = Holding(
+                    stock=reservation.stock,
+                    user=reservation.user,
+                    expiration_date=expiration_date
+                )
+
+        Lending.objects.filter(pk__in=[
+            pk for pk, status in statuses.items()
+            if status != self.HOLDING_ALREADY_EXISTS
+        ]).delete()
+        Holding.objects.bulk_create(holdings.values())
+        Reservation.objects.filter(pk__in=[
+            reservations[holding.stock_id].pk
+            for holding in holdings.values()
+        ]).delete()
+
+        return [
+            LendingBackResult(
+                lending_id=pk,
+                book_id=lendings[pk][1] if pk in lendings else None,
+                status=statuses.get(pk, self.NOT_FOUND),
+                holding=holdings.get(pk)
+            )
+            for pk in self._lending_ids
+        ]
+
+    def _first_reservations(self, stock_ids):
+        # 蔵書ごとの先頭の予約を、(蔵書, 受付番号) のインデックスで引く
+        head = Reservation.objects \
+            .filter(stock=OuterRef('stock')) \
+            .order_by('sequence') \
+            .values('sequence')[:1]
+        reservations = Reservation.objects \
+            .filter(stock_id__in=stock_ids) \
+            .filter(sequence=Subquery(head)) \
+            .select_related('stock__book', 'user')
+        return {
+            reservation.stock_id: reservation
+            for reservation in reservations
+        }
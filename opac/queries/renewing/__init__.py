@@ -1 +1,2 @@
 from .create import *  # noqa: F401 F403
+from .bulk_create import *  # noqa: F401 F403
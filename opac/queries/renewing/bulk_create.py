@@ -0,0 +1,103 @@
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import Error, IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from opac.models.transactions import Lending, Renewing, Reservation
+from opac.queries.errors import AlreadyExistsError, QueryError
+
+
+class RenewingResult(
+        namedtuple('RenewingResult', 'lending_id book_id status')):
+    """まとめて延長した貸出1件ごとの結果 (読み取り専用)。
+
+    Attributes
+    ----------
+    lending_id
+        貸出のID
+    book_id
+        蔵書の書籍のID。貸出が見つからなかった場合は None
+    status
+        RenewingBulkCreateQuery の RENEWED / RESERVATION_EXISTS /
+        RENEWING_ALREADY_EXISTS / NOT_FOUND
+    """
+    __slots__ = ()
+
+
+class RenewingBulkCreateQuery:
+    """複数の貸出に対応する延長を、まとめて作成するクエリ。アトミックです。
+
+    予約されている貸出と既に延長されている貸出を1回のクエリで調べ、
+    残りの貸出の延長を bulk_create で作成します。
+
+    Parameters
+    ----------
+    lendings
+        対象の貸出の iterable
+    """
+    RENEWED = 'renewed'
+    RESERVATION_EXISTS = 'reservation_exists'
+    RENEWING_ALREADY_EXISTS = 'renewing_already_exists'
+    NOT_FOUND = 'not_found'
+
+    def __init__(self, lendings):
+        self._lending_ids = [lending.id for lending in lendings]
+
+    @transaction.atomic
+    def exec(self):
+        """クエリを実行する。
+
+        予約されていて、かつ延長されている貸出は RESERVATION_EXISTS です。
+
+        Returns
+        -------
+        RenewingResult のリスト (lendings の順)
+
+        Raises
+        ------
+        AlreadyExistsError
+            処理中に、他の処理が延長を作成した場合
+        QueryError
+            その他のエラーが発生した場合
+        """
+        try:
+            return self._exec()
+        except IntegrityError as e:
+            raise AlreadyExistsError(self._lending_ids, e)
+        except Error as e:
+            raise QueryError(self._lending_ids, e)
+
+    def _exec(self):
+        reservations = Reservation.objects.filter(stock=OuterRef('stock'))
+        renewings = Renewing.objects.filter(lending=OuterRef('pk'))
+        lendings = {
+            pk: (book_id, self._status(is_reserved, is_renewed))
+            for pk, book_id, is_reserved, is_renewed in (
+                Lending.objects
+                       .filter(pk__in=self._lending_ids)
+                       .annotate(is_reserved=Exists(reservations),
+                                 is_renewed=Exists(renewings))
+                       .values_list(
+                           'pk', 'stock__book_id', 'is_reserved', 'is_renewed')
+            )
+        }
+
+        due_date = timezone.localdate() + timedelta(days=14)
+        Renewing.objects.bulk_create(
+            Renewing(lending_id=pk, due_date=due_date)
+            for pk, (_, status) in lendings.items()
+            if status == self.RENEWED
+        )
+        return [
+            RenewingResult(pk, *lendings.get(pk, (None, self.NOT_FOUND)))
+            for pk in self._lending_ids
+        ]
+
+    def _status(self, is_reserved, is_renewed):
+        if is_reserved:
+            return self.RESERVATION_EXISTS
+        if is_renewed:
+            return self.RENEWING_ALREADY_EXISTS
+        return self.RENEWED
@@ -0,0 +1 @@
+from .queue_position import *  # noqa: F401 F403
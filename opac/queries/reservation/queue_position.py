@@ -0,0 +1,22 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+
+from opac.models.transactions import Reservation
+
+
+class ReservationQueuePosition(Subquery):
+    """予約のクエリセットに、蔵書ごとの予約の順位 (1から) を付ける式。
+
+    同じ蔵書の予約のうち、受付番号が自分以下のものを数えます。
+    (蔵書, 受付番号) の一意インデックスで、蔵書の予約のうち自分以前のもの
+    だけを読みます。外側のクエリで絞り込んでも順位は変わらず、
+    絞り込みや並べ替えにも使えます。
+    """
+    def __init__(self):
+        earlier = Reservation.objects \
+            .filter(stock=OuterRef('stock')) \
+            .filter(sequence__lte=OuterRef('sequence')) \
+            .order_by() \
+            .values('stock') \
+            .annotate(position=Count('pk')) \
+            .values('position')
+        super().__init__(earlier, output_field=IntegerField())
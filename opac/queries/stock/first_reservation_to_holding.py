@@ -16,7 +16,7 @@ class FirstReservationToHoldingQuery:
         対象の蔵書
     """
     def __init__(self, stock):
-        self._reservation = stock.reservations.order_by('created_at').first()
+        self._reservation = stock.reservations.order_by('sequence').first()
 
     def exec(self):
         """クエリを実行する。
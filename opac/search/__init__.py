@@ -0,0 +1 @@
+from .tokenizer import *  # noqa: F401 F403
@@ -0,0 +1,111 @@
+from collections import OrderedDict
+from logging import getLogger
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+
+logger = getLogger(__name__)
+
+
+class SearchResultCache:
+    """検索結果 (書籍IDのリスト) を保持するプロセス内の LRU キャッシュ。
+
+    有効期限切れのエントリは参照時に捨て、エントリ数か保持している書籍IDの
+    総数が上限を超えたら、最も長く参照されていないものから追い出します。
+
+    Parameters
+    ----------
+    max_entries
+        エントリ数の上限
+    max_size
+        全エントリで保持する書籍IDの総数の上限
+    max_entry_size
+        1エントリで保持する書籍IDの数の上限。これを超える結果は保持しない
+    timeout
+        エントリの有効期間 (秒)
+    report_every
+        この回数参照するごとに統計をログに出力する
+    """
+    def __init__(self, max_entries=1000, max_size=200000,
+                 max_entry_size=5000, timeout=300, report_every=1000):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.max_entry_size = max_entry_size
+        self.timeout = timeout
+        self.report_every = report_every
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """キーに対応する書籍IDのリストを返す。
+
+        Returns
+        -------
+        キャッシュされていない場合、有効期限が切れている場合は None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] < monotonic():
+                self._remove(key)
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            if (self.hits + self.misses) % self.report_every == 0:
+                logger.info('検索結果キャッシュ %s', self._stats())
+        return entry and entry[1]
+
+    def set(self, key, book_ids):
+        """書籍IDのリストを保持する。
+
+        Returns
+        -------
+        保持した場合は True、上限を超えるため保持しなかった場合は False
+        """
+        book_ids = tuple(book_ids)
+        if len(book_ids) > self.max_entry_size:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (monotonic() + self.timeout, book_ids)
+            self._size += len(book_ids)
+            while len(self._entries) > self.max_entries \
+                    or self._size > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """キャッシュの大きさを決めるための統計を返す。"""
+        with self._lock:
+            return self._stats()
+
+    def _stats(self):
+        return {
+            'entries': len(self._entries),
+            'size': self._size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _remove(self, key):
+        _, book_ids = self._entries.pop(key)
+        self._size -= len(book_ids)
+
+
+search_result_cache = SearchResultCache(
+    **getattr(settings, 'OPAC_SEARCH_RESULT_CACHE', {}))
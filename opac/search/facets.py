@@ -0,0 +1,127 @@
+from collections import Counter, namedtuple
+
+
+class BookFacetVector(
+        namedtuple('BookFacetVector', 'publisher year libraries lendable')):
+    """書籍ごとのファセットの値。
+
+    Attributes
+    ----------
+    publisher
+        出版者の番号
+    year
+        発行年。発行日が無ければ None
+    libraries
+        蔵書を所蔵している図書館の番号の集合
+    lendable
+        貸出可能な蔵書があるか
+    """
+
+
+class FacetFilters(
+        namedtuple('FacetFilters', 'publisher year library lendable')):
+    """ファセットによる絞り込みの条件。None の条件では絞り込まない。"""
+    PARAMS = ('publisher', 'year', 'library', 'lendable')
+
+    @classmethod
+    def from_params(cls, params):
+        """リクエストのパラメータから条件を作る。数値でない値は無視する。"""
+        def number(name):
+            value = params.get(name, '')
+            return int(value) if value.isdigit() else None
+
+        return cls(
+            publisher=number('publisher'),
+            year=number('year'),
+            library=number('library'),
+            lendable=True if params.get('lendable') == '1' else None
+        )
+
+    def __bool__(self):
+        return any(value is not None for value in self)
+
+    def lookups(self):
+        """出版者・発行年の条件を、書籍のクエリセットの絞り込み条件にする。
+
+        所蔵館・貸出可否は検索の中で絞り込むので、含めません。
+        """
+        lookups = {}
+        if self.publisher is not None:
+            lookups['publisher_id'] = self.publisher
+        if self.year is not None:
+            lookups['issue_date__year'] = self.year
+        return lookups
+
+    def match(self, vector):
+        return (self.publisher is None
+                or vector.publisher == self.publisher) \
+            and (self.year is None or vector.year == self.year) \
+            and (self.library is None or self.library in vector.libraries) \
+            and (self.lendable is None or vector.lendable)
+
+
+class BookFacets:
+    """検索結果の書籍のファセットの値を保持し、件数の集計と絞り込みを行う。
+
+    書籍ごとの値 (BookFacetVector) を一度だけ読み込んでおき、
+    集計と絞り込みはデータベースに問い合わせずに行います。
+
+    Parameters
+    ----------
+    vectors
+        {書籍番号: BookFacetVector}
+    publisher_names
+        {出版者の番号: 出版者名}
+    library_names
+        {図書館の番号: 館名}
+    """
+    def __init__(self, vectors, publisher_names, library_names):
+        self._vectors = vectors
+        self._publisher_names = publisher_names
+        self._library_names = library_names
+
+    def filter(self, book_ids, filters):
+        """書籍IDを、並び順を保ったまま条件で絞り込む。"""
+        if not filters:
+            return list(book_ids)
+        return [
+            pk for pk in book_ids
+            if pk in self._vectors and filters.match(self._vectors[pk])
+        ]
+
+    def counts(self, book_ids):
+        """ファセットの値ごとの書籍の数を集計する。
+
+        Returns
+        -------
+        {'publisher': [(出版者の番号, 出版者名, 件数)] (件数の多い順),
+         'year': [(発行年, 件数)] (新しい順),
+         'library': [(図書館の番号, 館名, 件数)] (図書館の番号順),
+         'lendable': 貸出可能な書籍の数}
+        """
+        publishers = Counter()
+        years = Counter()
+        libraries = Counter()
+        lendable = 0
+        for pk in book_ids:
+            vector = self._vectors.get(pk)
+            if vector is None:
+                continue
+            publishers[vector.publisher] += 1
+            if vector.year is not None:
+                years[vector.year] += 1
+            libraries.update(vector.libraries)
+            lendable += vector.lendable
+        return {
+            'publisher': sorted(
+                ((pk, self._publisher_names[pk], count)
+                 for pk, count in publishers.items()),
+                key=lambda facet: (-facet[2], facet[1])
+            ),
+            'year': sorted(years.items(), reverse=True),
+            'library': [
+                (pk, self._library_names[pk], libraries[pk])
+                for pk in sorted(libraries)
+            ],
+            'lendable': lendable,
+        }
@@ -0,0 +1,65 @@
+# 誤りを許容する語の最短の長さ
+MIN_LENGTH = 3
+
+
+def trigrams(word):
+    """語の前後に空白を補って 3文字ずつに分割する。
+
+    前に2つ、後ろに1つ空白を補うので、n文字の語から n+1 個の trigram が
+    得られます。
+
+    Parameters
+    ----------
+    word
+        正規化済みの語
+
+    Returns
+    -------
+    trigram の集合
+    """
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_distance(word):
+    """語の長さに応じて許容する編集距離を返す。"""
+    if len(word) < MIN_LENGTH:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+def min_shared_trigrams(word, distance):
+    """編集距離が distance 以内の語と必ず共有する trigram の数を返す。
+
+    1回の編集で失われる trigram は高々3つです。
+    """
+    return max(1, len(trigrams(word)) - 3 * distance)
+
+
+def edit_distance(a, b, bound):
+    """レーベンシュタイン距離を返す。
+
+    bound を超えることが分かった時点で打ち切り、bound + 1 を返します。
+
+    Parameters
+    ----------
+    a, b
+        比較する語
+    bound
+        許容する編集距離
+    """
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)
+            ))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return min(previous[-1], bound + 1)
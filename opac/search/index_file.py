@@ -0,0 +1,361 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from logging import getLogger
+from threading import Lock
+
+from django.conf import settings
+
+logger = getLogger(__name__)
+
+# ファイルの形式を変えたら上げる
+FORMAT_VERSION = 2
+
+_MAGIC = b'OPACIDX\0'
+# magic, 形式のバージョン, バイト順, 蔵書目録のバージョン,
+# 検索語の数, 転置索引の件数, 検索語の文字列の長さ, 項目名の文字列の長さ
+_HEADER = struct.Struct('<8sIc32sIIII')
+_FREQUENCY_BITS = 24
+_FREQUENCY_MASK = (1 << _FREQUENCY_BITS) - 1
+
+
+def write_index_file(path, catalog_version, fields, postings):
+    """転置索引を、mmap で読めるバイナリファイルに書き出す。
+
+    一時ファイルに書き出してから置き換えるので、読み込み中のプロセスが
+    書きかけのファイルを読むことはありません (置き換え前のファイルは、
+    開いているプロセスが閉じるまで残ります)。
+
+    Detail
+    ------
+    ヘッダ、検索語の開始位置 (u32 × 検索語の数+1)、転置索引の開始位置
+    (u32 × 検索語の数+1)、検索語 (UTF-8 のバイト列の昇順に連結)、
+    項目名 (NUL 区切り)、検索語ごとの書籍の数 (検索語を含む書籍の数と、
+    項目ごとの書籍の数の u32 × (項目の数+1) × 検索語の数)、
+    書籍番号 (u32 × 件数)、項目と出現回数 (上位8ビットが項目の番号、
+    下位24ビットが出現回数の u32 × 件数) の順です。
+    各検索語の転置索引は書籍番号・項目の順に並んでいます。
+
+    Parameters
+    ----------
+    path
+        書き出すファイルのパス
+    catalog_version
+        転置索引を読み込んだ時点の蔵書目録のバージョン
+    fields
+        項目名のリスト
+    postings
+        (検索語, 項目名, 書籍番号, 出現回数) の iterable
+    """
+    field_numbers = {field: i for i, field in enumerate(fields)}
+    by_term = {}
+    for term, field, book_id, frequency in postings:
+        by_term.setdefault(term.encode('utf-8'), []).append(
+            (book_id, field_numbers[field], frequency))
+
+    term_offsets = array('I', [0])
+    posting_offsets = array('I', [0])
+    terms = bytearray()
+    counts = array('I')
+    books = array('I')
+    metas = array('I')
+    for term in sorted(by_term):
+        terms += term
+        term_offsets.append(len(terms))
+        postings = sorted(by_term[term])
+        field_counts = [0] * len(fields)
+        for book_id, field_number, frequency in postings:
+            books.append(book_id)
+            metas.append(
+                field_number << _FREQUENCY_BITS
+                | min(frequency, _FREQUENCY_MASK))
+            field_counts[field_number] += 1
+        posting_offsets.append(len(books))
+        counts.append(len({book_id for book_id, _, _ in postings}))
+        counts.extend(field_counts)
+    field_names = '\0'.join(fields).encode('utf-8')
+
+    header = _HEADER.pack(
+        _MAGIC, FORMAT_VERSION, _byteorder(), catalog_version.encode('ascii'),
+        len(by_term), len(books), len(terms), len(field_names))
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(
+            dir=directory, prefix='.search-index-', delete=False) as f:
+        try:
+            f.write(header)
+            f.write(term_offsets.tobytes())
+            f.write(posting_offsets.tobytes())
+            f.write(terms)
+            f.write(field_names)
+            f.write(b'\0' * _padding(f.tell()))
+            f.write(counts.tobytes())
+            f.write(books.tobytes())
+            f.write(metas.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            os.unlink(f.name)
+            raise
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+
+
+class IndexFile:
+    """write_index_file で書き出したファイルを mmap で読む。
+
+    転置索引はファイルの領域を指す memoryview として返すので、
+    読み込みのたびに複製は作られず、同じファイルを開いている
+    すべてのプロセスでページキャッシュを共有します。
+    検索語ごとの書籍の数は書き出すときに数えてあるので、転置索引を
+    たどらずに読めます。
+
+    Parameters
+    ----------
+    path
+        読み込むファイルのパス
+
+    Raises
+    ------
+    ValueError
+        形式の違うファイル、途中で切れているファイルだった場合
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        try:
+            self._load(path)
+        except (ValueError, struct.error) as e:
+            self.close()
+            raise ValueError(f'{path} is not a valid search index file') \
+                from e
+
+    def _load(self, path):
+        (magic, format_version, byteorder, catalog_version,
+         term_count, posting_count, terms_size, fields_size) = \
+            _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC or format_version != FORMAT_VERSION \
+                or byteorder != _byteorder():
+            raise ValueError(f'{path} is not a search index file')
+        self.catalog_version = catalog_version.rstrip(b'\0').decode('ascii')
+
+        position = _HEADER.size
+        offsets_size = (term_count + 1) * 4
+        terms_position = position + offsets_size * 2
+        fields_position = terms_position + terms_size
+        if fields_position + fields_size > len(self._mmap):
+            raise ValueError(f'{path} is truncated')
+        self.fields = bytes(
+            self._view[fields_position:fields_position + fields_size]) \
+            .decode('utf-8').split('\0')
+        self._stride = len(self.fields) + 1
+        counts_position = fields_position + fields_size
+        counts_position += _padding(counts_position)
+        counts_size = term_count * self._stride * 4
+        books_position = counts_position + counts_size
+        size = books_position + posting_count * 4 * 2
+        if size != len(self._mmap):
+            raise ValueError(
+                f'{path} is truncated ({len(self._mmap)} of {size} bytes)')
+
+        self._term_offsets = self._array(position, offsets_size)
+        position += offsets_size
+        self._posting_offsets = self._array(position, offsets_size)
+        position += offsets_size
+        if self._term_offsets[-1] != terms_size \
+                or self._posting_offsets[-1] != posting_count:
+            raise ValueError(f'{path} has broken offsets')
+        self._terms = self._view[position:position + terms_size]
+        self._counts = self._array(counts_position, counts_size)
+        position = books_position
+        self._books = self._array(position, posting_count * 4)
+        position += posting_count * 4
+        self._metas = self._array(position, posting_count * 4)
+        self._term_count = term_count
+
+    def close(self):
+        # memoryview が残っていると mmap を閉じられないので、先に解放する
+        for name in ('_term_offsets', '_posting_offsets', '_terms',
+                     '_counts', '_books', '_metas', '_view'):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        self._mmap.close()
+
+    def postings(self, term):
+        """検索語の転置索引を返す。
+
+        Returns
+        -------
+        (書籍番号の memoryview, 項目と出現回数の memoryview)。
+        検索語が無ければ空の memoryview の組
+        """
+        index = self._find(term.encode('utf-8'))
+        if index is None:
+            return self._books[0:0], self._metas[0:0]
+        start = self._posting_offsets[index]
+        stop = self._posting_offsets[index + 1]
+        return self._books[start:stop], self._metas[start:stop]
+
+    def document_frequencies(self, term):
+        """検索語を含む書籍の数を返す。
+
+        Returns
+        -------
+        {項目名: 検索語を含む書籍の数}
+        """
+        counts = self._term_counts(term)
+        return {
+            field: count
+            for field, count in zip(self.fields, counts[1:]) if count
+        }
+
+    def book_count(self, term):
+        """検索語をいずれかの項目に含む書籍の数を返す。"""
+        counts = self._term_counts(term)
+        return counts[0] if counts else 0
+
+    def frequencies(self, term, book_ids):
+        """書籍ごとの検索語の出現回数を返す。
+
+        Parameters
+        ----------
+        book_ids
+            対象の書籍番号の集合
+
+        Returns
+        -------
+        [(書籍番号, 項目名, 出現回数)]
+        """
+        books, metas = self.postings(term)
+        if len(book_ids) < len(books):
+            # 転置索引は書籍番号順なので、対象の書籍の位置を二分探索で探す
+            indexes = []
+            for book_id in sorted(book_ids):
+                index = bisect_left(books, book_id)
+                while index < len(books) and books[index] == book_id:
+                    indexes.append(index)
+                    index += 1
+        else:
+            indexes = [
+                index for index, book_id in enumerate(books)
+                if book_id in book_ids
+            ]
+        return [
+            (books[index], self.fields[metas[index] >> _FREQUENCY_BITS],
+             metas[index] & _FREQUENCY_MASK)
+            for index in indexes
+        ]
+
+    def _term_counts(self, term):
+        index = self._find(term.encode('utf-8'))
+        if index is None:
+            return ()
+        start = index * self._stride
+        return self._counts[start:start + self._stride]
+
+    def prefix_terms(self, prefix):
+        """prefix で始まる検索語のリストを返す (昇順)。"""
+        prefix = prefix.encode('utf-8')
+        terms = []
+        index = bisect_left(_Terms(self), prefix)
+        while index < self._term_count:
+            term = self._term(index)
+            if not term.startswith(prefix):
+                break
+            terms.append(term.decode('utf-8'))
+            index += 1
+        return terms
+
+    def _find(self, term):
+        index = bisect_left(_Terms(self), term)
+        if index < self._term_count and self._term(index) == term:
+            return index
+        return None
+
+    def _term(self, index):
+        start = self._term_offsets[index]
+        stop = self._term_offsets[index + 1]
+        return self._terms[start:stop].tobytes()
+
+    def _array(self, position, size):
+        return self._view[position:position + size].cast('I')
+
+
+class _Terms:
+    """二分探索のために、ファイル内の検索語を列として見せる。"""
+    def __init__(self, index_file):
+        self._index_file = index_file
+
+    def __len__(self):
+        return self._index_file._term_count
+
+    def __getitem__(self, index):
+        return self._index_file._term(index)
+
+
+class IndexFileReader:
+    """設定されたパスの索引ファイルを開いておき、置き換えられたら開き直す。
+
+    ファイルの i-node と更新日時で置き換えを検知するので、確認には
+    stat の呼び出し1回しかかかりません。
+
+    Parameters
+    ----------
+    path
+        索引ファイルのパス。None なら settings.OPAC_SEARCH_INDEX_FILE
+    """
+    def __init__(self, path=None):
+        self._path = path
+        self._index_file = None
+        self._stat = None
+        self._lock = Lock()
+
+    @property
+    def path(self):
+        return self._path or getattr(settings, 'OPAC_SEARCH_INDEX_FILE', None)
+
+    def get(self):
+        """索引ファイルを返す。
+
+        壊れているファイルはログに記録し、置き換えられるまで使いません。
+
+        Returns
+        -------
+        IndexFile。設定されていない、ファイルが無い、または開けない場合は
+        None
+        """
+        path = self.path
+        if not path:
+            return None
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key != self._stat:
+                # 置き換え前のファイルを読んでいる途中のスレッドがあり得るので、
+                # 古い mmap は閉じずにガベージコレクションに任せる
+                try:
+                    self._index_file = IndexFile(path)
+                except (OSError, ValueError):
+                    logger.exception('Cannot open the search index file')
+                    self._index_file = None
+                self._stat = key
+            return self._index_file
+
+
+def _byteorder():
+    return b'<' if sys.byteorder == 'little' else b'>'
+
+
+def _padding(position):
+    return -position % 4
+
+
+index_file_reader = IndexFileReader()
@@ -0,0 +1,55 @@
+import re
+import unicodedata
+
+_SEPARATORS = re.compile(r'[\s\-]')
+_ISBN10 = re.compile(r'\d{9}[\dX]')
+_ISBN13 = re.compile(r'97[89]\d{10}')
+
+
+def normalize_isbn(text):
+    """全角を半角にし、ハイフンと空白を取り除く。"""
+    text = unicodedata.normalize('NFKC', text).upper()
+    return _SEPARATORS.sub('', text)
+
+
+def is_isbn10(isbn):
+    """正規化済みの文字列がチェックディジットの正しい ISBN-10 かを返す。"""
+    if not _ISBN10.fullmatch(isbn):
+        return False
+    digits = [10 if c == 'X' else int(c) for c in isbn]
+    return sum((10 - i) * d for i, d in enumerate(digits)) % 11 == 0
+
+
+def is_isbn13(isbn):
+    """正規化済みの文字列がチェックディジットの正しい ISBN-13 かを返す。"""
+    if not _ISBN13.fullmatch(isbn):
+        return False
+    return _isbn13_check_digit(isbn[:12]) == isbn[12]
+
+
+def to_isbn13(text):
+    """ISBN-10 または ISBN-13 を ISBN-13 に変換する。
+
+    Parameters
+    ----------
+    text
+        ハイフン区切りを含んでもよい ISBN
+
+    Returns
+    -------
+    ISBN-13。ISBN として正しくなければ None
+    """
+    if not text:
+        return None
+    isbn = normalize_isbn(text)
+    if is_isbn13(isbn):
+        return isbn
+    if is_isbn10(isbn):
+        body = '978' + isbn[:9]
+        return body + _isbn13_check_digit(body)
+    return None
+
+
+def _isbn13_check_digit(body):
+    total = sum((3 if i % 2 else 1) * int(d) for i, d in enumerate(body))
+    return str((10 - total % 10) % 10)
@@ -0,0 +1,336 @@
+import re
+import unicodedata
+from collections import namedtuple
+
+from opac.search.isbn import to_isbn13
+from opac.search.tokenizer import _SPACES_BETWEEN_CJK, normalize, query_terms
+
+# 検索式で使える項目名と、転置索引の項目の対応
+FIELDS = {
+    'title': 'name',
+    'author': 'authors',
+    'translator': 'translators',
+    'publisher': 'publisher',
+}
+_FIELD_NAMES = {field: name for name, field in FIELDS.items()}
+
+AND = 'AND'
+OR = 'OR'
+NOT = 'NOT'
+_OPERATORS = (AND, OR, NOT)
+
+_TOKEN = re.compile(
+    r'\s*(?:'
+    r'(?P<paren>[()])'
+    r'|(?:(?P<field>[A-Za-z]+):)?'
+    r'(?:"(?P<phrase>[^"]*)"?|(?P<word>[^\s()"]+))'
+    r')'
+)
+_YEAR = re.compile(r'(\d{4})?(-)?(\d{4})?')
+
+# 括弧と NOT を入れ子にできる深さ。これより深い検索式は、ただの語の並びとして扱う
+MAX_DEPTH = 32
+
+
+class _Node:
+    """構文木の節の基底クラス。
+
+    namedtuple どうしは型が違っても要素が同じなら等しくなってしまうため、
+    型も含めて比較する (検索結果のキャッシュのキーに使うため)。
+    """
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self).__name__, tuple.__hash__(self)))
+
+
+class Term(_Node, namedtuple('Term', 'field text')):
+    """語。語の中の検索語をすべて含む書籍に該当する。
+
+    field が None なら、すべての項目が対象になります。
+    """
+    def __str__(self):
+        return _prefix(self.field) + self.text
+
+    def terms(self, negated=False):
+        yield self
+
+    def map_terms(self, function):
+        return function(self)
+
+
+class Phrase(_Node, namedtuple('Phrase', 'field text')):
+    """引用符で囲まれた句。句をそのままの並びで含む書籍に該当する。"""
+    def __str__(self):
+        return f'{_prefix(self.field)}"{self.text}"'
+
+    def terms(self, negated=False):
+        yield self
+
+    def map_terms(self, function):
+        return self
+
+
+class Isbn(_Node, namedtuple('Isbn', 'isbn13')):
+    """ISBN。isbn13 が None (ISBN として正しくない) なら何にも該当しない。"""
+    def __str__(self):
+        return f'isbn:{self.isbn13 or ""}'
+
+    def terms(self, negated=False):
+        return iter(())
+
+    def map_terms(self, function):
+        return self
+
+
+class YearRange(_Node, namedtuple('YearRange', 'start end')):
+    """発行年の範囲。start, end が None の側は範囲を限らない。"""
+    def __str__(self):
+        if self.start == self.end:
+            return f'year:{self.start}'
+        return f'year:{self.start or ""}-{self.end or ""}'
+
+    def terms(self, negated=False):
+        return iter(())
+
+    def map_terms(self, function):
+        return self
+
+
+class And(_Node, namedtuple('And', 'children')):
+    def __str__(self):
+        return f' {AND} '.join(
+            f'({child})' if isinstance(child, Or) else str(child)
+            for child in self.children
+        )
+
+    def terms(self, negated=False):
+        for child in self.children:
+            yield from child.terms(negated)
+
+    def map_terms(self, function):
+        return And(tuple(c.map_terms(function) for c in self.children))
+
+
+class Or(_Node, namedtuple('Or', 'children')):
+    def __str__(self):
+        return ' '.join(str(child) for child in self.children)
+
+    def terms(self, negated=False):
+        for child in self.children:
+            yield from child.terms(negated)
+
+    def map_terms(self, function):
+        return Or(tuple(c.map_terms(function) for c in self.children))
+
+
+class Not(_Node, namedtuple('Not', 'child')):
+    def __str__(self):
+        if isinstance(self.child, (And, Or)):
+            return f'{NOT} ({self.child})'
+        return f'{NOT} {self.child}'
+
+    def terms(self, negated=False):
+        # 除外する語は、求められた場合にだけ返す (適合度の計算には使わない)
+        if negated:
+            return self.child.terms(negated)
+        return iter(())
+
+    def map_terms(self, function):
+        return Not(self.child.map_terms(function))
+
+
+def parse(text):
+    """検索式を構文木に変換する。
+
+    Detail
+    ------
+    - 空白で区切った語どうしは OR、AND で結んだものは AND で扱う
+      (AND の方が優先される)
+    - NOT で語を除外し、括弧で優先順位を変えられる
+    - "..." で囲んだ句は、その並びのまま含むものに該当する
+    - title: author: translator: publisher: で項目を限定できる
+    - isbn:ISBN, year:2014, year:2010-2015, year:2010-, year:-2015 で
+      ISBN・発行年を指定できる
+    - 利用者の入力をそのまま受け取るので、対応しない括弧や余分な演算子、
+      知らない項目名はエラーにせず読み飛ばす (項目名は語の一部として扱う)
+    - 括弧と NOT の入れ子が MAX_DEPTH より深ければ、演算子と括弧を無視して
+      語を OR で結ぶ
+
+    Parameters
+    ----------
+    text
+        利用者が入力した検索式
+
+    Returns
+    -------
+    構文木。検索する語が無ければ None
+    """
+    text = unicodedata.normalize('NFKC', text)
+    tokens = _tokenize(_SPACES_BETWEEN_CJK.sub('', text))
+    try:
+        return _Parser(tokens).parse()
+    except _TooDeep:
+        return _combine(Or, [
+            token for token in tokens if isinstance(token, _Node)
+        ])
+
+
+def _prefix(field):
+    return f'{_FIELD_NAMES[field]}:' if field else ''
+
+
+def _tokenize(text):
+    tokens = []
+    for match in _TOKEN.finditer(text):
+        paren, field, phrase, word = match.group(
+            'paren', 'field', 'phrase', 'word')
+        if paren:
+            tokens.append(paren)
+        elif not field and word in _OPERATORS:
+            tokens.append(word)
+        else:
+            operand = _operand(field, phrase, word)
+            if operand is not None:
+                tokens.append(operand)
+    return tokens
+
+
+def _operand(field, phrase, word):
+    name = field and field.lower()
+    value = word if phrase is None else phrase
+    if name == 'isbn':
+        return Isbn(to_isbn13(value))
+    if name == 'year':
+        year_range = _year_range(value)
+        if year_range:
+            return year_range
+    if name not in FIELDS and field:
+        # 項目名ではないので、語の一部として扱う
+        if phrase is None:
+            return _node(Term, None, f'{field}:{word}')
+        return _combine(And, [
+            _node(Term, None, field),
+            _node(Phrase, None, phrase),
+        ])
+    cls = Term if phrase is None else Phrase
+    return _node(cls, FIELDS.get(name), value)
+
+
+def _year_range(value):
+    match = _YEAR.fullmatch(value)
+    if not match or not (match.group(1) or match.group(3)):
+        return None
+    start, dash, end = match.groups()
+    start = start and int(start)
+    end = end and int(end)
+    if not dash:
+        return YearRange(start, start)
+    return YearRange(start, end)
+
+
+def _node(cls, field, text):
+    text = normalize(text)
+    if not query_terms(text):
+        return None
+    return cls(field, text)
+
+
+def _combine(cls, children):
+    flattened = []
+    for child in children:
+        if isinstance(child, cls):
+            flattened.extend(child.children)
+        elif child is not None:
+            flattened.append(child)
+    if not flattened:
+        return None
+    if len(flattened) == 1:
+        return flattened[0]
+    return cls(tuple(flattened))
+
+
+class _TooDeep(Exception):
+    pass
+
+
+class _Parser:
+    """再帰下降で検索式を読む。
+
+    query := expr*          (対応しない閉じ括弧は読み飛ばす)
+    expr  := and (OR? and)*
+    and   := unary (AND+ unary)*
+    unary := NOT unary | ( expr ) | 語
+
+    括弧と NOT の入れ子が MAX_DEPTH を超えたら _TooDeep を送出する。
+    """
+    def __init__(self, tokens):
+        self._tokens = tokens
+        self._position = 0
+        self._depth = 0
+
+    def parse(self):
+        children = []
+        while self._peek() is not None:
+            children.append(self._expr())
+            if self._peek() == ')':
+                self._next()
+        return _combine(Or, children)
+
+    def _expr(self):
+        children = [self._and()]
+        while self._peek() not in (None, ')'):
+            if self._peek() == OR:
+                self._next()
+            children.append(self._and())
+        return _combine(Or, children)
+
+    def _and(self):
+        children = [self._unary()]
+        while self._peek() == AND:
+            # 続けて書かれた AND は、一つの AND とみなす
+            while self._peek() == AND:
+                self._next()
+            children.append(self._unary())
+        return _combine(And, children)
+
+    def _unary(self):
+        token = self._peek()
+        if token is None or token == ')':
+            return None
+        self._next()
+        if token == NOT:
+            self._enter()
+            child = self._unary()
+            self._depth -= 1
+            return child and Not(child)
+        if token == '(':
+            self._enter()
+            node = self._expr()
+            self._depth -= 1
+            if self._peek() == ')':
+                self._next()
+            return node
+        if token in (AND, OR):
+            # 左辺の無い演算子は読み飛ばす
+            return None
+        return token
+
+    def _enter(self):
+        self._depth += 1
+        if self._depth > MAX_DEPTH:
+            raise _TooDeep()
+
+    def _peek(self):
+        if self._position < len(self._tokens):
+            return self._tokens[self._position]
+        return None
+
+    def _next(self):
+        self._position += 1
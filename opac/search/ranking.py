@@ -0,0 +1,66 @@
+from math import log
+
+# 書名 > 著者 > 訳者 > 出版者 の順に重くする
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'authors': 2.0,
+    'translators': 1.5,
+    'publisher': 1.0,
+}
+
+
+class BM25F:
+    """項目ごとに重みを付けた BM25 (BM25F) で書籍の適合度を計算する。
+
+    Parameters
+    ----------
+    document_count
+        索引に登録されている書籍の数
+    average_lengths
+        項目ごとの検索語の数の平均
+    weights
+        項目ごとの重み
+    k1
+        出現回数の効き方を決める係数
+    b
+        項目の長さによる補正の強さ
+    """
+    def __init__(self, document_count, average_lengths,
+                 weights=FIELD_WEIGHTS, k1=1.2, b=0.75):
+        self._document_count = document_count
+        self._average_lengths = average_lengths
+        self._weights = weights
+        self._k1 = k1
+        self._b = b
+
+    def idf(self, document_frequency):
+        n = self._document_count
+        df = document_frequency
+        return log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def score(self, frequencies, lengths, document_frequencies):
+        """書籍の適合度を返す。
+
+        Parameters
+        ----------
+        frequencies
+            {検索語: {項目: 出現回数}}
+        lengths
+            {項目: 検索語の数}
+        document_frequencies
+            {検索語: 検索語を含む書籍の数}
+        """
+        score = 0.0
+        for term, field_frequencies in frequencies.items():
+            tf = sum(
+                self._weights[field] * frequency
+                / self._normalizer(field, lengths.get(field, 0))
+                for field, frequency in field_frequencies.items()
+            )
+            score += self.idf(document_frequencies.get(term, 0)) \
+                * tf * (self._k1 + 1) / (tf + self._k1)
+        return score
+
+    def _normalizer(self, field, length):
+        average = self._average_lengths.get(field) or 1
+        return 1 - self._b + self._b * length / average
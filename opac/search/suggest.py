@@ -0,0 +1,138 @@
+from bisect import bisect_left, insort
+from threading import Lock
+
+from opac.search.tokenizer import normalize, runs
+
+TITLE = 'title'
+AUTHOR = 'author'
+TRANSLATOR = 'translator'
+PUBLISHER = 'publisher'
+
+
+class PrefixIndex:
+    """書名・著者名・訳者名・出版者名を前方一致で引くための、
+    プロセス内のソート済み配列。
+
+    名前は正規化したうえで、先頭からと、英数字の各単語の先頭からの文字列を
+    キーとして登録します (「fluent python」は「fluent python」と「python」)。
+    検索は二分探索で最初のキーを見つけ、前方一致する間だけ読むので、
+    登録件数が増えても一定の時間で答えられます。
+
+    Attributes
+    ----------
+    version
+        索引が反映している蔵書目録のバージョン。未構築なら None
+    """
+    def __init__(self):
+        self.version = None
+        self._keys = []
+        self._entries = {}
+        self._lock = Lock()
+        self._rebuilding = False
+
+    def rebuild(self, entries, version):
+        """索引を作り直す。
+
+        Parameters
+        ----------
+        entries
+            (種類, 番号, 名前) の iterable
+        version
+            entries を読み込む前に読んだ蔵書目録のバージョン
+        """
+        keys = []
+        names = {}
+        for kind, pk, name in entries:
+            entry_keys = _keys(name)
+            names[(kind, pk)] = (name, entry_keys)
+            keys.extend((key, kind, pk) for key in entry_keys)
+        keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._entries = names
+            self.version = version
+
+    def start_rebuild(self):
+        """作り直しを始める。既に他のスレッドが作り直していれば False を返す。
+
+        作り直しが終わったら (失敗した場合も) finish_rebuild を呼んでください。
+        """
+        with self._lock:
+            if self._rebuilding:
+                return False
+            self._rebuilding = True
+            return True
+
+    def finish_rebuild(self):
+        with self._lock:
+            self._rebuilding = False
+
+    def advance(self, previous, version):
+        """このプロセスで蔵書目録のバージョンを previous から version に
+        上げたことを反映する。
+
+        索引が previous の時点のものなら、version の時点のものとします。
+        そうでなければ、他のプロセスの更新を反映していない古い索引なので、
+        バージョンはそのままにして、作り直されるのを待ちます。
+        """
+        with self._lock:
+            if self.version is not None and self.version == previous:
+                self.version = version
+
+    def update(self, kind, pk, name):
+        """名前を登録し直す。名前が None なら取り除く。
+
+        バージョンは変えません (advance で上げます)。
+        索引が未構築のときは何もしません (最初の検索時に構築されます)。
+        """
+        with self._lock:
+            if self.version is None:
+                return
+            _, old_keys = self._entries.pop((kind, pk), (None, ()))
+            for key in old_keys:
+                index = bisect_left(self._keys, (key, kind, pk))
+                del self._keys[index]
+            if name is not None:
+                new_keys = _keys(name)
+                self._entries[(kind, pk)] = (name, new_keys)
+                for key in new_keys:
+                    insort(self._keys, (key, kind, pk))
+
+    def search(self, prefix, limit=10):
+        """前方一致する名前を、キーの辞書順に返す。
+
+        Returns
+        -------
+        (種類, 番号, 名前) のリスト
+        """
+        prefix = normalize(prefix).lstrip()
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            index = bisect_left(self._keys, (prefix,))
+            while index < len(self._keys) and len(results) < limit:
+                key, kind, pk = self._keys[index]
+                if not key.startswith(prefix):
+                    break
+                if (kind, pk) not in seen:
+                    seen.add((kind, pk))
+                    results.append((kind, pk, self._entries[(kind, pk)][0]))
+                index += 1
+        return results
+
+
+def _keys(name):
+    text = normalize(name)
+    keys = {text}
+    position = 0
+    for run in runs(name):
+        position = text.find(run, position)
+        if run.isascii():
+            keys.add(text[position:])
+        position += len(run)
+    return tuple(sorted(keys))
+
+
+suggest_index = PrefixIndex()
@@ -0,0 +1,179 @@
+import re
+import unicodedata
+
+# 々〆, ひらがな, カタカナ (中黒を除く), CJK統合漢字 (拡張A含む), ハングル,
+# CJK互換漢字
+_CJK = '\u3005\u3006\u3041-\u30fa\u30fc-\u30ff\u3400-\u4dbf\u4e00-\u9fff' \
+       '\uac00-\ud7af\uf900-\ufaff'
+
+_CJK_RUN = re.compile(f'[{_CJK}]+')
+_RUN = re.compile(f'[{_CJK}]+|[^\\W{_CJK}]+')
+_SPACES_BETWEEN_CJK = re.compile(f'(?<=[{_CJK}])[ \t]+(?=[{_CJK}])')
+
+# ァ-ヶ を ぁ-ゖ に畳み込む
+_KATAKANA_TO_HIRAGANA = {c: c - 0x60 for c in range(0x30a1, 0x30f7)}
+
+
+def normalize(text):
+    """索引・検索の両方で使う正規化を行う。
+
+    Detail
+    ------
+    1. NFKC で全角英数字・半角カナなどの字形の揺れを統一する
+    2. 英字を小文字にする
+    3. カタカナをひらがなに畳み込む
+    4. 日本語の文字に挟まれた空白を取り除く (「村上 春樹」→「村上春樹」)
+
+    Parameters
+    ----------
+    text
+        対象の文字列
+
+    Returns
+    -------
+    正規化した文字列
+    """
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = text.translate(_KATAKANA_TO_HIRAGANA)
+    return _SPACES_BETWEEN_CJK.sub('', text)
+
+
+def runs(text):
+    """文字列を正規化し、日本語の文字の並びと英数字の並びに分割する。
+
+    Parameters
+    ----------
+    text
+        対象の文字列
+
+    Returns
+    -------
+    文字の並びのリスト
+    """
+    return _RUN.findall(normalize(text))
+
+
+def map_runs(function, text):
+    """文字列を正規化し、文字の並びごとに function で置き換える。
+
+    記号や空白などの並びの間の文字は、そのまま残します
+    (「c++」「foo-bar」の「+」「-」は残る)。
+
+    Parameters
+    ----------
+    function
+        文字の並びを受け取り、置き換える文字列を返す関数
+    text
+        対象の文字列
+
+    Returns
+    -------
+    置き換えた文字列
+    """
+    return _RUN.sub(lambda match: function(match.group()), normalize(text))
+
+
+def tokenize(text):
+    """文字列を正規化し、索引に登録する検索語に分割する。
+
+    日本語の文字の並びは1文字ずつと2文字ずつ (bigram) に、
+    それ以外の英数字の並びは単語ごとに分割します。
+
+    Parameters
+    ----------
+    text
+        対象の文字列
+
+    Returns
+    -------
+    検索語のリスト (出現順、重複あり)
+    """
+    terms = []
+    for run in runs(text):
+        if _CJK_RUN.fullmatch(run):
+            terms.extend(run)
+            terms.extend(_bigrams(run))
+        else:
+            terms.append(run)
+    return terms
+
+
+def split_words(text):
+    """検索文字列を正規化し、空白で語に分割する。
+
+    Parameters
+    ----------
+    text
+        利用者が入力した検索文字列
+
+    Returns
+    -------
+    正規化した語のリスト
+    """
+    return normalize(text).split()
+
+
+def query_terms(word):
+    """語を含む書籍を引くために、索引から探す検索語を返す。
+
+    日本語の文字の並びは2文字以上なら bigram、1文字ならその文字を使います。
+
+    Parameters
+    ----------
+    word
+        検索する語
+
+    Returns
+    -------
+    検索語の集合
+    """
+    terms = set()
+    for run in runs(word):
+        if _CJK_RUN.fullmatch(run) and len(run) > 1:
+            terms.update(_bigrams(run))
+        else:
+            terms.add(run)
+    return terms
+
+
+def matches_prefix(term):
+    """検索語を、索引の検索語の前方一致で引くかを返す。
+
+    英数字の並びは、単語の途中まで入力されても見つかるよう前方一致で引きます
+    (「pyth」で「python」)。日本語の文字は1文字ずつと bigram で索引して
+    いるので、完全一致で引きます。
+
+    Parameters
+    ----------
+    term
+        query_terms で得た検索語
+
+    Returns
+    -------
+    前方一致で引くなら True
+    """
+    return not _CJK_RUN.fullmatch(term)
+
+
+def query_phrases(word):
+    """bigram の組み合わせだけでは語順を保証できない日本語の文字の並びを返す。
+
+    3文字以上の並びは、検索文書にそのまま含まれるかを確かめる必要があります。
+
+    Parameters
+    ----------
+    word
+        検索する語
+
+    Returns
+    -------
+    検索文書に含まれているべき文字列の集合
+    """
+    return {
+        run for run in _CJK_RUN.findall(normalize(word))
+        if len(run) > 2
+    }
+
+
+def _bigrams(run):
+    return [run[i:i + 2] for i in range(len(run) - 1)]
@@ -1,2 +1,3 @@
 from .cancel import *  # noqa: F401 F403
 from .lend import *  # noqa: F401 F403
+from .bulk_lend import *  # noqa: F401 F403
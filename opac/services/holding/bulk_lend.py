@@ -0,0 +1,39 @@
+from opac.queries import HoldingBulkLendQuery, QueryError
+from opac.services.errors import ServiceError
+from opac.signals.book_version import bulk_circulation_change
+
+
+class HoldingBulkLendService:
+    """複数の取置の貸出処理を、まとめて行うサービス。
+
+    既に貸出がある蔵書の取置は貸出にせず、結果で知らせます。
+
+    Parameters
+    ----------
+    holdings
+        対象の取置の iterable
+    """
+    def __init__(self, holdings):
+        self._holdings = holdings
+
+    def exec(self):
+        """サービスを実行する。
+
+        Returns
+        -------
+        HoldingLendResult のリスト
+
+        Raises
+        ------
+        ServiceError
+            貸出処理でエラーが発生した場合 (すべての取置が貸出になりません)
+        """
+        try:
+            with bulk_circulation_change() as book_ids:
+                results = HoldingBulkLendQuery(self._holdings).exec()
+                book_ids.update(
+                    result.book_id for result in results
+                    if result.status == HoldingBulkLendQuery.LENT)
+        except QueryError as e:
+            raise ServiceError(e)
+        return results
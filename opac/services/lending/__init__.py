@@ -1,2 +1,4 @@
 from opac.services.lending.back import *  # noqa: F401 F403
 from opac.services.lending.renew import *  # noqa: F401 F403
+from opac.services.lending.bulk_back import *  # noqa: F401 F403
+from opac.services.lending.bulk_renew import *  # noqa: F401 F403
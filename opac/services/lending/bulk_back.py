@@ -0,0 +1,53 @@
+from opac.mailers import HoldingCreatedMailer, MailerError
+from opac.queries import LendingBulkBackQuery, QueryError
+from opac.services.errors import ServiceError
+from opac.signals.book_version import bulk_circulation_change
+
+
+class LendingBulkBackService:
+    """複数の貸出の返却処理と、取置ユーザーへのメール送信を行うサービス。
+
+    返却処理は LendingBulkBackQuery で一度に行い、取置を作成した貸出ごとに
+    メールを送信します。返却できなかった貸出やメールの送信に失敗した貸出が
+    あっても中断しません。
+
+    Parameters
+    ----------
+    lendings
+        対象の貸出の iterable
+    """
+    MAIL_FAILED = 'mail_failed'
+
+    def __init__(self, lendings):
+        self._lendings = lendings
+
+    def exec(self):
+        """サービスを実行する。
+
+        Returns
+        -------
+        LendingBackResult のリスト。取置を作成したがメールを送信できなかった
+        貸出は、status が MAIL_FAILED になります
+
+        Raises
+        ------
+        ServiceError
+            返却処理でエラーが発生した場合 (すべての貸出が返却されません)
+        """
+        try:
+            with bulk_circulation_change() as book_ids:
+                results = LendingBulkBackQuery(self._lendings).exec()
+                book_ids.update(
+                    result.book_id for result in results if result.is_backed)
+        except QueryError as e:
+            raise ServiceError(e)
+        return [self._mail(result) for result in results]
+
+    def _mail(self, result):
+        if result.holding is None:
+            return result
+        try:
+            HoldingCreatedMailer(result.holding).exec()
+        except MailerError:
+            return result._replace(status=self.MAIL_FAILED)
+        return result
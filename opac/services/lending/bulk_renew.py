@@ -0,0 +1,41 @@
+from collections import Counter
+
+from opac.queries import QueryError, RenewingBulkCreateQuery
+from opac.services.errors import ServiceError
+from opac.signals.book_version import bulk_circulation_change
+
+
+class LendingBulkRenewService:
+    """複数の貸出を、まとめて延長するサービス。
+
+    予約されている貸出と既に延長されている貸出は延長せず、件数で知らせます。
+
+    Parameters
+    ----------
+    lendings
+        対象の貸出の iterable
+    """
+    def __init__(self, lendings):
+        self._lendings = lendings
+
+    def exec(self):
+        """サービスを実行する。
+
+        Returns
+        -------
+        {RenewingBulkCreateQuery の結果: 件数} の Counter
+
+        Raises
+        ------
+        ServiceError
+            貸出の延長でエラーが発生した場合 (すべての貸出が延長されません)
+        """
+        try:
+            with bulk_circulation_change() as book_ids:
+                results = RenewingBulkCreateQuery(self._lendings).exec()
+                book_ids.update(
+                    result.book_id for result in results
+                    if result.status == RenewingBulkCreateQuery.RENEWED)
+        except QueryError as e:
+            raise ServiceError(e)
+        return Counter(result.status for result in results)
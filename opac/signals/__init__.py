@@ -0,0 +1,4 @@
+import opac.signals.book_version
+import opac.signals.catalog_version
+import opac.signals.search_index
+import opac.signals.suggest  # noqa: F401
@@ -0,0 +1,121 @@
+from contextlib import contextmanager
+from threading import local
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from opac.caches import page_cache
+from opac.caches.page import CIRCULATION, book_key
+from opac.models.caches import CacheVersion
+from opac.models.masters import Author, Book, Publisher, Stock, Translator
+from opac.models.transactions import Holding, Lending, Renewing, Reservation
+from opac.queries import BookCacheVersionBumpQuery
+
+_bulk = local()
+
+
+def bump_book_version(book_ids):
+    book_ids = set(book_ids)
+    BookCacheVersionBumpQuery(CacheVersion.BOOK, book_ids).exec()
+    page_cache.purge(book_key(pk) for pk in book_ids)
+
+
+def bump_circulation_version(book_ids):
+    book_ids = set(book_ids)
+    # 貸出可否・所蔵館で絞り込んだ検索結果は、どの書籍の貸出・取置・予約
+    # でも変わり得るので、全書籍のバージョンも同じ UPDATE で上げる
+    BookCacheVersionBumpQuery(
+        CacheVersion.CIRCULATION, book_ids,
+        keys=[CacheVersion.CIRCULATION]).exec()
+    page_cache.purge([CIRCULATION] + [book_key(pk) for pk in book_ids])
+
+
+@contextmanager
+def bulk_circulation_change():
+    """貸出・取置・予約をまとめて変更する間、シグナルによる
+    キャッシュバージョンの更新を止め、抜けるときに一度だけ更新する。
+
+    シグナルでは1件ごとに書籍を読み込んで更新するので、まとめて変更する
+    処理はこのブロックの中で行い、yield された集合に対象の書籍のIDを
+    加えておきます。入れ子にした場合は、外側のブロックでまとめて更新します。
+    """
+    outer = getattr(_bulk, 'book_ids', None)
+    book_ids = set() if outer is None else outer
+    _bulk.book_ids = book_ids
+    try:
+        yield book_ids
+    finally:
+        _bulk.book_ids = outer
+    if outer is None and book_ids:
+        bump_circulation_version(book_ids)
+
+
+def _in_bulk_circulation_change():
+    return getattr(_bulk, 'book_ids', None) is not None
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def bump_book_version_on_book(sender, instance, **kwargs):
+    bump_book_version([instance.pk])
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Translator)
+@receiver(post_save, sender=Publisher)
+def bump_book_version_on_name(sender, instance, raw=False, **kwargs):
+    # fixture の読み込み中は、書籍との関連がまだ無いか、書籍側で上がる
+    if not raw:
+        bump_book_version(instance.books.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Book.authors.through)
+@receiver(post_save, sender=Book.translators.through)
+@receiver(post_delete, sender=Book.authors.through)
+@receiver(post_delete, sender=Book.translators.through)
+def bump_book_version_on_relation_row(sender, instance, **kwargs):
+    bump_book_version([instance.book_id])
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.translators.through)
+def bump_book_version_on_relation(sender, instance, action, reverse, pk_set,
+                                  **kwargs):
+    # 関連は Author / Translator 側で定義されているので、reverse なら
+    # instance が書籍。clear は消える前に対象の書籍を調べる
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        bump_book_version([instance.pk])
+    elif action == 'pre_clear':
+        bump_book_version(instance.books.values_list('pk', flat=True))
+    else:
+        bump_book_version(pk_set)
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def bump_circulation_version_on_stock(sender, instance, **kwargs):
+    if _in_bulk_circulation_change():
+        return
+    bump_circulation_version([instance.book_id])
+
+
+@receiver(post_save, sender=Lending)
+@receiver(post_save, sender=Holding)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Lending)
+@receiver(post_delete, sender=Holding)
+@receiver(post_delete, sender=Reservation)
+def bump_circulation_version_on_transaction(sender, instance, **kwargs):
+    if _in_bulk_circulation_change():
+        return
+    bump_circulation_version([instance.stock.book_id])
+
+
+@receiver(post_save, sender=Renewing)
+@receiver(post_delete, sender=Renewing)
+def bump_circulation_version_on_renewing(sender, instance, **kwargs):
+    if _in_bulk_circulation_change():
+        return
+    bump_circulation_version([instance.lending.stock.book_id])
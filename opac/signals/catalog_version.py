@@ -0,0 +1,37 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from opac.caches import page_cache
+from opac.caches.page import CATALOG
+from opac.models.caches import CacheVersion
+from opac.models.masters import Author, Book, Publisher, Translator
+from opac.queries import CacheVersionBumpQuery, SuggestIndexAdvanceQuery
+
+
+def bump_catalog_version():
+    change = CacheVersionBumpQuery(CacheVersion.CATALOG).exec()
+    page_cache.purge([CATALOG])
+    SuggestIndexAdvanceQuery(change).exec()
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Translator)
+@receiver(post_save, sender=Publisher)
+@receiver(post_save, sender=Book.authors.through)
+@receiver(post_save, sender=Book.translators.through)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Translator)
+@receiver(post_delete, sender=Publisher)
+@receiver(post_delete, sender=Book.authors.through)
+@receiver(post_delete, sender=Book.translators.through)
+def bump_catalog_version_on_change(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.translators.through)
+def bump_catalog_version_on_relation(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_catalog_version()
@@ -0,0 +1,64 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete
+)
+from django.dispatch import receiver
+
+from opac.models.masters import Author, Book, Publisher, Translator
+from opac.queries import BookIndexQuery
+
+
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, **kwargs):
+    BookIndexQuery(Book.objects.filter(pk=instance.pk)).exec()
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Translator)
+@receiver(post_save, sender=Publisher)
+def index_books_of_saved_name(sender, instance, **kwargs):
+    BookIndexQuery(instance.books.all()).exec()
+
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Translator)
+def remember_books_of_deleting_name(sender, instance, **kwargs):
+    instance._indexed_book_ids = list(
+        instance.books.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Translator)
+def index_books_of_deleted_name(sender, instance, **kwargs):
+    BookIndexQuery(
+        Book.objects.filter(pk__in=instance._indexed_book_ids)).exec()
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.translators.through)
+def index_books_of_changed_relation(
+        sender, instance, action, pk_set, **kwargs):
+    if isinstance(instance, Book):
+        if action.startswith('post_'):
+            BookIndexQuery(Book.objects.filter(pk=instance.pk)).exec()
+        return
+
+    if action == 'pre_clear':
+        instance._indexed_book_ids = list(
+            instance.books.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        BookIndexQuery(
+            Book.objects.filter(pk__in=instance._indexed_book_ids)).exec()
+    elif action in ('post_add', 'post_remove'):
+        BookIndexQuery(Book.objects.filter(pk__in=pk_set)).exec()
+
+
+# 管理サイトのインラインは中間テーブルを直接保存するため、m2m_changed が送られない
+@receiver(post_save, sender=Book.authors.through)
+@receiver(post_save, sender=Book.translators.through)
+@receiver(post_delete, sender=Book.authors.through)
+@receiver(post_delete, sender=Book.translators.through)
+def index_book_of_saved_relation(sender, instance, **kwargs):
+    BookIndexQuery(Book.objects.filter(pk=instance.book_id)).exec()
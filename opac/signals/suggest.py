@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from opac.models.masters import Author, Book, Publisher, Translator
+from opac.queries import SuggestIndexUpdateQuery
+
+
+# 索引のバージョンは catalog_version の受信関数で上がる
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Translator)
+@receiver(post_save, sender=Publisher)
+def update_suggest_index(sender, instance, **kwargs):
+    SuggestIndexUpdateQuery(instance).exec()
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Translator)
+@receiver(post_delete, sender=Publisher)
+def remove_from_suggest_index(sender, instance, **kwargs):
+    SuggestIndexUpdateQuery(instance, deleted=True).exec()
@@ -4,7 +4,9 @@ register = template.Library()
 
 
 @register.simple_tag
-def url_replace(request, field, value):
+def url_replace(request, field, value, *removed_fields):
     url_dict = request.GET.copy()
     url_dict[field] = str(value)
+    for removed_field in removed_fields:
+        url_dict.pop(removed_field, None)
     return url_dict.urlencode()
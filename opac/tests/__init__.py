@@ -1 +1,3 @@
+from .admin import *  # noqa: F401 F403
+from .search import *  # noqa: F401 F403
 from .views import *  # noqa: F401 F403
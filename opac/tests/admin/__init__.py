@@ -0,0 +1 @@
+from .reservation import *  # noqa: F401 F403
@@ -0,0 +1,132 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from opac.models.masters import Stock, User
+from opac.models.transactions import Reservation
+from opac.queries import ReservationQueuePosition
+
+
+class ReservationQueuePositionTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        now = timezone.now()
+        users = User.objects.order_by('pk')
+        stock1 = Stock.objects.get(pk=1)
+        stock2 = Stock.objects.get(pk=2)
+        # 予約日時が前後しても、受付の順に並ぶ
+        self.reservations = [
+            self.reserve(stock1, users[2], now),
+            self.reserve(stock1, users[0], now - timedelta(days=1)),
+            self.reserve(stock1, users[1], now),
+            self.reserve(stock2, users[2], now),
+        ]
+
+    def reserve(self, stock, user, created_at):
+        reservation = Reservation.objects.create(stock=stock, user=user)
+        Reservation.objects \
+            .filter(pk=reservation.pk) \
+            .update(created_at=created_at)
+        return reservation
+
+    def positions(self, reservations):
+        return dict(
+            reservations
+            .annotate(queue_position=ReservationQueuePosition())
+            .values_list('pk', 'queue_position')
+        )
+
+    def test_position_per_stock_by_sequence(self):
+        self.assertEqual(
+            self.positions(Reservation.objects.all()),
+            {self.reservations[0].pk: 1, self.reservations[1].pk: 2,
+             self.reservations[2].pk: 3, self.reservations[3].pk: 1})
+
+    def test_position_matches_order(self):
+        for reservation in Reservation.objects.annotate(
+                queue_position=ReservationQueuePosition()):
+            self.assertEqual(reservation.order(), reservation.queue_position)
+
+    def test_sequence_follows_last_reservation(self):
+        self.reservations[0].delete()
+        reservation = Reservation.objects.create(
+            stock=Stock.objects.get(pk=1), user=User.objects.get(pk=3))
+        self.assertEqual(reservation.sequence, 4)
+
+    def test_stale_stock_save_does_not_reuse_sequence(self):
+        stock = Stock.objects.get(pk=2)
+        reservation = Reservation.objects.create(
+            stock=Stock.objects.get(pk=2), user=User.objects.get(pk=1))
+        # 予約を受け付ける前に読み込んだ蔵書を、そのまま保存する
+        stock.save()
+        self.assertEqual(reservation.sequence, 2)
+        reservation = Reservation.objects.create(
+            stock=stock, user=User.objects.get(pk=2))
+        self.assertEqual(reservation.sequence, 3)
+
+    def test_position_after_head_removed(self):
+        self.reservations[0].delete()
+        self.assertEqual(
+            self.positions(Reservation.objects.filter(stock_id=1)),
+            {self.reservations[1].pk: 1, self.reservations[2].pk: 2})
+
+    def test_position_does_not_change_with_outer_filter(self):
+        self.assertEqual(
+            self.positions(
+                Reservation.objects.filter(pk=self.reservations[2].pk)),
+            {self.reservations[2].pk: 3})
+
+    def test_filter_and_order_by_position(self):
+        reservations = Reservation.objects \
+            .annotate(queue_position=ReservationQueuePosition()) \
+            .filter(queue_position=1) \
+            .order_by('stock_id')
+        self.assertEqual(
+            list(reservations.values_list('pk', flat=True)),
+            [self.reservations[0].pk, self.reservations[3].pk])
+
+
+class ReservationAdminTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        self.client.force_login(User.objects.get(username='admin'))
+        self.url = reverse('admin:opac_reservation_changelist')
+
+    def reserve_all(self, stock_ids):
+        for stock_id in stock_ids:
+            for user in User.objects.all():
+                Reservation.objects.create(stock_id=stock_id, user=user)
+
+    def count_queries(self, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_depend_on_row_count(self):
+        self.reserve_all([1])
+        one_stock = self.count_queries({})
+        self.reserve_all([2, 3, 4])
+        self.assertEqual(self.count_queries({}), one_stock)
+
+    def test_only_first_in_queue(self):
+        self.reserve_all([1, 2])
+        response = self.client.get(self.url, {'queue_position': 'first'})
+        self.assertEqual(
+            [reservation.queue_position
+             for reservation in response.context['cl'].result_list],
+            [1, 1])
+
+    def test_order_by_queue_position(self):
+        self.reserve_all([1])
+        response = self.client.get(self.url, {'o': '-6'})
+        self.assertEqual(
+            [reservation.queue_position
+             for reservation in response.context['cl'].result_list],
+            [3, 2, 1])
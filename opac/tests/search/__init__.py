@@ -0,0 +1,9 @@
+from .cache import *  # noqa: F401 F403
+from .facets import *  # noqa: F401 F403
+from .fuzzy import *  # noqa: F401 F403
+from .index_file import *  # noqa: F401 F403
+from .isbn import *  # noqa: F401 F403
+from .query import *  # noqa: F401 F403
+from .ranking import *  # noqa: F401 F403
+from .suggest import *  # noqa: F401 F403
+from .tokenizer import *  # noqa: F401 F403
@@ -0,0 +1,39 @@
+from django.test import SimpleTestCase
+
+from opac.search.cache import SearchResultCache
+
+
+class SearchResultCacheTests(SimpleTestCase):
+    def test_hit_and_miss(self):
+        cache = SearchResultCache()
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', [3, 1, 2])
+        self.assertEqual(cache.get('a'), (3, 1, 2))
+        cache.set('b', [])
+        self.assertEqual(cache.get('b'), ())
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 1)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = SearchResultCache(max_entries=2)
+        cache.set('a', [1])
+        cache.set('b', [2])
+        cache.get('a')
+        cache.set('c', [3])
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), (1, ))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_size_cap(self):
+        cache = SearchResultCache(max_size=5, max_entry_size=3)
+        self.assertIs(cache.set('a', [1, 2, 3, 4]), False)
+        cache.set('b', [1, 2, 3])
+        cache.set('c', [4, 5, 6])
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['size'], 3)
+
+    def test_timeout(self):
+        cache = SearchResultCache(timeout=-1)
+        cache.set('a', [1])
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['entries'], 0)
@@ -0,0 +1,36 @@
+from django.test import SimpleTestCase
+
+from opac.search.facets import BookFacets, BookFacetVector, FacetFilters
+
+
+class BookFacetsTests(SimpleTestCase):
+    def setUp(self):
+        self.facets = BookFacets(
+            {
+                1: BookFacetVector(1, 2014, frozenset({1}), True),
+                2: BookFacetVector(2, 2009, frozenset({1, 2}), False),
+                3: BookFacetVector(1, None, frozenset(), False),
+            },
+            {1: 'pub1', 2: 'pub2'},
+            {1: 'lib1', 2: 'lib2'}
+        )
+
+    def test_counts(self):
+        self.assertEqual(self.facets.counts([3, 2, 1]), {
+            'publisher': [(1, 'pub1', 2), (2, 'pub2', 1)],
+            'year': [(2014, 1), (2009, 1)],
+            'library': [(1, 'lib1', 2), (2, 'lib2', 1)],
+            'lendable': 1,
+        })
+
+    def test_filter_keeps_order(self):
+        filters = FacetFilters(1, None, None, None)
+        self.assertEqual(self.facets.filter([3, 2, 1], filters), [3, 1])
+        filters = FacetFilters(None, None, 1, True)
+        self.assertEqual(self.facets.filter([3, 2, 1], filters), [1])
+
+    def test_filters_from_params(self):
+        filters = FacetFilters.from_params(
+            {'publisher': '2', 'year': 'hoge', 'lendable': '1'})
+        self.assertEqual(filters, FacetFilters(2, None, None, True))
+        self.assertFalse(FacetFilters.from_params({'library': ''}))
@@ -0,0 +1,17 @@
+from django.test import SimpleTestCase
+
+from opac.search.fuzzy import edit_distance, trigrams
+
+
+class FuzzyTests(SimpleTestCase):
+    def test_trigrams(self):
+        self.assertEqual(trigrams('abc'), {'  a', ' ab', 'abc', 'bc '})
+
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance('haskell', 'haskell', 2), 0)
+        self.assertEqual(edit_distance('haskel', 'haskell', 2), 1)
+        self.assertEqual(edit_distance('hsakell', 'haskell', 2), 2)
+
+    def test_edit_distance_is_bounded(self):
+        self.assertEqual(edit_distance('python', 'haskell', 2), 3)
+        self.assertEqual(edit_distance('py', 'haskell', 1), 2)
@@ -0,0 +1,99 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from opac.search.index_file import (
+    IndexFile,
+    IndexFileReader,
+    write_index_file
+)
+
+FIELDS = ['name', 'authors']
+
+
+class IndexFileTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'search.idx')
+        write_index_file(self.path, 'v1', FIELDS, [
+            ('python', 'name', 3, 1),
+            ('haskell', 'name', 2, 1),
+            ('haskell', 'authors', 2, 2),
+            ('haskell', 'name', 5, 1),
+            ('構造', 'name', 1, 1),
+        ])
+
+    def test_postings(self):
+        index_file = IndexFile(self.path)
+        self.assertEqual(index_file.catalog_version, 'v1')
+        books, _ = index_file.postings('haskell')
+        self.assertIsInstance(books, memoryview)
+        self.assertEqual(list(books), [2, 2, 5])
+        self.assertEqual(list(index_file.postings('構造')[0]), [1])
+        self.assertEqual(list(index_file.postings('ruby')[0]), [])
+
+    def test_frequencies(self):
+        index_file = IndexFile(self.path)
+        self.assertEqual(index_file.document_frequencies('haskell'),
+                         {'name': 2, 'authors': 1})
+        self.assertEqual(index_file.book_count('haskell'), 2)
+        self.assertEqual(index_file.frequencies('haskell', {2}),
+                         [(2, 'name', 1), (2, 'authors', 2)])
+        self.assertEqual(index_file.document_frequencies('ruby'), {})
+        self.assertEqual(index_file.book_count('ruby'), 0)
+
+    def test_frequencies_of_many_books(self):
+        # 対象の書籍が転置索引より多い場合は、転置索引を順にたどる
+        index_file = IndexFile(self.path)
+        self.assertEqual(
+            index_file.frequencies('haskell', {1, 2, 3, 4, 5}),
+            [(2, 'name', 1), (2, 'authors', 2), (5, 'name', 1)])
+        self.assertEqual(index_file.frequencies('haskell', {4}), [])
+
+    def test_prefix_terms(self):
+        index_file = IndexFile(self.path)
+        self.assertEqual(index_file.prefix_terms('has'), ['haskell'])
+        self.assertEqual(index_file.prefix_terms('p'), ['python'])
+        self.assertEqual(index_file.prefix_terms('ruby'), [])
+
+    def test_reader_reopens_replaced_file(self):
+        reader = IndexFileReader(self.path)
+        old = reader.get()
+        self.assertIs(reader.get(), old)
+        write_index_file(self.path, 'v2', FIELDS, [('ruby', 'name', 4, 1)])
+        new = reader.get()
+        self.assertEqual(new.catalog_version, 'v2')
+        self.assertEqual(list(new.postings('ruby')[0]), [4])
+        # 置き換え前のファイルも読み続けられる
+        self.assertEqual(list(old.postings('python')[0]), [3])
+
+    def test_missing_and_invalid_file(self):
+        self.assertIsNone(IndexFileReader(self.path + '.missing').get())
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 128)
+        with self.assertRaises(ValueError):
+            IndexFile(self.path)
+
+    def test_truncated_file(self):
+        size = os.path.getsize(self.path)
+        for length in (0, 16, size - 4):
+            with self.subTest(length=length):
+                with open(self.path, 'r+b') as f:
+                    f.truncate(length)
+                with self.assertRaises(ValueError):
+                    IndexFile(self.path)
+
+    def test_reader_ignores_corrupt_file(self):
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 4)
+        reader = IndexFileReader(self.path)
+        with self.assertLogs('opac.search.index_file', 'ERROR'):
+            self.assertIsNone(reader.get())
+        # 置き換えられるまでは、開き直さない (ログも出さない)
+        with self.assertRaises(AssertionError), \
+                self.assertLogs('opac.search.index_file', 'ERROR'):
+            self.assertIsNone(reader.get())
+        write_index_file(self.path, 'v2', FIELDS, [('ruby', 'name', 4, 1)])
+        self.assertEqual(reader.get().catalog_version, 'v2')
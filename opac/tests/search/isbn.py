@@ -0,0 +1,16 @@
+from django.test import SimpleTestCase
+
+from opac.search.isbn import to_isbn13
+
+
+class IsbnTests(SimpleTestCase):
+    def test_to_isbn13(self):
+        self.assertEqual(to_isbn13('9784274067815'), '9784274067815')
+        self.assertEqual(to_isbn13('978-4-274-06781-5'), '9784274067815')
+        self.assertEqual(to_isbn13('4-274-06781-5'), '9784274067815')
+        self.assertEqual(to_isbn13('４２７４０６７８１５'), '9784274067815')
+
+    def test_check_digit(self):
+        self.assertIsNone(to_isbn13('9784274067816'))
+        self.assertIsNone(to_isbn13('4274067816'))
+        self.assertIsNone(to_isbn13('haskell'))
@@ -0,0 +1,118 @@
+from django.test import SimpleTestCase
+
+from opac.search.query import (
+    And,
+    Isbn,
+    Not,
+    Or,
+    Phrase,
+    Term,
+    MAX_DEPTH,
+    YearRange,
+    parse
+)
+
+
+class QueryParseTests(SimpleTestCase):
+    def test_words_are_ored(self):
+        self.assertEqual(
+            parse('Haskell  Python'),
+            Or((Term(None, 'haskell'), Term(None, 'python'))))
+
+    def test_and_binds_tighter_than_or(self):
+        self.assertEqual(
+            parse('a b AND c OR d'),
+            Or((
+                Term(None, 'a'),
+                And((Term(None, 'b'), Term(None, 'c'))),
+                Term(None, 'd'),
+            )))
+
+    def test_not_and_parentheses(self):
+        self.assertEqual(
+            parse('(a OR b) AND NOT c'),
+            And((
+                Or((Term(None, 'a'), Term(None, 'b'))),
+                Not(Term(None, 'c')),
+            )))
+
+    def test_nested_and_or_not(self):
+        self.assertEqual(
+            parse('x AND ((a AND b) OR c)'),
+            And((
+                Term(None, 'x'),
+                Or((And((Term(None, 'a'), Term(None, 'b'))),
+                    Term(None, 'c'))),
+            )))
+        self.assertEqual(
+            parse('a AND NOT (b OR (c AND NOT d))'),
+            And((
+                Term(None, 'a'),
+                Not(Or((
+                    Term(None, 'b'),
+                    And((Term(None, 'c'), Not(Term(None, 'd')))),
+                ))),
+            )))
+
+    def test_lowercase_operators_are_words(self):
+        self.assertEqual(
+            parse('and'), Term(None, 'and'))
+
+    def test_fields(self):
+        self.assertEqual(
+            parse('title:Haskell AND author:"Graham Hutton"'),
+            And((
+                Term('name', 'haskell'),
+                Phrase('authors', 'graham hutton'),
+            )))
+        self.assertEqual(parse('ＰＵＢＬＩＳＨＥＲ:オーム社'),
+                         Term('publisher', 'おーむ社'))
+
+    def test_unknown_field_is_part_of_word(self):
+        self.assertEqual(parse('c++:python'), Term(None, 'c++:python'))
+        self.assertEqual(parse('foo:"bar baz"'),
+                         And((Term(None, 'foo'), Phrase(None, 'bar baz'))))
+
+    def test_isbn_and_year(self):
+        self.assertEqual(parse('isbn:4-274-06781-5'),
+                         Isbn('9784274067815'))
+        self.assertEqual(parse('isbn:123'), Isbn(None))
+        self.assertEqual(parse('year:2014'), YearRange(2014, 2014))
+        self.assertEqual(parse('year:2010-2015'), YearRange(2010, 2015))
+        self.assertEqual(parse('year:-2015'), YearRange(None, 2015))
+        self.assertEqual(parse('year:2010-'), YearRange(2010, None))
+
+    def test_space_in_japanese_name(self):
+        self.assertEqual(parse('村上　春樹'), Term(None, '村上春樹'))
+
+    def test_broken_query_is_tolerated(self):
+        self.assertEqual(parse(')) a (b'),
+                         Or((Term(None, 'a'), Term(None, 'b'))))
+        self.assertEqual(parse('a AND'), Term(None, 'a'))
+        self.assertEqual(parse('"unclosed phrase'),
+                         Phrase(None, 'unclosed phrase'))
+        self.assertIsNone(parse('AND OR NOT ・'))
+
+    def test_repeated_and(self):
+        self.assertEqual(parse('a AND AND b'),
+                         And((Term(None, 'a'), Term(None, 'b'))))
+
+    def test_too_deep_query_is_plain_words(self):
+        depth = MAX_DEPTH
+        self.assertEqual(parse('(' * depth + 'a b' + ')' * depth),
+                         Or((Term(None, 'a'), Term(None, 'b'))))
+        self.assertIsInstance(parse('NOT ' * depth + 'a'), Not)
+        self.assertEqual(parse('(' * (depth + 1) + 'a AND NOT b'),
+                         Or((Term(None, 'a'), Term(None, 'b'))))
+        self.assertEqual(parse('NOT ' * 1000 + 'a'), Term(None, 'a'))
+
+    def test_str(self):
+        for text in ('a b AND c',
+                     '(a b) AND NOT c',
+                     'title:"graham hutton" year:2010-'):
+            self.assertEqual(str(parse(text)), text)
+
+    def test_nodes_of_different_types_are_not_equal(self):
+        children = (Term(None, 'a'), Term(None, 'b'))
+        self.assertNotEqual(And(children), Or(children))
+        self.assertNotEqual(hash(And(children)), hash(Or(children)))
@@ -0,0 +1,28 @@
+from django.test import SimpleTestCase
+
+from opac.search.ranking import BM25F
+
+
+class BM25FTests(SimpleTestCase):
+    def setUp(self):
+        self.bm25f = BM25F(100, {'name': 2, 'publisher': 2})
+
+    def test_field_weight(self):
+        dfs = {'a': 10}
+        in_name = self.bm25f.score(
+            {'a': {'name': 1}}, {'name': 2, 'publisher': 2}, dfs)
+        in_publisher = self.bm25f.score(
+            {'a': {'publisher': 1}}, {'name': 2, 'publisher': 2}, dfs)
+        self.assertGreater(in_name, in_publisher)
+
+    def test_rare_term_weighs_more(self):
+        lengths = {'name': 2}
+        rare = self.bm25f.score({'a': {'name': 1}}, lengths, {'a': 1})
+        common = self.bm25f.score({'a': {'name': 1}}, lengths, {'a': 90})
+        self.assertGreater(rare, common)
+
+    def test_shorter_field_weighs_more(self):
+        dfs = {'a': 10}
+        short = self.bm25f.score({'a': {'name': 1}}, {'name': 1}, dfs)
+        long = self.bm25f.score({'a': {'name': 1}}, {'name': 8}, dfs)
+        self.assertGreater(short, long)
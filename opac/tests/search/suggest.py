@@ -0,0 +1,66 @@
+from django.test import SimpleTestCase
+
+from opac.search.suggest import AUTHOR, TITLE, PrefixIndex
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = PrefixIndex()
+        self.index.rebuild([
+            (TITLE, 1, 'Fluent Python'),
+            (TITLE, 2, 'プログラミングHaskell'),
+            (AUTHOR, 1, 'Luciano Ramalho'),
+        ], 'v1')
+
+    def test_prefix(self):
+        self.assertEqual(self.index.search('Flu'),
+                         [(TITLE, 1, 'Fluent Python')])
+        self.assertEqual(self.index.search('ぷろぐら'),
+                         [(TITLE, 2, 'プログラミングHaskell')])
+
+    def test_word_prefix(self):
+        self.assertEqual(self.index.search('pyth'),
+                         [(TITLE, 1, 'Fluent Python')])
+        self.assertEqual(self.index.search('ram'),
+                         [(AUTHOR, 1, 'Luciano Ramalho')])
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search('', 10)), 0)
+        self.index.rebuild(
+            [(TITLE, i, f'hoge{i}') for i in range(20)], 'v1')
+        self.assertEqual(len(self.index.search('hoge', 5)), 5)
+
+    def test_update(self):
+        self.index.update(TITLE, 1, 'Effective Python')
+        self.assertEqual(self.index.search('flu'), [])
+        self.assertEqual(self.index.search('eff'),
+                         [(TITLE, 1, 'Effective Python')])
+        self.assertEqual(self.index.version, 'v1')
+        self.index.update(TITLE, 1, None)
+        self.assertEqual(self.index.search('python'), [])
+
+    def test_update_before_rebuild(self):
+        index = PrefixIndex()
+        index.update(TITLE, 1, 'Fluent Python')
+        self.assertIsNone(index.version)
+        self.assertEqual(index.search('flu'), [])
+
+    def test_advance(self):
+        self.index.advance('v1', 'v2')
+        self.assertEqual(self.index.version, 'v2')
+
+    def test_advance_after_other_process_update(self):
+        # 他のプロセスが v1 から v2 に上げた後に、このプロセスで v3 に上げた
+        self.index.advance('v2', 'v3')
+        self.assertEqual(self.index.version, 'v1')
+
+    def test_advance_before_rebuild(self):
+        index = PrefixIndex()
+        index.advance('', 'v1')
+        self.assertIsNone(index.version)
+
+    def test_start_rebuild_once(self):
+        self.assertIs(self.index.start_rebuild(), True)
+        self.assertIs(self.index.start_rebuild(), False)
+        self.index.finish_rebuild()
+        self.assertIs(self.index.start_rebuild(), True)
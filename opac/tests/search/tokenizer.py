@@ -0,0 +1,34 @@
+from django.test import SimpleTestCase
+
+from opac.search import normalize, query_terms, split_words, tokenize
+
+
+class NormalizeTests(SimpleTestCase):
+    def test_width_and_case(self):
+        self.assertEqual(normalize('ＦＬＵＥＮＴ　Python'), 'fluent python')
+
+    def test_katakana_to_hiragana(self):
+        self.assertEqual(normalize('ﾌﾟﾛｸﾞﾗﾐﾝｸﾞ'), 'ぷろぐらみんぐ')
+        self.assertEqual(normalize('プログラミング'), 'ぷろぐらみんぐ')
+
+    def test_spaces_between_cjk(self):
+        self.assertEqual(normalize('村上　春樹'), '村上春樹')
+        self.assertEqual(normalize('Haruki 村上'), 'haruki 村上')
+
+
+class TokenizeTests(SimpleTestCase):
+    def test_cjk_unigrams_and_bigrams(self):
+        self.assertEqual(
+            tokenize('春樹'), ['春', '樹', '春樹'])
+
+    def test_script_boundary(self):
+        self.assertEqual(
+            tokenize('第2版Haskell'), ['第', '2', '版', 'haskell'])
+
+    def test_query_terms(self):
+        self.assertEqual(query_terms('村上春樹'), {'村上', '上春', '春樹'})
+        self.assertEqual(query_terms('猫'), {'猫'})
+
+    def test_split_words(self):
+        self.assertEqual(split_words('村上 春樹  Murakami'),
+                         ['村上春樹', 'murakami'])
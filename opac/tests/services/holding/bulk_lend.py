@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from opac.models.caches import CacheVersion
+from opac.models.masters import Stock, User
+from opac.models.transactions import Holding, Lending, Reservation
+from opac.queries import HoldingBulkLendQuery
+from opac.services.holding import HoldingBulkLendService
+
+
+class HoldingBulkLendServiceTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        self.user1 = User.objects.get(pk=1)
+        self.user2 = User.objects.get(pk=2)
+
+    def hold(self, stock_id, user=None):
+        return Holding.objects.create(
+            stock=Stock.objects.get(pk=stock_id),
+            user=user or self.user1,
+            expiration_date=timezone.localdate()
+        )
+
+    def test_lend_all_holdings(self):
+        holdings = [self.hold(1), self.hold(2, self.user2)]
+        Reservation.objects.create(
+            stock=Stock.objects.get(pk=1), user=self.user2)
+        results = HoldingBulkLendService(holdings).exec()
+        self.assertEqual(
+            [(result.holding_id, result.status) for result in results],
+            [(holding.id, HoldingBulkLendQuery.LENT)
+             for holding in holdings])
+        self.assertEqual(Holding.objects.count(), 0)
+        self.assertEqual(
+            set(Lending.objects.values_list('stock_id', 'user_id')),
+            {(1, self.user1.id), (2, self.user2.id)})
+        self.assertEqual(
+            Lending.objects.get(stock_id=1).due_date,
+            timezone.localdate() + timedelta(days=14))
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_skip_stock_already_lent_and_continue(self):
+        holdings = [self.hold(1), self.hold(2)]
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=1),
+            user=self.user2,
+            due_date=timezone.localdate()
+        )
+        results = HoldingBulkLendService(holdings).exec()
+        self.assertEqual(
+            [result.status for result in results],
+            [HoldingBulkLendQuery.LENDING_ALREADY_EXISTS,
+             HoldingBulkLendQuery.LENT])
+        self.assertEqual(
+            list(Holding.objects.values_list('pk', flat=True)),
+            [holdings[0].pk])
+        self.assertEqual(Lending.objects.get(stock_id=1).user, self.user2)
+
+    def test_report_holding_already_removed(self):
+        holdings = [self.hold(1), self.hold(2)]
+        holdings[1].delete()
+        results = HoldingBulkLendService(holdings).exec()
+        self.assertEqual(
+            [(result.status, result.book_id) for result in results],
+            [(HoldingBulkLendQuery.LENT, holdings[0].stock.book_id),
+             (HoldingBulkLendQuery.NOT_FOUND, None)])
+
+    def test_bump_circulation_version_of_lent_books(self):
+        holding = self.hold(1)
+        key = CacheVersion.book_key(
+            CacheVersion.CIRCULATION, holding.stock.book_id)
+        before = CacheVersion.objects.get(key=key).value
+        HoldingBulkLendService([holding]).exec()
+        self.assertNotEqual(CacheVersion.objects.get(key=key).value, before)
+
+    def test_query_count_does_not_depend_on_holding_count(self):
+        def count_queries(stock_ids):
+            holdings = [self.hold(pk) for pk in stock_ids]
+            with CaptureQueriesContext(connection) as context:
+                HoldingBulkLendService(holdings).exec()
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries([1]), count_queries([2, 3, 4, 5]))
@@ -1,2 +1,4 @@
 from .back import *  # noqa: F401 F403
 from .renew import *  # noqa: F401 F403
+from .bulk_back import *  # noqa: F401 F403
+from .bulk_renew import *  # noqa: F401 F403
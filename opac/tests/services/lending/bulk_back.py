@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from opac.models.caches import CacheVersion
+from opac.models.masters import Stock, User
+from opac.models.transactions import Holding, Lending, Renewing, Reservation
+from opac.queries import LendingBulkBackQuery
+from opac.services.lending import LendingBulkBackService
+
+
+class LendingBulkBackServiceTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        self.user1 = User.objects.get(pk=1)
+        self.user2 = User.objects.get(pk=2)
+        self.user3 = User.objects.get(pk=3)
+
+    def lend(self, stock_id, user=None):
+        return Lending.objects.create(
+            stock=Stock.objects.get(pk=stock_id),
+            user=user or self.user1,
+            due_date=timezone.localdate()
+        )
+
+    def reserve(self, stock_id, user, created_at=None):
+        reservation = Reservation.objects.create(
+            stock=Stock.objects.get(pk=stock_id), user=user)
+        if created_at:
+            Reservation.objects \
+                .filter(pk=reservation.pk) \
+                .update(created_at=created_at)
+        return reservation
+
+    def test_back_all_lendings(self):
+        lendings = [self.lend(1), self.lend(2), self.lend(3)]
+        Renewing.objects.create(
+            lending=lendings[0], due_date=timezone.localdate())
+        results = LendingBulkBackService(lendings).exec()
+        self.assertEqual(Lending.objects.count(), 0)
+        self.assertEqual(Renewing.objects.count(), 0)
+        self.assertEqual(
+            [(result.lending_id, result.status) for result in results],
+            [(lending.id, LendingBulkBackQuery.BACKED)
+             for lending in lendings])
+
+    def test_first_reservation_per_stock_becomes_holding(self):
+        now = timezone.now()
+        lendings = [self.lend(1), self.lend(2)]
+        # 予約日時ではなく受付番号の順で、最初の予約を決める
+        self.reserve(1, self.user3, created_at=now)
+        self.reserve(1, self.user2, created_at=now - timedelta(days=1))
+        self.reserve(2, self.user3)
+        results = LendingBulkBackService(lendings).exec()
+        self.assertEqual(
+            [result.status for result in results],
+            [LendingBulkBackQuery.HELD, LendingBulkBackQuery.HELD])
+        self.assertEqual(
+            set(Holding.objects.values_list('stock_id', 'user_id')),
+            {(1, self.user3.id), (2, self.user3.id)})
+        self.assertEqual(
+            list(Reservation.objects.values_list('stock_id', 'user_id')),
+            [(1, self.user2.id)])
+        self.assertEqual(
+            Holding.objects.get(stock_id=1).expiration_date,
+            timezone.localdate() + timedelta(days=14))
+
+    def test_mail_to_each_holding_user(self):
+        lendings = [self.lend(1), self.lend(2), self.lend(3)]
+        self.reserve(1, self.user2)
+        self.reserve(3, self.user3)
+        LendingBulkBackService(lendings).exec()
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            sorted([self.user2.email, self.user3.email]))
+
+    def test_skip_stock_already_held_and_continue(self):
+        lendings = [self.lend(1), self.lend(2)]
+        self.reserve(1, self.user2)
+        self.reserve(2, self.user2)
+        # 蔵書1に取置を直接作っておく
+        Holding.objects.create(
+            stock=Stock.objects.get(pk=1),
+            user=self.user3,
+            expiration_date=timezone.localdate()
+        )
+        results = LendingBulkBackService(lendings).exec()
+        self.assertEqual(
+            [result.status for result in results],
+            [LendingBulkBackQuery.HOLDING_ALREADY_EXISTS,
+             LendingBulkBackQuery.HELD])
+        self.assertEqual(
+            list(Lending.objects.values_list('pk', flat=True)),
+            [lendings[0].pk])
+        self.assertEqual(
+            list(Reservation.objects.values_list('stock_id', flat=True)),
+            [1])
+
+    def test_report_lending_already_backed(self):
+        lendings = [self.lend(1), self.lend(2)]
+        lendings[0].delete()
+        results = LendingBulkBackService(lendings).exec()
+        self.assertEqual(
+            [(result.status, result.is_backed) for result in results],
+            [(LendingBulkBackQuery.NOT_FOUND, False),
+             (LendingBulkBackQuery.BACKED, True)])
+
+    def test_bump_circulation_version_of_backed_books(self):
+        lending = self.lend(1)
+        key = CacheVersion.book_key(
+            CacheVersion.CIRCULATION, lending.stock.book_id)
+        before = CacheVersion.objects.get(key=key).value
+        LendingBulkBackService([lending]).exec()
+        self.assertNotEqual(CacheVersion.objects.get(key=key).value, before)
+
+    def test_query_count_does_not_depend_on_lending_count(self):
+        def count_queries(stock_ids):
+            lendings = [self.lend(pk) for pk in stock_ids]
+            for pk in stock_ids:
+                self.reserve(pk, self.user2)
+                self.reserve(pk, self.user3)
+            with CaptureQueriesContext(connection) as context:
+                LendingBulkBackService(lendings).exec()
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries([1]), count_queries([2, 3, 4, 5]))
@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from opac.models.masters import Stock, User
+from opac.models.transactions import Lending, Renewing, Reservation
+from opac.queries import RenewingBulkCreateQuery, RenewingResult
+from opac.services.lending import LendingBulkRenewService
+
+
+class LendingBulkRenewServiceTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        self.user1 = User.objects.get(pk=1)
+        self.user2 = User.objects.get(pk=2)
+
+    def lend(self, stock_id):
+        return Lending.objects.create(
+            stock=Stock.objects.get(pk=stock_id),
+            user=self.user1,
+            due_date=timezone.localdate()
+        )
+
+    def test_renew_all_lendings(self):
+        lendings = [self.lend(1), self.lend(2)]
+        counts = LendingBulkRenewService(lendings).exec()
+        self.assertEqual(counts, {RenewingBulkCreateQuery.RENEWED: 2})
+        self.assertEqual(
+            set(Renewing.objects.values_list('lending_id', 'due_date')),
+            {(lending.id, timezone.localdate() + timedelta(days=14))
+             for lending in lendings})
+
+    def test_count_per_outcome(self):
+        reserved = self.lend(1)
+        renewed = self.lend(2)
+        reserved_and_renewed = self.lend(3)
+        removed = self.lend(4)
+        renewable = self.lend(5)
+        for lending in (reserved, reserved_and_renewed):
+            Reservation.objects.create(stock=lending.stock, user=self.user2)
+        for lending in (renewed, reserved_and_renewed):
+            Renewing.objects.create(
+                lending=lending, due_date=timezone.localdate())
+        removed.delete()
+        counts = LendingBulkRenewService([
+            reserved, renewed, reserved_and_renewed, removed, renewable
+        ]).exec()
+        self.assertEqual(counts, {
+            RenewingBulkCreateQuery.RENEWED: 1,
+            RenewingBulkCreateQuery.RESERVATION_EXISTS: 2,
+            RenewingBulkCreateQuery.RENEWING_ALREADY_EXISTS: 1,
+            RenewingBulkCreateQuery.NOT_FOUND: 1,
+        })
+        self.assertIs(Renewing.objects.filter(lending=reserved).exists(),
+                      False)
+        self.assertIs(Renewing.objects.filter(lending=renewable).exists(),
+                      True)
+
+    def test_result_per_lending(self):
+        lendings = [self.lend(1), self.lend(2)]
+        Reservation.objects.create(stock=lendings[1].stock, user=self.user2)
+        results = RenewingBulkCreateQuery(lendings).exec()
+        self.assertEqual(results, [
+            RenewingResult(lendings[0].id, lendings[0].stock.book_id,
+                           RenewingBulkCreateQuery.RENEWED),
+            RenewingResult(lendings[1].id, lendings[1].stock.book_id,
+                           RenewingBulkCreateQuery.RESERVATION_EXISTS),
+        ])
+        self.assertEqual(results[0].status, RenewingBulkCreateQuery.RENEWED)
+
+    def test_query_count_does_not_depend_on_lending_count(self):
+        def count_queries(stock_ids):
+            lendings = [self.lend(pk) for pk in stock_ids]
+            with CaptureQueriesContext(connection) as context:
+                LendingBulkRenewService(lendings).exec()
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries([1]), count_queries([2, 3, 4, 5]))
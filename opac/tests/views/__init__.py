@@ -1,2 +1,3 @@
 from .search import *  # noqa: F401 F403
 from .book_detail import *  # noqa: F401 F403
+from .suggest import *  # noqa: F401 F403
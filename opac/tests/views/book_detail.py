@@ -1,10 +1,21 @@
 from datetime import timedelta
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import dateformat, timezone
 
-from opac.models.masters import Stock, User
+from opac.models.masters import Author, Book, Library, Stock, User
 from opac.models.transactions import Holding, Lending, Renewing, Reservation
+from opac.queries import (
+    BookDetailQuery,
+    BookStocksQuery,
+    HoldingLendQuery,
+    LendingBackQuery,
+    StockRow
+)
+from opac.services.lending import LendingBackService
 
 
 class BookDetailViewNotFoundTest(TestCase):
@@ -101,6 +112,35 @@ class BookDetailViewStockListTest(TestCase):
         self.assertContains(response, '予約2人')
 
 
+class BookDetailViewStockQueryTest(TestCase):
+    fixtures = ['masters_minimal']
+
+    def test_queries_do_not_grow_with_stocks(self):
+        stocks = Stock.objects.filter(book__id=1)
+        for i, stock in enumerate(stocks):
+            lending = Lending.objects.create(
+                stock=stock,
+                user=User.objects.get(pk=1),
+                due_date=timezone.localdate()
+            )
+            Renewing.objects.create(
+                lending=lending,
+                due_date=timezone.localdate() + timedelta(days=i)
+            )
+            Reservation.objects.create(
+                stock=stock, user=User.objects.get(pk=2))
+        cache.clear()
+        with self.assertNumQueries(3) as context:
+            self.client.get('/book/1/')
+        for library in Library.objects.all():
+            Stock.objects.create(book_id=1, library=library)
+        cache.clear()
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client.get('/book/1/')
+        self.assertContains(response, '貸出中', count=2)
+        self.assertContains(response, '予約1人', count=2)
+
+
 class BookDetailViewBookDetailTest(TestCase):
     fixtures = ['masters_minimal']
 
@@ -113,3 +153,200 @@ class BookDetailViewBookDetailTest(TestCase):
         self.assertContains(response, 'A5')
         self.assertContains(response, '232')
         self.assertContains(response, '9784274067815')
+
+
+class BookDetailQueryTest(TestCase):
+    fixtures = ['masters_minimal']
+
+    def test_detail(self):
+        with self.assertNumQueries(1):
+            detail = BookDetailQuery(3).exec()
+            self.assertEqual(detail.book.publisher.name, 'オライリー・ジャパン')
+        with self.assertNumQueries(2):
+            self.assertEqual(detail.authors, ('Luciano Ramalho',))
+            self.assertIsInstance(detail.stocks[0], StockRow)
+            self.assertEqual(
+                detail.translators, ('豊沢聡', '桑井博之', '梶原玲子'))
+            self.assertEqual(
+                [stock.status for stock in detail.stocks],
+                [BookStocksQuery.LENDABLE] * len(detail.stocks))
+
+    def test_read_only(self):
+        detail = BookDetailQuery(1).exec()
+        with self.assertRaises(AttributeError):
+            detail.stocks = ()
+        with self.assertRaises(TypeError):
+            detail.authors[0] = ''
+
+    def test_not_found(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(BookDetailQuery(999).exec())
+
+
+class BookDetailViewFragmentCacheTest(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        cache.clear()
+        self.client.get('/book/1/')
+
+    def test_cached(self):
+        # 書籍とキャッシュバージョンの1回だけ
+        with self.assertNumQueries(1):
+            response = self.client.get('/book/1/')
+        self.assertContains(response, 'Harold Abelson')
+        self.assertContains(response, '貸出可能', count=2)
+
+    def test_circulation_refreshes_stocks(self):
+        stock = Stock.objects.filter(book_id=1).first()
+        holding = Holding.objects.create(
+            stock=stock,
+            user=User.objects.get(pk=1),
+            expiration_date=timezone.localdate()
+        )
+        response = self.client.get('/book/1/')
+        self.assertContains(response, '取置中')
+
+        HoldingLendQuery(holding).exec()
+        # 書誌はキャッシュから表示し、蔵書だけ読み込む
+        with self.assertNumQueries(2):
+            response = self.client.get('/book/1/')
+        self.assertContains(response, '貸出中')
+
+        LendingBackQuery(Lending.objects.get(stock=stock)).exec()
+        response = self.client.get('/book/1/')
+        self.assertContains(response, '貸出可能', count=2)
+
+    def test_reservation_refreshes_stocks(self):
+        Reservation.objects.create(
+            stock=Stock.objects.filter(book_id=1).first(),
+            user=User.objects.get(pk=1)
+        )
+        response = self.client.get('/book/1/')
+        self.assertContains(response, '予約1人')
+
+    def test_author_refreshes_detail(self):
+        author = Author.objects.get(name='Harold Abelson')
+        author.name = 'Hal Abelson'
+        author.save()
+        with self.assertNumQueries(2):
+            response = self.client.get('/book/1/')
+        self.assertContains(response, 'Hal Abelson')
+
+    def test_relation_refreshes_detail(self):
+        Book.objects.get(pk=1).authors.remove(
+            Author.objects.get(name='Harold Abelson'))
+        response = self.client.get('/book/1/')
+        self.assertNotContains(response, 'Harold Abelson')
+
+
+class BookDetailViewConditionalGetTest(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        self.response = self.client.get('/book/1/')
+
+    def test_validators(self):
+        self.assertTrue(self.response.has_header('ETag'))
+        self.assertTrue(self.response.has_header('Last-Modified'))
+        self.assertIn('public', self.response['Cache-Control'])
+        self.assertIn('no-cache', self.response['Cache-Control'])
+        self.assertIn('Cookie', self.response['Vary'])
+
+    def test_not_modified(self):
+        # 書籍とキャッシュバージョンの1回だけで、テンプレートは描画しない
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                '/book/1/', HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.response['ETag'])
+        self.assertEqual(response.templates, [])
+
+    def test_if_modified_since(self):
+        response = self.client.get(
+            '/book/1/',
+            HTTP_IF_MODIFIED_SINCE=self.response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_modified_by_circulation(self):
+        Reservation.objects.create(
+            stock=Stock.objects.filter(book_id=1).first(),
+            user=User.objects.get(pk=1)
+        )
+        response = self.client.get(
+            '/book/1/', HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], self.response['ETag'])
+
+    def test_other_book(self):
+        response = self.client.get(
+            '/book/2/', HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_logged_in(self):
+        self.client.force_login(User.objects.get(pk=1))
+        response = self.client.get(
+            '/book/1/', HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+
+@override_settings(OPAC_PAGE_CACHE={'alias': 'page', 'timeout': 600})
+class BookDetailViewPageCacheTest(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        cache.clear()
+        self.response = self.client.get('/book/1/')
+
+    def get_from_page_cache(self, path, **extra):
+        # ページ全体のキャッシュのテーブル以外は読まない
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path, **extra)
+        self.assertEqual([
+            query['sql'] for query in context.captured_queries
+            if 'opac_page_cache' not in query['sql']
+        ], [])
+        return response
+
+    def test_cached(self):
+        self.assertEqual(self.response['Surrogate-Key'], 'book:1')
+        response = self.get_from_page_cache('/book/1/')
+        self.assertEqual(response.content, self.response.content)
+        self.assertEqual(response['ETag'], self.response['ETag'])
+
+    def test_not_modified(self):
+        response = self.get_from_page_cache(
+            '/book/1/', HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_purged_by_service(self):
+        lending = Lending.objects.create(
+            stock=Stock.objects.filter(book_id=1).first(),
+            user=User.objects.get(pk=1),
+            due_date=timezone.localdate()
+        )
+        self.assertContains(self.client.get('/book/1/'), '貸出中')
+        LendingBackService(lending).exec()
+        response = self.client.get('/book/1/')
+        self.assertNotContains(response, '貸出中')
+
+    def test_purged_by_author(self):
+        author = Author.objects.get(name='Harold Abelson')
+        author.name = 'Hal Abelson'
+        author.save()
+        self.assertContains(self.client.get('/book/1/'), 'Hal Abelson')
+
+    def test_other_books_kept(self):
+        self.client.get('/book/2/')
+        Reservation.objects.create(
+            stock=Stock.objects.filter(book_id=1).first(),
+            user=User.objects.get(pk=1)
+        )
+        self.get_from_page_cache('/book/2/')
+
+    def test_logged_in(self):
+        self.client.force_login(User.objects.get(pk=1))
+        response = self.client.get('/book/1/')
+        self.assertFalse(response.has_header('Surrogate-Key'))
+        self.assertContains(response, User.objects.get(pk=1).username)
@@ -1,6 +1,36 @@
-from django.test import TestCase
+import os
+import re
+import tempfile
+from datetime import date, timedelta
+from html import unescape
+from io import StringIO
+from unittest import mock
 
-from opac.models.masters import Book, Publisher
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from opac.models.masters import (
+    Author,
+    Book,
+    Publisher,
+    Stock,
+    Translator,
+    User
+)
+from opac.models.search import BookSearchDocument, BookSearchPosting
+from opac.models.transactions import Holding, Lending, Reservation
+from opac.queries import (
+    BookFacetCountQuery,
+    BookRow,
+    BookSearchIndexFileQuery,
+    BookSearchQuery,
+    CachedBookSearchQuery
+)
+from opac.search.cache import search_result_cache
 
 
 class SearchViewRequestDispatchTests(TestCase):
@@ -27,3 +57,932 @@ class SearchViewRenderToResponseTests(TestCase):
         Book.objects.create(name='hoge', publisher=publisher)
         response = self.client.get('/search/?words=hoge')
         self.assertNotContains(response, '該当する書籍が見つかりませんでした。')
+
+
+class SearchViewIndexTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def test_fixture_books_are_indexed(self):
+        response = self.client.get('/search/?words=Python')
+        self.assertContains(response, 'Fluent Python')
+        self.assertNotContains(response, 'プログラミングHaskell')
+
+    def test_author_translator_and_publisher(self):
+        response = self.client.get('/search/?words=hutton')
+        self.assertContains(response, 'プログラミングHaskell')
+        response = self.client.get('/search/?words=山本和彦')
+        self.assertContains(response, 'プログラミングHaskell')
+        response = self.client.get('/search/?words=オーム社')
+        self.assertContains(response, 'プログラミングHaskell')
+
+    def test_words_are_ored(self):
+        response = self.client.get('/search/?words=hutton ramalho')
+        self.assertContains(response, 'プログラミングHaskell')
+        self.assertContains(response, 'Fluent Python')
+
+    def test_terms_in_word_are_anded(self):
+        response = self.client.get('/search/?words=graham-ramalho')
+        self.assertContains(response, '該当する書籍が見つかりませんでした。')
+
+    def test_partial_latin_word(self):
+        Book.objects.create(
+            name='JavaScript入門', publisher=Publisher.objects.first())
+        response = self.client.get('/search/?words=pyth')
+        self.assertContains(response, 'Fluent Python')
+        self.assertNotIn('corrected_words', response.context)
+        response = self.client.get('/search/?words=java')
+        self.assertContains(response, 'JavaScript入門')
+        response = self.client.get('/search/?words=title:flu AND ramal')
+        self.assertContains(response, 'Fluent Python')
+
+    def test_rebuild_missing_index(self):
+        # 索引を作る前から登録されていた書籍
+        BookSearchDocument.objects.filter(book__name='Fluent Python').delete()
+        BookSearchPosting.objects \
+            .filter(book__name='Fluent Python') \
+            .delete()
+        search_result_cache.clear()
+        response = self.client.get('/search/?words=python')
+        self.assertNotContains(response, 'Fluent Python')
+        stdout = StringIO()
+        call_command('rebuild_search_index', missing=True, stdout=stdout)
+        self.assertIn('1冊', stdout.getvalue())
+        search_result_cache.clear()
+        response = self.client.get('/search/?words=python')
+        self.assertContains(response, 'Fluent Python')
+
+    def test_renamed_author(self):
+        author = Author.objects.get(name='Graham Hutton')
+        author.name = 'Simon Thompson'
+        author.save()
+        response = self.client.get('/search/?words=hutton')
+        self.assertContains(response, '該当する書籍が見つかりませんでした。')
+        response = self.client.get('/search/?words=thompson')
+        self.assertContains(response, 'プログラミングHaskell')
+
+    def test_added_and_removed_author(self):
+        author = Author.objects.create(name='Simon Thompson')
+        book = Book.objects.get(pk=2)
+        book.authors.add(author)
+        response = self.client.get('/search/?words=thompson')
+        self.assertContains(response, 'プログラミングHaskell')
+        author.books.clear()
+        response = self.client.get('/search/?words=thompson')
+        self.assertContains(response, '該当する書籍が見つかりませんでした。')
+
+    def test_deleted_translator(self):
+        Translator.objects.get(name='山本和彦').delete()
+        response = self.client.get('/search/?words=山本和彦')
+        self.assertContains(response, '該当する書籍が見つかりませんでした。')
+
+
+class SearchViewNormalizationTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def test_width_and_kana_variants(self):
+        for words in ('ﾌﾟﾛｸﾞﾗﾐﾝｸﾞ', 'ぷろぐらみんぐ', 'ＨＡＳＫＥＬＬ'):
+            response = self.client.get('/search/', {'words': words})
+            self.assertContains(response, 'プログラミングHaskell')
+
+    def test_substring_of_japanese_title(self):
+        response = self.client.get('/search/', {'words': '構造と解釈'})
+        self.assertContains(response, '計算機プログラムの構造と解釈第2版')
+
+    def test_space_in_japanese_name(self):
+        Author.objects.create(name='村上 春樹').books.add(Book.objects.get(pk=3))
+        for words in ('村上春樹', '村上 春樹', '村上　春樹'):
+            response = self.client.get('/search/', {'words': words})
+            self.assertContains(response, 'Fluent Python')
+
+    def test_bigrams_out_of_order(self):
+        publisher = Publisher.objects.get(pk=1)
+        Book.objects.create(name='京都と東京', publisher=publisher)
+        response = self.client.get('/search/', {'words': '東京都'})
+        self.assertContains(response, '該当する書籍が見つかりませんでした。')
+        response = self.client.get('/search/', {'words': '京都'})
+        self.assertContains(response, '京都と東京')
+
+
+class SearchViewPaginationTests(TestCase):
+    def setUp(self):
+        publisher = Publisher.objects.create(name='pub')
+        for i in range(25):
+            Book.objects.create(
+                name=f'hoge{i:02}',
+                publisher=publisher,
+                issue_date=date(2000, 1, 1) + timedelta(days=i)
+            )
+
+    def test_count_and_first_page(self):
+        response = self.client.get('/search/?words=pub&order=issue_date')
+        self.assertContains(response, '該当件数：25件')
+        self.assertEqual(len(response.context['books']), 20)
+        self.assertEqual(response.context['books'][0].name, 'hoge24')
+
+    def test_last_page(self):
+        response = self.client.get(
+            '/search/?words=pub&order=issue_date&page=2')
+        self.assertEqual(
+            [book.name for book in response.context['books']],
+            ['hoge04', 'hoge03', 'hoge02', 'hoge01', 'hoge00'])
+
+    def test_page_out_of_range(self):
+        response = self.client.get(
+            '/search/?words=pub&order=issue_date&page=3')
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchViewCursorPaginationTests(TestCase):
+    def setUp(self):
+        publisher = Publisher.objects.create(name='pub')
+        for i in range(24):
+            Book.objects.create(
+                name=f'hoge{i:02}',
+                publisher=publisher,
+                issue_date=date(2000, 1, 1) + timedelta(days=i // 2)
+            )
+        for i in range(24, 26):
+            Book.objects.create(name=f'hoge{i:02}', publisher=publisher)
+
+    def get_names(self, response):
+        return [book.name for book in response.context['books']]
+
+    def test_walk_forward_and_back(self):
+        response = self.client.get('/search/?words=pub&cursor=')
+        first_page = self.get_names(response)
+        self.assertContains(response, '該当件数：26件')
+        self.assertEqual(first_page[:3], ['hoge22', 'hoge23', 'hoge20'])
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
+
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(
+            '/search/', {'words': 'pub', 'cursor': next_cursor})
+        self.assertEqual(
+            self.get_names(response),
+            ['hoge02', 'hoge03', 'hoge00', 'hoge01', 'hoge24', 'hoge25'])
+        self.assertIsNone(response.context['page_obj'].next_cursor)
+
+        previous_cursor = response.context['page_obj'].previous_cursor
+        response = self.client.get(
+            '/search/', {'words': 'pub', 'cursor': previous_cursor})
+        self.assertEqual(self.get_names(response), first_page)
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/search/?words=pub&cursor=hoge')
+        self.assertEqual(response.status_code, 404)
+
+    def follow(self, response, pattern):
+        href = re.search(
+            r'<a[^>]*href="([^"]*)"[^>]*>\s*' + pattern,
+            response.content.decode()).group(1)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/search/' + unescape(href))
+        self.assertFalse(any(
+            'OFFSET' in query['sql'] for query in context.captured_queries))
+        return response
+
+    def test_follow_rendered_links_into_cursor_mode(self):
+        response = self.client.get(
+            '/search/', {'words': 'pub', 'order': 'relevance'})
+        self.assertIs(response.context['is_cursor_paginated'], False)
+
+        response = self.follow(response, '発行日順')
+        self.assertIs(response.context['is_cursor_paginated'], True)
+        first_page = self.get_names(response)
+        self.assertEqual(first_page[:3], ['hoge22', 'hoge23', 'hoge20'])
+
+        response = self.follow(response, '<span aria-hidden="true">&raquo;')
+        self.assertEqual(
+            self.get_names(response),
+            ['hoge02', 'hoge03', 'hoge00', 'hoge01', 'hoge24', 'hoge25'])
+
+        response = self.follow(response, '<span aria-hidden="true">&laquo;')
+        self.assertEqual(self.get_names(response), first_page)
+
+    def test_offset_page_links_to_cursor_page(self):
+        response = self.client.get(
+            '/search/', {'words': 'pub', 'order': 'issue_date', 'page': 1})
+        self.assertIs(response.context['is_cursor_paginated'], False)
+        response = self.follow(response, '<span aria-hidden="true">&raquo;')
+        self.assertIs(response.context['is_cursor_paginated'], True)
+        self.assertEqual(
+            self.get_names(response),
+            ['hoge02', 'hoge03', 'hoge00', 'hoge01', 'hoge24', 'hoge25'])
+
+
+class SearchViewCacheTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def test_cached_result_is_invalidated(self):
+        self.client.get('/search/?words=haskell')
+        response = self.client.get('/search/?words=haskell')
+        self.assertEqual(response.context['paginator'].count, 1)
+
+        Book.objects.create(
+            name='Haskell入門', publisher=Publisher.objects.get(pk=1))
+        response = self.client.get('/search/?words=haskell')
+        self.assertEqual(response.context['paginator'].count, 2)
+
+        self.client.get('/search/?words=hutton')
+        author = Author.objects.get(name='Graham Hutton')
+        author.books.add(Book.objects.get(pk=3))
+        response = self.client.get('/search/?words=hutton')
+        self.assertEqual(response.context['paginator'].count, 2)
+
+    def test_cached_result_is_not_searched_again(self):
+        self.client.get('/search/?words=haskell&order=relevance')
+        with self.assertNumQueries(1):
+            CachedBookSearchQuery(
+                'haskell', BookSearchQuery.RELEVANCE).exec()
+
+
+class SearchViewRelevanceTests(TestCase):
+    def setUp(self):
+        Book.objects.create(
+            name='Haskell',
+            publisher=Publisher.objects.create(name='pub'),
+            issue_date=date(1990, 1, 1)
+        )
+        for i in range(3):
+            Book.objects.create(
+                name=f'hoge{i}',
+                publisher=Publisher.objects.create(name=f'Haskell pub{i}'),
+                issue_date=date(2018, 1, 1)
+            )
+
+    def test_title_match_comes_first(self):
+        response = self.client.get('/search/?words=haskell&order=relevance')
+        self.assertEqual(response.context['order'], 'relevance')
+        self.assertEqual(response.context['books'][0].name, 'Haskell')
+
+    def test_issue_date_order(self):
+        response = self.client.get('/search/?words=haskell&order=issue_date')
+        self.assertEqual(response.context['books'][3].name, 'Haskell')
+
+    def test_issue_date_order_is_default(self):
+        response = self.client.get('/search/?words=haskell')
+        self.assertEqual(response.context['order'], 'issue_date')
+        self.assertEqual(response.context['books'][3].name, 'Haskell')
+
+    def test_unindexed_book_is_ranked(self):
+        # 索引を作る前から登録されていた書籍
+        book = Book.objects.get(name='hoge0')
+        BookSearchDocument.objects.filter(book=book).delete()
+        response = self.client.get('/search/?words=haskell&order=relevance')
+        self.assertEqual(response.context['paginator'].count, 4)
+        self.assertIn(book.id, [b.id for b in response.context['books']])
+
+
+class SearchViewIndexFileTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'search.idx')
+
+    def get_names(self, words):
+        response = self.client.get('/search/', {'words': words})
+        return [book.name for book in response.context['books']]
+
+    def test_same_ranking_without_aggregation_queries(self):
+        expected = self.get_names('プログラ OR python')
+        call_command('build_search_index_file', output=self.path,
+                     stdout=StringIO())
+        with self.settings(OPAC_SEARCH_INDEX_FILE=self.path):
+            search_result_cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(
+                    self.get_names('プログラ OR python'), expected)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'opac_booksearchposting' in query['sql']
+            and ('COUNT(' in query['sql'] or '"frequency"' in query['sql'])
+        ])
+
+    def test_partial_latin_word(self):
+        call_command('build_search_index_file', output=self.path,
+                     stdout=StringIO())
+        with self.settings(OPAC_SEARCH_INDEX_FILE=self.path):
+            self.assertEqual(self.get_names('pyth AND ramal'),
+                             ['Fluent Python'])
+
+    def test_stale_file_is_not_used(self):
+        call_command('build_search_index_file', output=self.path,
+                     stdout=StringIO())
+        with self.settings(OPAC_SEARCH_INDEX_FILE=self.path):
+            self.assertIsNotNone(BookSearchIndexFileQuery().exec())
+            Book.objects.create(
+                name='Python入門', publisher=Publisher.objects.get(pk=1))
+            self.assertIsNone(BookSearchIndexFileQuery().exec())
+
+    def test_corrupt_file_falls_back_to_database(self):
+        expected = self.get_names('プログラ OR python')
+        call_command('build_search_index_file', output=self.path,
+                     stdout=StringIO())
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) // 2)
+        with self.settings(OPAC_SEARCH_INDEX_FILE=self.path):
+            search_result_cache.clear()
+            with self.assertLogs('opac.search.index_file', 'ERROR'):
+                self.assertEqual(
+                    self.get_names('プログラ OR python'), expected)
+
+    def test_rebuild_only_stale_file(self):
+        call_command('build_search_index_file', output=self.path,
+                     stdout=StringIO())
+        stdout = StringIO()
+        call_command('build_search_index_file', output=self.path,
+                     if_stale=True, stdout=stdout)
+        self.assertIn('最新です', stdout.getvalue())
+        Book.objects.create(
+            name='Python入門', publisher=Publisher.objects.get(pk=1))
+        stdout = StringIO()
+        call_command('build_search_index_file', output=self.path,
+                     if_stale=True, stdout=stdout)
+        self.assertIn('書き出しました', stdout.getvalue())
+        with self.settings(OPAC_SEARCH_INDEX_FILE=self.path):
+            self.assertIsNotNone(BookSearchIndexFileQuery().exec())
+
+
+class SearchViewFuzzyTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def test_misspelled_title(self):
+        response = self.client.get('/search/?words=haskll')
+        self.assertContains(response, 'プログラミングHaskell')
+        self.assertContains(response, '「haskell」の検索結果を表示しています。')
+
+    def test_misspelled_author(self):
+        response = self.client.get('/search/?words=Ramaho')
+        self.assertContains(response, 'Fluent Python')
+        self.assertEqual(response.context['corrected_words'], 'ramalho')
+
+    def test_exact_match_is_not_corrected(self):
+        response = self.client.get('/search/?words=haskell')
+        self.assertNotIn('corrected_words', response.context)
+
+    def test_too_far(self):
+        response = self.client.get('/search/?words=hoskle')
+        self.assertContains(response, '該当する書籍が見つかりませんでした。')
+
+    def test_words_with_symbols_are_not_corrected(self):
+        for words in ('c++', 'foo-bar', 'Ｃ＋＋'):
+            with self.subTest(words=words):
+                response = self.client.get('/search/', {'words': words})
+                self.assertNotIn('corrected_words', response.context)
+
+    def test_corrected_word_keeps_symbols(self):
+        response = self.client.get('/search/', {'words': 'fluent-pyhton'})
+        self.assertEqual(response.context['corrected_words'], 'fluent-python')
+
+
+class SearchViewQueryLanguageTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def search(self, words):
+        response = self.client.get('/search/', {'words': words})
+        if 'books' not in response.context:
+            return []
+        return sorted(book.id for book in response.context['books'])
+
+    def test_and_or_not(self):
+        self.assertEqual(self.search('sussman AND abelson'), [1])
+        self.assertEqual(self.search('sussman AND hutton'), [])
+        self.assertEqual(self.search('sussman OR hutton'), [1, 2])
+        self.assertEqual(self.search('プログラ AND NOT haskell'), [1])
+        self.assertEqual(self.search('NOT プログラ'), [3])
+
+    def test_fields(self):
+        self.assertEqual(self.search('title:haskell'), [2])
+        self.assertEqual(self.search('author:haskell'), [])
+        self.assertEqual(self.search('translator:和田'), [1])
+        self.assertEqual(self.search('publisher:オーム社'), [2])
+
+    def test_phrase(self):
+        self.assertEqual(self.search('"luciano ramalho"'), [3])
+        self.assertEqual(self.search('"ramalho luciano"'), [])
+
+    def test_isbn_and_year(self):
+        self.assertEqual(self.search('isbn:4274067815 OR python'), [2, 3])
+        self.assertEqual(self.search('year:2010-'), [1, 3])
+        self.assertEqual(self.search('year:2014 OR year:-2009'), [1, 2])
+        self.assertEqual(self.search('year:-2015 AND python'), [])
+
+    def test_nested_and_or_not(self):
+        self.assertEqual(
+            self.search('python AND (fluent OR (programming AND haskell))'),
+            [3])
+        self.assertEqual(
+            self.search('プログラ AND ((sussman AND abelson) OR hutton)'),
+            [1, 2])
+        self.assertEqual(
+            self.search('プログラ AND NOT (haskell OR (sussman AND NOT 和田))'),
+            [1])
+        self.assertEqual(
+            self.search('(python OR (year:2014 AND sussman)) AND NOT fluent'),
+            [1])
+
+    def test_year_is_not_counted_when_other_clause_is_estimated(self):
+        with self.assertNumQueries(1):
+            BookSearchQuery('year:2010- AND python').exec()
+        with self.assertNumQueries(1):
+            BookSearchQuery('python AND (year:2010- AND fluent)').exec()
+        # 発行年どうしの AND だけは、件数を数えて順序を決める
+        with self.assertNumQueries(0):
+            BookSearchQuery('year:2010- OR year:-2009').exec()
+        with self.assertNumQueries(2):
+            BookSearchQuery('year:2010- AND year:-2015').exec()
+
+    def test_plan_is_built_with_one_query(self):
+        with self.assertNumQueries(1):
+            BookSearchQuery('sussman AND (hutton OR NOT python)').exec()
+
+    def test_too_deep_query(self):
+        self.assertEqual(self.search('(' * 600 + 'haskell'), [2])
+        self.assertEqual(self.search('NOT ' * 600 + 'haskell'), [2])
+
+    def test_corrected_query_keeps_operators(self):
+        response = self.client.get(
+            '/search/', {'words': 'title:haskll AND NOT pyhton'})
+        self.assertEqual(
+            response.context['corrected_words'],
+            'title:haskell AND NOT python')
+        self.assertContains(response, 'プログラミングHaskell')
+
+
+class SearchViewFacetTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=3),
+            user=User.objects.get(pk=1),
+            due_date=date.today()
+        )
+        Holding.objects.create(
+            stock=Stock.objects.get(pk=4),
+            user=User.objects.get(pk=1),
+            expiration_date=date.today()
+        )
+
+    def get_names(self, response):
+        return sorted(book.name for book in response.context['books'])
+
+    def test_counts(self):
+        response = self.client.get('/search/?words=プログラ OR python')
+        facet_counts = response.context['facet_counts']
+        self.assertEqual(
+            [count for _, _, count in facet_counts['publisher']], [1, 1, 1])
+        self.assertEqual(
+            facet_counts['year'], [(2017, 1), (2014, 1), (2009, 1)])
+        self.assertEqual(
+            facet_counts['library'], [(1, '本館', 3), (2, '別館1', 1)])
+        self.assertEqual(facet_counts['lendable'], 2)
+
+    def test_drill_down(self):
+        response = self.client.get(
+            '/search/?words=プログラ OR python&lendable=1')
+        self.assertEqual(
+            self.get_names(response),
+            ['Fluent Python', '計算機プログラムの構造と解釈第2版'])
+        self.assertEqual(response.context['facet_counts']['lendable'], 2)
+
+        response = self.client.get(
+            '/search/?words=プログラ OR python&library=2')
+        self.assertEqual(self.get_names(response), ['Fluent Python'])
+        response = self.client.get(
+            '/search/?words=プログラ OR python&year=2009&publisher=1')
+        self.assertEqual(self.get_names(response), ['プログラミングHaskell'])
+
+    def test_cursor_pagination(self):
+        response = self.client.get(
+            '/search/?words=プログラ OR python&cursor=&lendable=1')
+        self.assertEqual(
+            self.get_names(response),
+            ['Fluent Python', '計算機プログラムの構造と解釈第2版'])
+
+    def test_counts_of_result_too_large_to_cache(self):
+        with mock.patch.object(search_result_cache, 'max_entry_size', 1):
+            response = self.client.get('/search/?words=プログラ OR python')
+        facet_counts = response.context['facet_counts']
+        self.assertEqual(
+            [count for _, _, count in facet_counts['publisher']], [1, 1, 1])
+        self.assertEqual(
+            facet_counts['year'], [(2017, 1), (2014, 1), (2009, 1)])
+        self.assertEqual(
+            facet_counts['library'], [(1, '本館', 3), (2, '別館1', 1)])
+        self.assertEqual(facet_counts['lendable'], 2)
+
+    def test_counts_in_one_grouped_query(self):
+        book_ids = BookSearchQuery('プログラ OR python').exec()
+        with CaptureQueriesContext(connection) as context:
+            BookFacetCountQuery(book_ids).exec()
+        # 図書館の一覧と、検索結果を一度だけ評価する集計の2回
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertEqual(
+            context.captured_queries[1]['sql'].count('GROUP BY'), 1)
+        self.assertEqual(
+            context.captured_queries[1]['sql'].count("'python%'"), 1)
+
+    def test_drill_down_result_too_large_to_cache(self):
+        with mock.patch.object(search_result_cache, 'max_entry_size', 1):
+            response = self.client.get(
+                '/search/?words=プログラ OR python&year=2009&publisher=1')
+        self.assertEqual(self.get_names(response), ['プログラミングHaskell'])
+        self.assertEqual(
+            response.context['facet_counts']['year'], [(2009, 1)])
+
+    def test_large_result_does_not_load_every_id(self):
+        publisher = Publisher.objects.get(pk=1)
+        for i in range(50):
+            book = Book.objects.create(
+                name=f'Haskell {i}', publisher=publisher)
+            Stock.objects.create(book=book, library_id=1)
+        for params in ({}, {'order': 'issue_date', 'page': 1}, {'cursor': ''}):
+            with self.subTest(params=params), \
+                    mock.patch.object(search_result_cache,
+                                      'max_entry_size', 10), \
+                    CaptureQueriesContext(connection) as context:
+                response = self.client.get(
+                    '/search/', {'words': 'haskell', **params})
+            self.assertEqual(
+                response.context['facet_counts']['library'],
+                [(1, '本館', 51)])
+            # 書籍IDの一覧はページ分 (20件) より多く読み込まない
+            self.assertFalse([
+                query for query in context.captured_queries
+                if re.search(r'IN \((\d+, ){20,}\d+\)', query['sql'])
+            ])
+
+    def test_drill_down_reuses_cached_result(self):
+        self.client.get('/search/?words=python')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/search/?words=python&year=2017')
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'opac_booksearchposting' in query['sql']
+        ])
+
+
+class SearchViewAvailabilityTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        # 書籍2の蔵書 (3, 4) は貸出中と取置中、書籍3の蔵書6は別館1
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=3),
+            user=User.objects.get(pk=1),
+            due_date=date.today()
+        )
+        Holding.objects.create(
+            stock=Stock.objects.get(pk=4),
+            user=User.objects.get(pk=1),
+            expiration_date=date.today()
+        )
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=6),
+            user=User.objects.get(pk=2),
+            due_date=date.today()
+        )
+
+    def search(self, **kwargs):
+        return sorted(BookSearchQuery('プログラ OR python', **kwargs).exec())
+
+    def test_filters(self):
+        self.assertEqual(self.search(), [1, 2, 3])
+        self.assertEqual(self.search(lendable=True), [1, 3])
+        self.assertEqual(self.search(library=2), [3])
+        self.assertEqual(self.search(lendable=True, library=2), [])
+        self.assertEqual(self.search(lendable=True, library=1), [1, 3])
+
+    def test_filtered_in_one_query(self):
+        book_ids = BookSearchQuery(
+            'プログラ OR python', lendable=True, library=1).exec()
+        with self.assertNumQueries(1):
+            self.assertEqual(book_ids.count(), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(book_ids[1:]), [1])
+
+    def test_view(self):
+        response = self.client.get(
+            '/search/?words=プログラ OR python&lendable=1&library=2')
+        self.assertContains(response, '該当する書籍が見つかりませんでした。')
+        response = self.client.get(
+            '/search/?words=プログラ OR python&lendable=1&cursor=')
+        self.assertEqual(
+            [book.id for book in response.context['books']], [3, 1])
+
+    def test_not_cached(self):
+        url = '/search/?words=プログラ OR python&lendable=1'
+        self.assertEqual(self.client.get(url).context['paginator'].count, 2)
+        Lending.objects.get(stock_id=6).delete()
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=5),
+            user=User.objects.get(pk=2),
+            due_date=date.today()
+        )
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=1),
+            user=User.objects.get(pk=2),
+            due_date=date.today()
+        )
+        self.assertEqual(self.client.get(url).context['paginator'].count, 2)
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=2),
+            user=User.objects.get(pk=3),
+            due_date=date.today()
+        )
+        self.assertEqual(self.client.get(url).context['paginator'].count, 1)
+
+
+class SearchViewStockSummaryTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=3),
+            user=User.objects.get(pk=1),
+            due_date=date.today()
+        )
+        Holding.objects.create(
+            stock=Stock.objects.get(pk=4),
+            user=User.objects.get(pk=1),
+            expiration_date=date.today()
+        )
+        for pk in (2, 3):
+            Reservation.objects.create(
+                stock=Stock.objects.get(pk=3), user=User.objects.get(pk=pk))
+        Reservation.objects.create(
+            stock=Stock.objects.get(pk=4), user=User.objects.get(pk=2))
+
+    def get_summaries(self, response):
+        return {
+            book.id: (book.stock_count, book.lendable_count, book.lent_count,
+                      book.held_count, book.reservation_count)
+            for book in response.context['books']
+        }
+
+    def test_counts(self):
+        response = self.client.get('/search/?words=プログラ OR python')
+        self.assertEqual(self.get_summaries(response), {
+            1: (2, 2, 0, 0, 0),
+            2: (2, 0, 1, 1, 3),
+            3: (2, 2, 0, 0, 0),
+        })
+        self.assertContains(response, '貸出可能 0/2冊')
+        self.assertContains(response, '予約 3人')
+
+    def test_no_queries_per_book(self):
+        # 検索結果はキャッシュ済みなので、バージョンの確認・ファセット・
+        # 書籍 (蔵書の集計を含む)・著者と訳者の4回
+        self.client.get('/search/?words=プログラ')
+        self.client.get('/search/?words=プログラ OR python')
+        with self.assertNumQueries(4):
+            self.client.get('/search/?words=プログラ')
+        with self.assertNumQueries(4):
+            self.client.get('/search/?words=プログラ OR python')
+
+    def test_rows_refresh_on_circulation(self):
+        self.client.get('/search/?words=プログラ')
+        Lending.objects.get(stock__pk=3).delete()
+        response = self.client.get('/search/?words=プログラ')
+        self.assertNotContains(response, '貸出中 1冊')
+        self.assertContains(response, '貸出可能 1/2冊')
+
+    def test_rows_refresh_on_book_change(self):
+        self.client.get('/search/?words=プログラ')
+        translator = Translator.objects.get(name='山本和彦')
+        translator.name = '山本 和彦'
+        translator.save()
+        response = self.client.get('/search/?words=プログラ')
+        self.assertContains(response, '山本 和彦')
+
+
+class SearchViewReadModelTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def test_rows(self):
+        response = self.client.get('/search/?words=haskell')
+        book, = response.context['books']
+        self.assertIsInstance(book, BookRow)
+        self.assertFalse(hasattr(book, '__dict__'))
+        self.assertEqual(book.authors, ('Graham Hutton',))
+        self.assertEqual(book.translators, ('山本和彦',))
+        self.assertEqual(book.publisher_name, 'オーム社')
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command('benchmark_read_models', rows=5, repeat=1, stdout=out)
+        self.assertIn('BookRow', out.getvalue())
+        self.assertIn('StockRow', out.getvalue())
+        # 計測用のデータは残さない
+        self.assertEqual(Book.objects.count(), 3)
+
+
+class SearchViewConditionalGetTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        self.response = self.client.get('/search/?words=プログラ')
+
+    def test_not_modified(self):
+        # 表示する書籍の行は読むが、テンプレートは描画しない
+        response = self.client.get(
+            '/search/?words=プログラ',
+            HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertTemplateNotUsed(response, 'opac/book_list.html')
+
+    def test_not_modified_by_circulation_of_other_books(self):
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=5),
+            user=User.objects.get(pk=1),
+            due_date=date.today()
+        )
+        response = self.client.get(
+            '/search/?words=プログラ',
+            HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_lendable_result_is_modified_by_any_circulation(self):
+        response = self.client.get('/search/?words=プログラ&lendable=1')
+        self.assertTrue(response.has_header('Last-Modified'))
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=5),
+            user=User.objects.get(pk=1),
+            due_date=date.today()
+        )
+        response = self.client.get(
+            '/search/?words=プログラ&lendable=1',
+            HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_modified_by_circulation(self):
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=3),
+            user=User.objects.get(pk=1),
+            due_date=date.today()
+        )
+        response = self.client.get(
+            '/search/?words=プログラ',
+            HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '貸出中 1冊')
+
+    def test_modified_by_catalog(self):
+        book = Book.objects.get(pk=2)
+        book.name = 'プログラミングHaskell 第2版'
+        book.save()
+        response = self.client.get(
+            '/search/?words=プログラ',
+            HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '第2版')
+
+
+@override_settings(
+    OPAC_PAGE_CACHE={'alias': 'page', 'timeout': 600, 'max_keys': 2})
+class SearchViewPageCacheTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        cache.clear()
+        self.response = self.client.get('/search/?words=プログラ')
+
+    def get_from_page_cache(self, path):
+        # ページ全体のキャッシュのテーブル以外は読まない
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        self.assertEqual([
+            query['sql'] for query in context.captured_queries
+            if 'opac_page_cache' not in query['sql']
+        ], [])
+        return response
+
+    def test_cached(self):
+        self.assertEqual(
+            self.response['Surrogate-Key'].split(),
+            ['catalog', 'book:1', 'book:2'])
+        response = self.get_from_page_cache('/search/?words=プログラ')
+        self.assertEqual(response.content, self.response.content)
+
+    def test_not_used_with_local_memory_cache(self):
+        # プロセスごとのキャッシュでは、他のワーカーの purge が届かない
+        with self.settings(OPAC_PAGE_CACHE={'alias': 'default',
+                                            'timeout': 600}):
+            response = self.client.get('/search/?words=プログラ')
+        self.assertFalse(response.has_header('Surrogate-Key'))
+
+    def test_purged_after_sequence_is_lost(self):
+        caches['page'].delete('opac.page.sequence')
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=3),
+            user=User.objects.get(pk=1),
+            due_date=date.today()
+        )
+        response = self.client.get('/search/?words=プログラ')
+        self.assertContains(response, '貸出中 1冊')
+
+    def test_purged_after_key_record_is_lost(self):
+        caches['page'].delete('opac.page.key.book:2')
+        response = self.client.get('/search/?words=プログラ')
+        self.assertTrue([
+            template for template in response.templates
+            if template.name == 'opac/book_list.html'
+        ])
+
+    def test_purged_by_circulation_of_result(self):
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=3),
+            user=User.objects.get(pk=1),
+            due_date=date.today()
+        )
+        response = self.client.get('/search/?words=プログラ')
+        self.assertContains(response, '貸出中 1冊')
+
+    def test_kept_on_circulation_of_other_books(self):
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=5),
+            user=User.objects.get(pk=1),
+            due_date=date.today()
+        )
+        self.get_from_page_cache('/search/?words=プログラ')
+
+    def test_purged_by_catalog(self):
+        Book.objects.create(
+            name='プログラミング言語C', publisher=Publisher.objects.first())
+        response = self.client.get('/search/?words=プログラ')
+        self.assertContains(response, 'プログラミング言語C')
+
+    @override_settings(CACHES={
+        **settings.CACHES,
+        'page': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'opac_missing_page_cache',
+        },
+    })
+    def test_missing_cache_table(self):
+        with self.assertLogs('opac.caches.page', 'ERROR'):
+            response = self.client.get('/search/?words=プログラ')
+            self.assertContains(response, 'プログラミングHaskell')
+            Lending.objects.create(
+                stock=Stock.objects.get(pk=3),
+                user=User.objects.get(pk=1),
+                due_date=date.today()
+            )
+            response = self.client.get('/search/?words=プログラ')
+            self.assertContains(response, '貸出中 1冊')
+
+    def test_too_many_books(self):
+        response = self.client.get('/search/?words=プログラ OR python')
+        self.assertEqual(
+            response['Surrogate-Key'].split(), ['catalog', 'circulation'])
+        Lending.objects.create(
+            stock=Stock.objects.get(pk=5),
+            user=User.objects.get(pk=1),
+            due_date=date.today()
+        )
+        response = self.client.get('/search/?words=プログラ OR python')
+        self.assertContains(response, '貸出中 1冊')
+
+    def test_lendable_filter(self):
+        response = self.client.get('/search/?words=プログラ&lendable=1')
+        self.assertEqual(
+            response['Surrogate-Key'].split(), ['catalog', 'circulation'])
+
+
+class SearchViewIsbnTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def test_isbn13(self):
+        response = self.client.get('/search/?words=978-4-274-06781-5')
+        self.assertRedirects(response, '/book/2/')
+
+    def test_isbn10(self):
+        response = self.client.get('/search/?words=4274067815')
+        self.assertRedirects(response, '/book/2/')
+
+    def test_unknown_isbn(self):
+        response = self.client.get('/search/?words=9784274067792')
+        self.assertContains(response, '該当する書籍が見つかりませんでした。')
+
+    def test_isbn13_is_updated(self):
+        book = Book.objects.get(pk=2)
+        book.isbn = '4-87311-565-5'
+        book.save()
+        self.assertEqual(Book.objects.get(pk=2).isbn13, '9784873115658')
+
+    def test_duplicate_isbn(self):
+        book = Book.objects.create(
+            name='プログラミングHaskell 第2版', isbn='4274067815',
+            publisher=Publisher.objects.get(pk=1))
+        # 同じ ISBN の書籍も、保存・編集できる
+        book.full_clean()
+        book.save()
+        response = self.client.get('/search/?words=978-4-274-06781-5')
+        self.assertRedirects(response, '/search/?words=isbn%3A9784274067815')
+        response = self.client.get(response.url)
+        self.assertEqual(
+            {row.id for row in response.context['books']}, {2, book.pk})
@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from opac.models.caches import CacheVersion
+from opac.models.masters import Author, Book, Publisher
+from opac.queries import BookSuggestQuery, CacheVersionBumpQuery
+from opac.queries.book import suggest as suggest_queries
+from opac.search.suggest import TITLE, PrefixIndex, suggest_index
+
+
+@override_settings(OPAC_SUGGEST_INDEX={'rebuild_in_background': False})
+class SuggestViewTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def suggest(self, q):
+        response = self.client.get('/suggest/', {'q': q})
+        return [
+            (s['type'], s['name'], s['words'])
+            for s in response.json()['suggestions']
+        ]
+
+    def test_title_author_publisher(self):
+        self.assertEqual(self.suggest('Flu'), [
+            ('title', 'Fluent Python', 'title:"Fluent Python"')])
+        self.assertEqual(self.suggest('grah'), [
+            ('author', 'Graham Hutton', 'author:"Graham Hutton"')])
+        self.assertEqual(self.suggest('おーむ'), [
+            ('publisher', 'オーム社', 'publisher:"オーム社"')])
+
+    def test_empty_prefix(self):
+        self.assertEqual(self.suggest(''), [])
+        self.assertEqual(self.client.get('/suggest/').json(),
+                         {'suggestions': []})
+
+    def test_incremental_update(self):
+        self.suggest('flu')
+        version = suggest_index.version
+        book = Book.objects.get(pk=3)
+        book.name = 'Effective Python'
+        book.save()
+        Author.objects.get(name='Graham Hutton').delete()
+        Book.objects.create(
+            name='Fluent Ruby', publisher=Publisher.objects.get(pk=1))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                [name for _, name, _ in self.suggest('flu')], ['Fluent Ruby'])
+        self.assertNotEqual(suggest_index.version, version)
+        self.assertEqual(self.suggest('grah'), [])
+        self.assertEqual(
+            [name for _, name, _ in self.suggest('eff')], ['Effective Python'])
+
+    def test_answered_from_index(self):
+        self.suggest('flu')
+        with self.assertNumQueries(1):
+            self.suggest('pyth')
+
+    def test_rebuild_after_other_process_update(self):
+        self.suggest('flu')
+        # 他のプロセスでの更新 (シグナルを経ずにバージョンだけが上がる)
+        Book.objects.filter(pk=3).update(name='Effective Python')
+        CacheVersionBumpQuery(CacheVersion.CATALOG).exec()
+        # このプロセスでの更新では、索引のバージョンを上げない
+        Book.objects.create(
+            name='Fluent Ruby', publisher=Publisher.objects.get(pk=1))
+        self.assertEqual(
+            [name for _, name, _ in self.suggest('eff')], ['Effective Python'])
+
+
+class BookSuggestQueryRebuildTests(TestCase):
+    fixtures = ['masters_minimal']
+
+    def setUp(self):
+        self.index = PrefixIndex()
+        self.index.rebuild([(TITLE, 3, 'Fluent Python')], 'old')
+
+    @mock.patch.object(suggest_queries, 'Thread')
+    def test_answer_from_old_index_while_rebuilding(self, thread):
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                BookSuggestQuery('flu', index=self.index).exec(),
+                [(TITLE, 3, 'Fluent Python')])
+        thread.return_value.start.assert_called_once_with()
+        # 作り直している間は、新たに作り直しを始めない
+        BookSuggestQuery('flu', index=self.index).exec()
+        self.assertEqual(thread.call_count, 1)
+
+    def test_build_in_request_if_not_built(self):
+        index = PrefixIndex()
+        self.assertEqual(
+            [name for _, _, name in BookSuggestQuery('flu', index=index)
+             .exec()],
+            ['Fluent Python'])
@@ -7,6 +7,7 @@ app_name = 'opac'
 urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
     path('search/', views.SearchView.as_view(), name='search'),
+    path('suggest/', views.SuggestView.as_view(), name='suggest'),
     path('book/<int:pk>/',
          views.BookDetailView.as_view(), name='book_detail'),
 ]
@@ -1,3 +1,4 @@
 from opac.views.index import IndexView  # noqa: F401
 from opac.views.book_detail import BookDetailView  # noqa: F401
 from opac.views.search import SearchView  # noqa: F401
+from opac.views.suggest import SuggestView  # noqa: F401
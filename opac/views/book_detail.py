@@ -1,14 +1,38 @@
-from django.views.generic import DetailView
+from django.http import Http404
+from django.views.generic import TemplateView
 
-from opac.queries import BookDetailQuery, BookStocksQuery
+from opac.caches.page import book_key
+from opac.queries import BookDetailQuery
+from opac.views.mixins import ConditionalGetMixin, PageCacheMixin
 
 
-class BookDetailView(DetailView):
-    def get_queryset(self):
-        return BookDetailQuery(self.kwargs['pk']).exec()
+class BookDetailView(PageCacheMixin, ConditionalGetMixin, TemplateView):
+    template_name = 'opac/book_detail.html'
+
+    def get_detail(self):
+        if not hasattr(self, 'detail'):
+            self.detail = BookDetailQuery(self.kwargs['pk']).exec()
+        if self.detail is None:
+            raise Http404('書籍が見つかりません。')
+        return self.detail
+
+    def get_validators(self):
+        # 書誌と貸出・取置・予約のキャッシュバージョンは書籍と一緒に読み込む
+        book = self.get_detail().book
+        source = f'{book.book_version}:{book.circulation_version}'
+        updated = [
+            updated_at for updated_at in (
+                book.updated_at,
+                book.book_updated_at,
+                book.circulation_updated_at
+            ) if updated_at
+        ]
+        return source, max(updated)
+
+    def get_surrogate_keys(self):
+        return [book_key(self.kwargs['pk'])]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        book_id = self.kwargs['pk']
-        context['stocks'] = BookStocksQuery(book_id).exec()
+        context.update(self.get_detail()._asdict())
         return context
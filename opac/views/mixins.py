@@ -0,0 +1,131 @@
+from hashlib import md5
+
+from django.contrib.messages import get_messages
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+    quote_etag
+)
+from django.utils.http import http_date, parse_http_date_safe
+
+from opac.caches import page_cache
+
+
+class ConditionalGetMixin:
+    """ETag / Last-Modified による条件付き GET に対応させる mixin。
+
+    get_validators の返す値が前回の応答から変わっていなければ、
+    テンプレートを描画せずに 304 Not Modified を返します。
+    ログインしていなければ共有キャッシュにも保存を許し、
+    毎回この検証を求めます (Cache-Control: public, no-cache)。
+
+    Detail
+    ------
+    - ヘッダにログイン中の利用者名が出るので、ETag には利用者を含める
+    - 前のリクエストのメッセージが残っている場合は、描画し直す
+    - validate_after_get が True なら、ビューの処理の後 (テンプレートの
+      描画の前) に get_validators を呼ぶ。表示する内容から検証の値を
+      決める場合に使う
+    """
+    validate_after_get = False
+
+    def get_validators(self):
+        """応答の検証に使う値を返す。
+
+        Returns
+        -------
+        (ETag の元にする文字列, 最終更新日時 または None)。
+        条件付き GET に対応しない場合は None
+        """
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        if get_messages(request):
+            return super().get(request, *args, **kwargs)
+        response = None
+        if self.validate_after_get:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        validators = self.get_validators()
+        if validators is None:
+            return response or super().get(request, *args, **kwargs)
+
+        source, last_modified = validators
+        source = f'{source}:{request.user.pk}'
+        etag = quote_etag(md5(source.encode('utf-8')).hexdigest())
+        timestamp = last_modified and int(last_modified.timestamp())
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            response = not_modified
+        elif response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        if timestamp:
+            response['Last-Modified'] = http_date(timestamp)
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+
+class PageCacheMixin:
+    """ログインしていない利用者への GET の応答を、ページごと保持する mixin。
+
+    キャッシュに当たればビューもテンプレートも通さずに返します
+    (If-None-Match / If-Modified-Since が一致すれば 304)。
+    保持するページには get_surrogate_keys で返すサロゲートキーを付け、
+    Surrogate-Key ヘッダにも出すので、前段の HTTP キャッシュでも
+    同じキーで purge できます。
+    """
+    def get_surrogate_keys(self):
+        """描画したページに付けるサロゲートキーのリストを返す。"""
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        if not self.is_page_cacheable(request):
+            return super().get(request, *args, **kwargs)
+
+        path = request.get_full_path()
+        response = page_cache.get(path)
+        if response is not None:
+            return self.conditional_response(request, response)
+
+        started = page_cache.sequence()
+        response = super().get(request, *args, **kwargs)
+        if response.status_code != 200 or response.cookies:
+            return response
+        keys = self.get_surrogate_keys()
+        response['Surrogate-Key'] = ' '.join(keys)
+
+        def store(response):
+            page_cache.set(path, response, keys, started)
+
+        if getattr(response, 'is_rendered', True):
+            store(response)
+        else:
+            response.add_post_render_callback(store)
+        return response
+
+    def is_page_cacheable(self, request):
+        return page_cache.enabled \
+            and not request.user.is_authenticated \
+            and not get_messages(request)
+
+    def conditional_response(self, request, response):
+        last_modified = None
+        if response.has_header('Last-Modified'):
+            last_modified = parse_http_date_safe(response['Last-Modified'])
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=last_modified,
+            response=response
+        )
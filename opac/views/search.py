@@ -1,14 +1,37 @@
 from django.contrib import messages
-from django.shortcuts import render
+from django.core.paginator import InvalidPage
+from django.http import Http404, QueryDict
+from django.shortcuts import redirect, render
+from django.urls import reverse
 from django.views.generic import ListView
 
-from opac.queries import BookSearchQuery
+from opac.caches import page_cache
+from opac.caches.page import CATALOG, CIRCULATION, book_key
+from opac.models.caches import CacheVersion
+from opac.paginators import BookCursorPaginator
+from opac.queries import (
+    BookFacetCountQuery,
+    BookFacetQuery,
+    BookIsbnQuery,
+    BookListQuery,
+    BookSearchQuery,
+    BookSearchWordsCorrectQuery,
+    CachedBookSearchQuery,
+    CacheVersionsGetQuery
+)
+from opac.search import split_words
+from opac.search.facets import FacetFilters
+from opac.search.isbn import to_isbn13
+from opac.search.query import Isbn, Term, parse
+from opac.views.mixins import ConditionalGetMixin, PageCacheMixin
 
 
-class SearchView(ListView):
+class SearchView(PageCacheMixin, ConditionalGetMixin, ListView):
     template_name = 'opac/book_list.html'
     context_object_name = 'books'
     paginate_by = 20
+    # 表示する書籍の貸出・取置・予約のバージョンで検証する
+    validate_after_get = True
 
     def render_index(self, request):
         return render(request, 'opac/index.html')
@@ -26,15 +49,190 @@ class SearchView(ListView):
     def dispatch(self, request, *args, **kwargs):
         if 'words' not in request.GET:
             return self.render_no_search_words(request)
-        if request.GET['words'].split() == []:
+        if split_words(request.GET['words']) == []:
             return self.render_no_search_words(request)
         return super().dispatch(request, *args, **kwargs)
 
+    def get(self, request, *args, **kwargs):
+        # ISBN が入力された場合は、書籍詳細へ直接移動する。
+        # 同じ ISBN の書籍が複数あれば、それらを検索結果として表示する
+        isbn13 = to_isbn13(request.GET['words'])
+        book_ids = BookIsbnQuery(isbn13).exec() if isbn13 else []
+        if len(book_ids) == 1:
+            return redirect('opac:book_detail', pk=book_ids[0])
+        if book_ids:
+            params = QueryDict(mutable=True)
+            params['words'] = str(Isbn(isbn13))
+            return redirect(f"{reverse('opac:search')}?{params.urlencode()}")
+        return super().get(request, *args, **kwargs)
+
+    def get_validators(self):
+        # 検索結果は蔵書目録で決まり、表示する行は書籍ごとの貸出・取置・
+        # 予約の状況で決まる。貸出可否・所蔵館で絞り込んだ結果だけは、
+        # どの書籍の貸出・取置・予約でも変わり得る
+        if not self.page_books:
+            return None
+        values = [
+            version.value if version else ''
+            for version in self.versions.values()
+        ]
+        values.extend(
+            f'{book.id}={book.circulation_version or ""}'
+            for book in self.page_books)
+        # 書籍ごとのバージョンの更新日時は読まないので、Last-Modified は
+        # 全書籍のバージョンで検証する場合だけ付ける
+        last_modified = None
+        if self.is_filtered_by_availability():
+            last_modified = max(
+                (version.updated_at for version in self.versions.values()
+                 if version),
+                default=None)
+        return ':'.join(values), last_modified
+
+    def get_surrogate_keys(self):
+        # 貸出可否・所蔵館で絞り込んだ結果や、書籍が多すぎる結果は、
+        # どの書籍の貸出・取置・予約でも変わり得るものとして扱う
+        book_ids = self.result_book_ids
+        if book_ids is None or len(book_ids) > page_cache.max_keys \
+                or self.is_filtered_by_availability():
+            return [CATALOG, CIRCULATION]
+        return [CATALOG] + [book_key(pk) for pk in book_ids]
+
     def get_queryset(self):
-        words = self.request.GET['words'].split()
-        return BookSearchQuery(words).exec()
+        query = parse(self.request.GET['words'])
+        self.facet_filters = FacetFilters.from_params(self.request.GET)
+        self.corrected_query = None
+        self.page_books = None
+        keys = [CacheVersion.CATALOG]
+        if self.is_filtered_by_availability():
+            keys.append(CacheVersion.CIRCULATION)
+        versions = CacheVersionsGetQuery(keys).exec()
+        self.versions = {key: versions.get(key) for key in keys}
+        book_ids = self.search(query)
+        if query is not None and not book_ids[:1]:
+            corrected_query = self.correct(query)
+            if corrected_query != query:
+                self.corrected_query = corrected_query
+                book_ids = self.search(corrected_query)
+        return self.drill_down(book_ids)
+
+    def search(self, query):
+        # 貸出可否・所蔵館はデータベースの中で絞り込む
+        lendable = bool(self.facet_filters.lendable)
+        library = self.facet_filters.library
+        # キーセットページングはクエリセットを絞り込むので、キャッシュを使わない
+        if self.is_cursor_paginated():
+            return BookSearchQuery(
+                query, lendable=lendable, library=library).exec()
+        # 貸出・取置はキャッシュのバージョンを変えないので、キャッシュを使わない
+        if lendable or library is not None:
+            return BookSearchQuery(
+                query, self.get_order(), lendable, library).exec()
+        catalog_version = self.versions[CacheVersion.CATALOG]
+        return CachedBookSearchQuery(
+            query, self.get_order(),
+            version=catalog_version.value if catalog_version else '').exec()
+
+    def drill_down(self, book_ids):
+        # キャッシュされた書籍IDのリストは、出版者・発行年をメモリ上で
+        # 絞り込むので、絞り込み条件を変えても検索をやり直さない。
+        # キャッシュに収まらない結果とキーセットページングの結果は、
+        # 書籍IDを読み込まずにデータベースで絞り込み・集計する
+        filters = self.facet_filters._replace(lendable=None, library=None)
+        self.facet_counts = None
+        self.result_book_ids = None
+        if not isinstance(book_ids, (list, tuple)):
+            book_ids = book_ids.filter(**filters.lookups())
+            self.facet_counts = BookFacetCountQuery(book_ids).exec()
+            return book_ids
+
+        self.result_book_ids = book_ids
+        if not book_ids:
+            return book_ids
+        facets = BookFacetQuery(book_ids).exec()
+        book_ids = facets.filter(book_ids, filters)
+        self.facet_counts = facets.counts(book_ids)
+        self.result_book_ids = book_ids
+        return book_ids
+
+    def correct(self, query):
+        # 引用符で囲まれた句は、入力どおりに検索させるため直さない
+        words = [
+            node.text for node in query.terms(negated=True)
+            if isinstance(node, Term)
+        ]
+        corrected = dict(
+            zip(words, BookSearchWordsCorrectQuery(words).exec()))
+        return query.map_terms(
+            lambda node: node._replace(
+                text=corrected.get(node.text, node.text)))
+
+    def is_filtered_by_availability(self):
+        return bool(self.facet_filters.lendable) \
+            or self.facet_filters.library is not None
+
+    def is_cursor_paginated(self):
+        # 発行日順はキーセットページングで表示する。page を指定した URL
+        # だけは、これまでどおり OFFSET で表示する
+        params = self.request.GET
+        return 'cursor' in params \
+            or (params.get('order') == BookSearchQuery.ISSUE_DATE
+                and 'page' not in params)
+
+    def get_order(self):
+        # 関連度順は該当するすべての書籍の適合度を計算するので、
+        # 選ばれた場合だけにする
+        if self.is_cursor_paginated():
+            return BookSearchQuery.ISSUE_DATE
+        if self.request.GET.get('order') == BookSearchQuery.RELEVANCE:
+            return BookSearchQuery.RELEVANCE
+        return BookSearchQuery.ISSUE_DATE
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.is_cursor_paginated():
+            paginator, page = self.paginate_by_cursor(queryset, page_size)
+        else:
+            paginator, page, _, _ = \
+                super().paginate_queryset(queryset, page_size)
+        page.object_list = BookListQuery(page.object_list).exec()
+        self.page_books = page.object_list
+        if not self.is_cursor_paginated() \
+                and self.get_order() == BookSearchQuery.ISSUE_DATE:
+            self.link_to_cursor_pages(page)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def link_to_cursor_pages(self, page):
+        # OFFSET で表示した発行日順のページからも、前後のページへは
+        # キーセットページングで移る
+        books = page.object_list
+        if not books:
+            return
+        if page.has_next():
+            page.next_cursor = BookCursorPaginator.cursor_after(
+                books[-1].issue_date, books[-1].id)
+        if page.has_previous():
+            page.previous_cursor = BookCursorPaginator.cursor_before(
+                books[0].issue_date, books[0].id)
+
+    def paginate_by_cursor(self, queryset, page_size):
+        paginator = BookCursorPaginator(queryset, page_size)
+        try:
+            return paginator, paginator.page(
+                self.request.GET.get('cursor', ''))
+        except InvalidPage as e:
+            raise Http404(f'Invalid cursor: {e}')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['is_cursor_paginated'] = self.is_cursor_paginated()
+        context['order'] = self.get_order()
+        context['facet_counts'] = self.facet_counts
+        context['facet_filters'] = self.facet_filters
+        if self.corrected_query:
+            context['corrected_words'] = str(self.corrected_query)
+        return context
 
     def render_to_response(self, context, **response_kwargs):
-        if not self.object_list:
+        if not context['paginator'].count:
             return self.render_no_books(self.request)
         return super().render_to_response(context, **response_kwargs)
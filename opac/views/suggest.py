@@ -0,0 +1,28 @@
+from django.http import JsonResponse
+from django.views import View
+
+from opac.queries import BookSuggestQuery
+
+
+class SuggestView(View):
+    limit = 10
+
+    def get(self, request, *args, **kwargs):
+        suggestions = BookSuggestQuery(
+            request.GET.get('q', ''), self.limit).exec()
+        return JsonResponse({
+            'suggestions': [
+                {
+                    'type': kind,
+                    'id': pk,
+                    'name': name,
+                    'words': self.words(kind, name),
+                }
+                for kind, pk, name in suggestions
+            ]
+        })
+
+    def words(self, kind, name):
+        # 候補の種類は検索式の項目名と同じ
+        name = name.replace('"', ' ')
+        return f'{kind}:"{name}"'